@@ -1,11 +1,19 @@
 import os
+import json
+import time
+import hashlib
+import uuid
 import logging
+import platform
+import threading
 import requests
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
 from flask import Flask, request, jsonify
 import torch
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future
 import atexit
+from contextlib import contextmanager
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -21,12 +29,199 @@ def shutdown_executor():
     logger.info("ThreadPoolExecutor shut down complete.")
 atexit.register(shutdown_executor)
 
+DATA_DIR = os.environ.get('DATA_DIR', './data')
+AUTOTUNE_CACHE_PATH = os.environ.get('AUTOTUNE_CACHE_PATH', os.path.join(DATA_DIR, 'autotune_cache.json'))
+AUTOTUNE_BY_DEFAULT = os.environ.get('AUTOTUNE_THREADS', 'false').lower() == 'true'
+AUTOTUNE_PROMPT = (
+    "You are a helpful assistant. Summarize the following paragraph in one sentence. "
+    "The quick brown fox jumps over the lazy dog while the farmer watches from the porch, "
+    "wondering whether the harvest will be ready before the first autumn storms arrive. "
+    "Meanwhile the children count the apples that fell overnight and argue about pie."
+)
+
+
+def get_usable_cpu_count() -> int:
+    """Number of CPUs this process may run on (respects container cpusets)"""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def get_cpu_signature() -> str:
+    """Describe the host CPU so calibration results are only reused on matching hardware"""
+    model_name = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    model_name = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{model_name}|{platform.machine()}|cpus={get_usable_cpu_count()}"
+
+
+def parse_flag(value, name: str) -> bool:
+    """Read a boolean option from JSON config/requests; "false"/"0" are False, unknown values are rejected"""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'on'):
+        return True
+    if text in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError(f"'{name}' must be a boolean, got {value!r}")
+
+
+class AutotuneCache:
+    """Persist thread/batch calibration results per (model file, host CPU signature)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _key(self, model_path: str) -> str:
+        stat = os.stat(model_path)
+        raw = f"{os.path.abspath(model_path)}|{stat.st_size}|{int(stat.st_mtime)}|{get_cpu_signature()}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _read_all(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, model_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            key = self._key(model_path)
+        except OSError:
+            return None
+        with self._lock:
+            return self._read_all().get(key)
+
+    def store(self, model_path: str, result: Dict[str, Any]) -> None:
+        try:
+            key = self._key(model_path)
+        except OSError as e:
+            logger.warning(f"Not persisting calibration for {model_path}: {e}")
+            return
+        with self._lock:
+            entries = self._read_all()
+            entries[key] = result
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(entries, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Failed to persist calibration results to {self.path}: {e}")
+
+autotune_cache = AutotuneCache(AUTOTUNE_CACHE_PATH)
+
+CORE_BUDGET = int(os.environ.get('CORE_BUDGET', get_usable_cpu_count()))
+MIN_THREADS_PER_GENERATION = int(os.environ.get('MIN_THREADS_PER_GENERATION', 1))
+
+
+class CoreBudget:
+    """
+    Hand out disjoint CPU sets to active generations so the host never runs more
+    inference threads than it has cores.
+
+    Each generation leases a fair share of the budget (fewer cores per request as
+    load grows) and waits when fewer than `min_cores` are free. The leased cores are
+    applied to the calling worker thread with os.sched_setaffinity, so the threads
+    llama.cpp spawns for that decode inherit the pinning.
+    """
+
+    def __init__(self, budget: int, min_cores: int = 1):
+        try:
+            available = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            available = list(range(os.cpu_count() or 1))
+        self.cores = available[:max(1, min(budget, len(available)))]
+        self.min_cores = max(1, min(min_cores, len(self.cores)))
+        self._free = list(self.cores)
+        self._active = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._can_pin = hasattr(os, 'sched_setaffinity')
+        logger.info(f"Core budget: {len(self.cores)} cores {self.cores}, min {self.min_cores} per generation")
+
+    def _fair_share(self, requested: int) -> int:
+        contenders = max(1, self._active + self._waiting)
+        share = max(self.min_cores, len(self.cores) // contenders)
+        return max(self.min_cores, min(requested, share))
+
+    def _acquire(self, requested: int) -> List[int]:
+        with self._cond:
+            self._waiting += 1
+            try:
+                while len(self._free) < self.min_cores:
+                    self._cond.wait()
+                take = min(self._fair_share(requested), len(self._free))
+                cpus = self._free[:take]
+                del self._free[:take]
+                self._active += 1
+                return cpus
+            finally:
+                self._waiting -= 1
+
+    def _release(self, cpus: List[int]) -> None:
+        with self._cond:
+            self._free.extend(cpus)
+            self._free.sort()
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _pin(self, cpus: List[int]) -> Optional[set]:
+        if not self._can_pin:
+            return None
+        try:
+            previous = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, cpus)
+            return previous
+        except OSError as e:
+            logger.warning(f"Could not pin generation thread to cores {cpus}: {e}")
+            return None
+
+    def _unpin(self, previous: Optional[set]) -> None:
+        if previous is None:
+            return
+        try:
+            os.sched_setaffinity(0, previous)
+        except OSError as e:
+            logger.warning(f"Could not restore thread affinity: {e}")
+
+    @contextmanager
+    def lease(self, requested: int):
+        """Block until cores are available, pin the current thread to them, and yield the CPU list"""
+        cpus = self._acquire(max(1, requested))
+        previous = self._pin(cpus)
+        try:
+            yield cpus
+        finally:
+            self._unpin(previous)
+            self._release(cpus)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "total_cores": len(self.cores),
+                "free_cores": len(self._free),
+                "active_generations": self._active,
+                "waiting_generations": self._waiting,
+            }
+
 
 class LLMModel:
     """A general-purpose LLM model class that can handle different model types (Optimized)"""
 
     def __init__(self, model_path: str, model_type: str, context_window: int = 2048,
-                 n_threads: int = 4, n_gpu_layers: int = 0, temperature: float = 0.7):
+                 n_threads: int = 4, n_gpu_layers: int = 0, temperature: float = 0.7,
+                 n_batch: int = 512, autotune: bool = False, recalibrate: bool = False):
         """
         Initialize the LLM model based on the provided type.
 
@@ -37,13 +232,20 @@ class LLMModel:
             n_threads: Number of CPU threads to use (crucial for llama.cpp performance)
             n_gpu_layers: Number of layers to offload to GPU (crucial for llama.cpp performance)
             temperature: Sampling temperature for generation
+            n_batch: Maximum prompt batch size for llama.cpp (upper bound for autotuning)
+            autotune: Calibrate n_threads/n_batch with microbenchmarks after loading (llama.cpp only)
+            recalibrate: Ignore persisted calibration results and benchmark again
         """
         self.model_path = model_path
         self.model_type = model_type.lower()
         self.context_window = context_window
         self.n_threads = max(1, n_threads)
+        self.n_batch = max(1, n_batch)
         self.n_gpu_layers = n_gpu_layers
         self.temperature = temperature
+        self.calibration: Optional[Dict[str, Any]] = None
+        # llama.cpp / transformers model objects are not safe to drive from two threads at once.
+        self.generation_lock = threading.RLock()
 
         logger.info(f"Initializing {self.model_type} model from {model_path}")
         logger.info(f"Parameters: context_window={context_window}, threads={self.n_threads}, gpu_layers={n_gpu_layers}")
@@ -59,6 +261,7 @@ class LLMModel:
                     model_path=model_path,
                     n_ctx=context_window,
                     n_threads=self.n_threads,
+                    n_batch=self.n_batch,
                     n_gpu_layers=n_gpu_layers,
                     verbose=False
                 )
@@ -133,8 +336,15 @@ class LLMModel:
                     raise ValueError(f"Cannot load model. Ensure path points to a valid GGUF (use type 'llama') or a Hugging Face ID matching the type ('phi2', 'rwkv').")
 
 
-            model_size = self.get_model_size()
-            logger.info(f"Loaded model with size: {model_size:.2f} MB")
+            # Summing the parameters of a transformers model walks every tensor; do it once at load
+            self.size_mb = self.get_model_size()
+            logger.info(f"Loaded model with size: {self.size_mb:.2f} MB")
+
+            if autotune:
+                if self.using_llama_cpp:
+                    self.calibration = self.autotune(force=recalibrate)
+                else:
+                    logger.warning(f"Autotuning requested for {self.model_type} model, but it is only supported for llama.cpp models. Skipping.")
 
         except Exception as e:
             logger.error(f"Failed to initialize model '{model_path}' of type '{self.model_type}': {e}")
@@ -164,11 +374,125 @@ class LLMModel:
 
         return 0.0
 
-    def generate(self, conversation_history: List[Dict[str, str]]) -> str:
-        """Generate a response based on conversation history"""
+    def _apply_runtime_settings(self, n_threads: int, n_batch: int) -> None:
+        """Apply thread and batch settings to a loaded llama.cpp model without reloading it"""
+        self.n_threads = max(1, n_threads)
+        self.n_batch = max(1, n_batch)
+        self.model.n_batch = self.n_batch
+        self._set_llama_threads(self.n_threads)
+
+    def _set_llama_threads(self, n_threads: int) -> None:
+        """Change the threads llama.cpp uses for the next decode without touching the configured value"""
+        self.model.n_threads = n_threads
+        try:
+            import llama_cpp
+            set_n_threads = getattr(llama_cpp, "llama_set_n_threads", None)
+            if set_n_threads is not None:
+                set_n_threads(self.model.ctx, n_threads, n_threads)
+        except Exception as e:
+            logger.warning(f"Could not update llama.cpp context threads at runtime: {e}")
+
+    def _thread_candidates(self) -> List[int]:
+        """Candidate thread counts: powers of two up to the usable cores, plus half and all cores"""
+        usable = get_usable_cpu_count()
+        candidates = {usable, max(1, usable // 2)}
+        n = 1
+        while n < usable:
+            candidates.add(n)
+            n *= 2
+        return sorted(candidates)
+
+    def _benchmark(self, n_threads: int, n_batch: int, prompt_tokens: List[int], decode_tokens: int) -> Dict[str, Any]:
+        """Time one prefill of the calibration prompt and a fixed number of single-token decode steps"""
+        self._apply_runtime_settings(n_threads, n_batch)
+        self.model.reset()
+
+        start = time.perf_counter()
+        self.model.eval(prompt_tokens)
+        prefill_seconds = time.perf_counter() - start
+
+        token = prompt_tokens[-1]
+        start = time.perf_counter()
+        for _ in range(decode_tokens):
+            self.model.eval([token])
+        decode_seconds = time.perf_counter() - start
+        self.model.reset()
+
+        return {
+            "n_threads": n_threads,
+            "n_batch": n_batch,
+            "prefill_tokens_per_s": round(len(prompt_tokens) / prefill_seconds, 2) if prefill_seconds > 0 else None,
+            "decode_ms_per_token": round(decode_seconds * 1000 / decode_tokens, 2),
+        }
+
+    def autotune(self, decode_tokens: int = 16, force: bool = False) -> Dict[str, Any]:
+        """
+        Calibrate n_threads and n_batch for this host with short microbenchmarks.
+
+        Decode latency (ms/token) picks n_threads, prefill throughput then picks n_batch
+        at that thread count. Results are persisted per (model file, CPU signature) so
+        later loads on the same host reuse them instead of benchmarking again.
+        """
+        if not self.using_llama_cpp:
+            raise ValueError("Autotuning is only supported for llama.cpp models")
+
+        if not force:
+            cached = autotune_cache.load(self.model_path)
+            if cached:
+                best = cached["best"]
+                if best["n_batch"] <= self.n_batch:
+                    logger.info(f"Using persisted calibration for {self.model_path}: n_threads={best['n_threads']}, n_batch={best['n_batch']}")
+                    self._apply_runtime_settings(best["n_threads"], best["n_batch"])
+                    return dict(cached, source="cache")
+
+        max_batch = self.n_batch
+        prompt_tokens = self.model.tokenize(AUTOTUNE_PROMPT.encode('utf-8'))
+        prompt_tokens = prompt_tokens[:max(1, self.context_window // 2 - decode_tokens)]
+        logger.info(f"Autotuning {self.model_path} with {len(prompt_tokens)} prompt tokens and {decode_tokens} decode steps")
+
+        started = time.perf_counter()
+        # Warm-up pass so page faults on the mmap'd weights don't penalize the first candidate.
+        self._benchmark(get_usable_cpu_count(), max_batch, prompt_tokens, 1)
+
+        thread_curve = [self._benchmark(n, max_batch, prompt_tokens, decode_tokens)
+                        for n in self._thread_candidates()]
+        best_threads = min(thread_curve, key=lambda p: p["decode_ms_per_token"])["n_threads"]
+
+        batch_candidates = sorted({b for b in (64, 128, 256, 512, 1024) if b <= max_batch} | {max_batch})
+        batch_curve = [self._benchmark(best_threads, b, prompt_tokens, decode_tokens)
+                       for b in batch_candidates]
+        best_batch = max(batch_curve, key=lambda p: p["prefill_tokens_per_s"] or 0)["n_batch"]
+
+        self._apply_runtime_settings(best_threads, best_batch)
+        result = {
+            "best": {"n_threads": best_threads, "n_batch": best_batch},
+            "thread_curve": thread_curve,
+            "batch_curve": batch_curve,
+            "cpu_signature": get_cpu_signature(),
+            "calibrated_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "duration_s": round(time.perf_counter() - started, 2),
+        }
+        autotune_cache.store(self.model_path, result)
+        logger.info(f"Autotune complete for {self.model_path}: n_threads={best_threads}, n_batch={best_batch} ({result['duration_s']}s)")
+        return dict(result, source="benchmark")
+
+    def generate(self, conversation_history: List[Dict[str, str]], n_threads: Optional[int] = None) -> str:
+        """Generate a response based on conversation history
+
+        Args:
+            conversation_history: Messages to build the prompt from
+            n_threads: Threads for this call only (llama.cpp), e.g. as granted by the core budget
+        """
+        with self.generation_lock:
+            return self._generate(conversation_history, n_threads)
+
+    def _generate(self, conversation_history: List[Dict[str, str]], n_threads: Optional[int] = None) -> str:
         logger.info(f"Generating response with {self.model_type} model")
 
         try:
+            if self.using_llama_cpp:
+                self._set_llama_threads(min(n_threads or self.n_threads, self.n_threads))
+
             if self.model_type == "phi2":
                 prompt = self._format_phi2_prompt(conversation_history)
             elif self.model_type == "rwkv":
@@ -329,8 +653,7 @@ class LLMModel:
                 errors["n_threads"] = "Only applicable to llama.cpp models"
             else:
                 logger.info(f"Updating n_threads from {self.n_threads} to {n_threads}")
-                self.n_threads = max(1, n_threads)
-                self.model.n_threads = self.n_threads  # Update llama.cpp runtime parameter
+                self._apply_runtime_settings(n_threads, self.n_batch)  # Update llama.cpp runtime parameter
                 changes["n_threads"] = self.n_threads
 
         if n_gpu_layers is not None:
@@ -395,19 +718,160 @@ class LLMModel:
         is_likely_english = ratio < 0.15
         return is_likely_english
 
+MAX_REPLICAS_PER_MODEL = int(os.environ.get('MAX_REPLICAS_PER_MODEL', 8))
+MAX_STICKY_CONVERSATIONS = int(os.environ.get('MAX_STICKY_CONVERSATIONS', 4096))
+
+
+class ReplicaPool:
+    """
+    N engine instances of one model behind a single model ID.
+
+    A conversation sticks to the replica that served it last (llama.cpp reuses the
+    matching KV-cache prefix), unless that replica is busy and another one is idle,
+    in which case the least-busy idle replica takes over. When every replica is busy
+    the request waits for the first one to free up.
+
+    Only the most recently served MAX_STICKY_CONVERSATIONS conversations keep their
+    affinity; older ones are dropped and simply go to the least-busy replica next time.
+    """
+
+    def __init__(self, replicas: List[LLMModel], max_sticky: int = MAX_STICKY_CONVERSATIONS):
+        if not replicas:
+            raise ValueError("A replica pool needs at least one model instance")
+        self.replicas = replicas
+        self._busy = [False] * len(replicas)
+        self._served = [0] * len(replicas)
+        self._busy_seconds = [0.0] * len(replicas)
+        self._waiting = 0
+        self._sticky: "OrderedDict[str, int]" = OrderedDict()
+        self._sticky_counts = [0] * len(replicas)
+        self._max_sticky = max(1, max_sticky)
+        self._created_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    @property
+    def primary(self) -> LLMModel:
+        return self.replicas[0]
+
+    def _pick(self, conversation_id: str) -> Optional[int]:
+        sticky = self._sticky.get(conversation_id)
+        if sticky is not None and not self._busy[sticky]:
+            return sticky
+        idle = [i for i, busy in enumerate(self._busy) if not busy]
+        if not idle:
+            return None
+        return min(idle, key=lambda i: (self._busy_seconds[i], self._served[i]))
+
+    @contextmanager
+    def acquire(self, conversation_id: str):
+        """Check out a replica for one generation in this conversation"""
+        with self._cond:
+            index = self._pick(conversation_id)
+            if index is None:
+                self._waiting += 1
+                try:
+                    while index is None:
+                        self._cond.wait()
+                        index = self._pick(conversation_id)
+                finally:
+                    self._waiting -= 1
+            self._busy[index] = True
+            self._stick(conversation_id, index)
+
+        started = time.monotonic()
+        try:
+            yield self.replicas[index]
+        finally:
+            with self._cond:
+                self._busy[index] = False
+                self._served[index] += 1
+                self._busy_seconds[index] += time.monotonic() - started
+                self._cond.notify_all()
+
+    def _stick(self, conversation_id: str, index: int) -> None:
+        # Caller holds self._cond
+        previous = self._sticky.pop(conversation_id, None)
+        if previous is not None:
+            self._sticky_counts[previous] -= 1
+        self._sticky[conversation_id] = index
+        self._sticky_counts[index] += 1
+        while len(self._sticky) > self._max_sticky:
+            _, evicted = self._sticky.popitem(last=False)
+            self._sticky_counts[evicted] -= 1
+
+    def forget(self, conversation_id: str) -> None:
+        """Drop a conversation's replica affinity, e.g. when its history is cleared"""
+        with self._cond:
+            index = self._sticky.pop(conversation_id, None)
+            if index is not None:
+                self._sticky_counts[index] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            uptime = max(time.monotonic() - self._created_at, 1e-9)
+            return {
+                "count": len(self.replicas),
+                "waiting_requests": self._waiting,
+                "replicas": [{
+                    "index": i,
+                    "busy": self._busy[i],
+                    "requests_served": self._served[i],
+                    "busy_seconds": round(self._busy_seconds[i], 2),
+                    "utilization": round(min(1.0, self._busy_seconds[i] / uptime), 4),
+                    "sticky_conversations": self._sticky_counts[i],
+                } for i in range(len(self.replicas))]
+            }
+
+
+def load_replicas(primary: LLMModel, count: int) -> List[LLMModel]:
+    """Load additional engine instances with the primary's (possibly autotuned) settings"""
+    count = max(1, min(count, MAX_REPLICAS_PER_MODEL))
+    extra = []
+    for index in range(1, count):
+        logger.info(f"Loading replica {index + 1}/{count} of {primary.model_path}")
+        replica = LLMModel(
+            model_path=primary.model_path,
+            model_type=primary.model_type,
+            context_window=primary.context_window,
+            n_threads=primary.n_threads,
+            n_gpu_layers=primary.n_gpu_layers,
+            temperature=primary.temperature,
+            n_batch=primary.n_batch
+        )
+        replica.calibration = primary.calibration
+        extra.append(replica)
+    return extra
+
+
 class LLMConversationManager:
     """A lightweight manager for LLM conversations"""
 
-    def __init__(self):
+    def __init__(self, core_budget: Optional[CoreBudget] = None):
         self.models: Dict[str, LLMModel] = {}
+        self.pools: Dict[str, ReplicaPool] = {}
         self.conversations: Dict[str, Dict[str, Any]] = {}
+        # model_info without the live replica stats, rebuilt when a model is added or modified
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self.core_budget = core_budget or CoreBudget(CORE_BUDGET, MIN_THREADS_PER_GENERATION)
 
-    def add_model(self, model_id: str, model_instance: LLMModel) -> None:
-        """Add a model to the manager"""
+    def add_model(self, model_id: str, model_instance: LLMModel,
+                  replicas: Optional[List[LLMModel]] = None) -> None:
+        """Add a model to the manager, optionally with extra replicas served under the same ID"""
         if model_id in self.models:
              logger.warning(f"Model ID '{model_id}' already exists. Overwriting.")
-        logger.info(f"Adding model: {model_id} (Type: {model_instance.model_type})")
+        logger.info(f"Adding model: {model_id} (Type: {model_instance.model_type}, replicas: {1 + len(replicas or [])})")
         self.models[model_id] = model_instance
+        self.pools[model_id] = ReplicaPool([model_instance] + list(replicas or []))
+        self._info[model_id] = self._describe(model_id, model_instance)
+
+    def modify_model_parameters(self, model_id: str, **params) -> Dict[str, Any]:
+        """Apply parameter changes to every replica of a model; returns the primary's result"""
+        pool = self.pools[model_id]
+        result = pool.primary.modify_parameters(**params)
+        for replica in pool.replicas[1:]:
+            replica.modify_parameters(**params)
+        self._info[model_id] = self._describe(model_id, pool.primary)
+        return result
 
     def remove_model(self, model_id: str) -> bool:
         """Remove a model from the manager"""
@@ -425,6 +889,8 @@ class LLMConversationManager:
             logger.info(f"Removed conversation {conv_id} associated with removed model {model_id}")
 
         del self.models[model_id]
+        self.pools.pop(model_id, None)
+        self._info.pop(model_id, None)
         import gc
         gc.collect()
         if torch.cuda.is_available():
@@ -458,6 +924,13 @@ class LLMConversationManager:
         }
         return conversation_id
 
+    def ensure_conversation(self, model_id: str, conversation_id: str) -> bool:
+        """Create a conversation unless it exists already (keeping its history); True if it was created"""
+        if conversation_id in self.conversations:
+            return False
+        self.create_conversation(model_id, conversation_id)
+        return True
+
     def get_response(self, conversation_id: str, message: str) -> str:
         """Get a response from the model for the given conversation (Blocking call)"""
         if conversation_id not in self.conversations:
@@ -471,31 +944,43 @@ class LLMConversationManager:
             logger.error(f"Model '{model_id}' associated with conversation '{conversation_id}' is no longer loaded.")
             raise ValueError(f"Model '{model_id}' for conversation '{conversation_id}' not found.")
 
-        model = self.models[model_id]
+        pool = self.pools[model_id]
 
-        conv_data["history"].append({
+        # Work on a copy and publish it in one assignment at the end, so readers never
+        # see a half-finished turn and a concurrent reset isn't silently undone.
+        base_history = conv_data["history"]
+        history = base_history + [{
             "role": "user",
             "content": message
-        })
+        }]
 
         logger.info(f"Generating response for conversation: {conversation_id} using model: {model_id}")
 
         try:
-            response = model.generate(conv_data["history"])
+            # Take a replica first so queued requests don't hold cores while waiting for one.
+            with pool.acquire(conversation_id) as model, model.generation_lock:
+                with self.core_budget.lease(model.n_threads) as cpus:
+                    logger.debug(f"Conversation {conversation_id} leased cores {cpus}")
+                    response = model.generate(history, n_threads=len(cpus))
         except Exception as e:
              logger.error(f"Exception during model.generate for conv {conversation_id}: {e}")
              return f"Error generating response from model {model_id}: {e}"
 
-        conv_data["history"].append({
+        history.append({
             "role": "assistant",
             "content": response
         })
 
         max_history_messages = 30
-        if len(conv_data["history"]) > max_history_messages:
+        if len(history) > max_history_messages:
             logger.warning(f"Trimming conversation {conversation_id} history (>{max_history_messages} messages)")
             keep_messages = max_history_messages - 1
-            conv_data["history"] = [conv_data["history"][0]] + conv_data["history"][-keep_messages:]
+            history = [history[0]] + history[-keep_messages:]
+
+        if conv_data["history"] is base_history:
+            conv_data["history"] = history
+        else:
+            logger.warning(f"Conversation {conversation_id} was reset during generation; discarding this turn from its history.")
 
         return response
 
@@ -513,23 +998,24 @@ class LLMConversationManager:
 
         model_id = self.conversations[conversation_id]["model_id"]
         logger.info(f"Resetting conversation: {conversation_id} (model: {model_id})")
+        # The replica's cached prefix is useless once the history is gone
+        pool = self.pools.get(model_id)
+        if pool is not None:
+            pool.forget(conversation_id)
         self.conversations[conversation_id]["history"] = [{
             "role": "system",
             "content": "You are a helpful English language assistant. Always respond clearly and concisely in English, regardless of the input language. If the user speaks another language, politely ask them to use English."
         }]
 
-    def model_info(self, model_id: str) -> Dict[str, Any]:
-        """Get information about a model"""
-        if model_id not in self.models:
-             logger.error(f"Cannot get info: Model {model_id} not found.")
-             raise ValueError(f"Model {model_id} not found")
-
-        model = self.models[model_id]
-        try:
-            size_mb = model.get_model_size()
-        except Exception as e:
-            logger.warning(f"Could not get size for model {model_id}: {e}")
-            size_mb = "N/A"
+    @staticmethod
+    def _describe(model_id: str, model: LLMModel) -> Dict[str, Any]:
+        size_mb = getattr(model, "size_mb", None)
+        if size_mb is None:
+            try:
+                size_mb = model.get_model_size()
+            except Exception as e:
+                logger.warning(f"Could not get size for model {model_id}: {e}")
+                size_mb = "N/A"
 
         return {
             "id": model_id,
@@ -538,7 +1024,9 @@ class LLMConversationManager:
             "size_mb": size_mb,
             "context_window": model.context_window,
             "n_threads": model.n_threads if model.using_llama_cpp else "N/A (Not llama.cpp)",
+            "n_batch": model.n_batch if model.using_llama_cpp else "N/A (Not llama.cpp)",
             "n_gpu_layers": model.n_gpu_layers if model.using_llama_cpp else "N/A (Not llama.cpp)",
+            "calibration": model.calibration,
             "temperature": model.temperature,
             "backend": "llama.cpp" if model.using_llama_cpp else \
                        "transformers" if model.using_transformers else \
@@ -549,6 +1037,104 @@ class LLMConversationManager:
 
         }
 
+    def model_info(self, model_id: str) -> Dict[str, Any]:
+        """Get information about a model"""
+        if model_id not in self.models:
+             logger.error(f"Cannot get info: Model {model_id} not found.")
+             raise ValueError(f"Model {model_id} not found")
+
+        info = self._info.get(model_id)
+        if info is None:
+            info = self._info[model_id] = self._describe(model_id, self.models[model_id])
+        return {**info, "replicas": self.pools[model_id].stats() if model_id in self.pools else None}
+
+class ConversationDispatcher:
+    """
+    Actor-style dispatch of chat turns on the generation executor.
+
+    Turns within one conversation run strictly in order, one generation per message;
+    different conversations run in parallel up to the executor's worker count. Messages
+    that arrive while a turn for the same conversation is still running wait in that
+    conversation's mailbox. The only requests that share a generation are retries: a
+    message submitted again with the same request ID (while queued, running, or after it
+    succeeded) gets the original future, so the turn is generated and recorded once.
+    """
+
+    RECENT_REQUESTS = 1024
+
+    def __init__(self, manager: LLMConversationManager, executor: ThreadPoolExecutor):
+        self.manager = manager
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._mailboxes: Dict[str, List[tuple]] = {}
+        self._scheduled: set = set()
+        self._requests: "OrderedDict[tuple, Future]" = OrderedDict()
+        self.retries_joined = 0
+
+    def submit(self, conversation_id: str, message: str, request_id: Optional[str] = None) -> Future:
+        """Queue a message for a conversation; the future resolves to the model response"""
+        with self._lock:
+            if request_id is not None:
+                key = (conversation_id, request_id)
+                existing = self._requests.get(key)
+                # A failed attempt is run again; anything else is the same turn
+                if existing is not None and not (existing.done() and existing.exception() is not None):
+                    self.retries_joined += 1
+                    return existing
+            future: Future = Future()
+            if request_id is not None:
+                self._requests[key] = future
+                self._requests.move_to_end(key)
+                while len(self._requests) > self.RECENT_REQUESTS:
+                    self._requests.popitem(last=False)
+            self._mailboxes.setdefault(conversation_id, []).append((message, future))
+            if conversation_id in self._scheduled:
+                return future
+            self._scheduled.add(conversation_id)
+        self._schedule(conversation_id)
+        return future
+
+    def _schedule(self, conversation_id: str) -> None:
+        try:
+            self.executor.submit(self._run_turn, conversation_id)
+        except RuntimeError as e:
+            with self._lock:
+                batch = self._mailboxes.pop(conversation_id, [])
+                self._scheduled.discard(conversation_id)
+            for _, future in batch:
+                future.set_exception(e)
+
+    def _run_turn(self, conversation_id: str) -> None:
+        with self._lock:
+            mailbox = self._mailboxes.get(conversation_id)
+            turn = mailbox.pop(0) if mailbox else None
+        if turn is not None:
+            message, future = turn
+            try:
+                response = self.manager.get_response(conversation_id, message)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(response)
+
+        with self._lock:
+            if not self._mailboxes.get(conversation_id):
+                self._mailboxes.pop(conversation_id, None)
+                self._scheduled.discard(conversation_id)
+                return
+        # Requeue behind other conversations instead of looping, so one chatty
+        # conversation can't monopolize a worker.
+        self._schedule(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_conversations": len(self._scheduled),
+                "queued_messages": sum(len(box) for box in self._mailboxes.values()),
+                "retries_joined": self.retries_joined,
+            }
+
+
 def analyze_gguf_file(file_path):
     """Extract metadata from a GGUF file to check compatibility (basic check)"""
     try:
@@ -682,7 +1268,14 @@ def download_gguf_model(url, save_path):
         return False
 
 app = Flask(__name__)
+# Identifies this process in /health: conversations live in memory, so a new boot ID tells
+# the backend this node lost them and should be sent the active ones again
+BOOT_ID = uuid.uuid4().hex
+STARTED_AT = time.time()
+# Conversations accepted per /api/conversations/ensure call
+MAX_ENSURE_BATCH = 1000
 manager = LLMConversationManager()
+dispatcher = ConversationDispatcher(manager, executor)
 
 
 @app.route('/api/initialize', methods=['POST'])
@@ -734,6 +1327,10 @@ def initialize_models():
             n_threads = int(model_config.get('n_threads', 4))
             n_gpu_layers = int(model_config.get('n_gpu_layers', 0))
             temperature = float(model_config.get('temperature', 0.7))
+            n_batch = int(model_config.get('n_batch', 512))
+            autotune = parse_flag(model_config.get('autotune', AUTOTUNE_BY_DEFAULT), 'autotune')
+            recalibrate = parse_flag(model_config.get('recalibrate', False), 'recalibrate')
+            replica_count = int(model_config.get('replicas', 1))
 
             logger.info(f"Loading model '{model_id}'...")
             model = LLMModel(
@@ -742,10 +1339,13 @@ def initialize_models():
                 context_window=context_window,
                 n_threads=n_threads,
                 n_gpu_layers=n_gpu_layers,
-                temperature=temperature
+                temperature=temperature,
+                n_batch=n_batch,
+                autotune=autotune,
+                recalibrate=recalibrate
             )
 
-            manager.add_model(model_id, model)
+            manager.add_model(model_id, model, load_replicas(model, replica_count))
             initialized_models.append(model_id)
             logger.info(f"Successfully loaded model '{model_id}'.")
 
@@ -797,8 +1397,8 @@ def modify_model_parameters(model_id):
 
     logger.info(f"Modifying parameters for model '{model_id}': {data}")
 
-    model = manager.models[model_id]
-    result = model.modify_parameters(
+    result = manager.modify_model_parameters(
+        model_id,
         temperature=temperature,
         context_window=context_window,
         n_threads=n_threads,
@@ -848,6 +1448,13 @@ def add_llm_model():
     n_threads = int(data.get('n_threads', 4))
     n_gpu_layers = int(data.get('n_gpu_layers', 0))
     temperature = float(data.get('temperature', 0.7))
+    n_batch = int(data.get('n_batch', 512))
+    try:
+        autotune = parse_flag(data.get('autotune', AUTOTUNE_BY_DEFAULT), 'autotune')
+        recalibrate = parse_flag(data.get('recalibrate', False), 'recalibrate')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    replica_count = int(data.get('replicas', 1))
     keep_file_on_error = data.get('keep_file_on_error', False)
     download_only = data.get('download_only', False)
     auto_correct_type = data.get('auto_correct_type', True)
@@ -957,10 +1564,13 @@ def add_llm_model():
             context_window=context_window,
             n_threads=n_threads,
             n_gpu_layers=n_gpu_layers,
-            temperature=temperature
+            temperature=temperature,
+            n_batch=n_batch,
+            autotune=autotune,
+            recalibrate=recalibrate
         )
 
-        manager.add_model(model_id, model)
+        manager.add_model(model_id, model, load_replicas(model, replica_count))
         logger.info(f"Successfully loaded and added model '{model_id}'.")
         model_info_dict = manager.model_info(model_id)
 
@@ -1103,6 +1713,38 @@ def create_conversation():
              return jsonify({"error": str(e)}), 400
 
 
+@app.route('/api/conversations/ensure', methods=['POST'])
+def ensure_conversations():
+    """
+    Create every listed conversation this node doesn't have, leaving existing
+    ones untouched, so the backend can repeat the call safely (e.g. after
+    this node restarted). Body: {"conversations": [{"conversation_id", "model_id"}, ...]}
+    """
+    data = request.json
+    if not data or not isinstance(data.get('conversations'), list):
+        return jsonify({"error": "conversations must be a list"}), 400
+    conversations = data['conversations']
+    if len(conversations) > MAX_ENSURE_BATCH:
+        return jsonify({"error": f"At most {MAX_ENSURE_BATCH} conversations per call"}), 400
+
+    created = 0
+    existing = 0
+    errors = {}
+    for item in conversations:
+        conversation_id = item.get('conversation_id') if isinstance(item, dict) else None
+        model_id = item.get('model_id') if isinstance(item, dict) else None
+        if not conversation_id or not model_id:
+            errors[str(conversation_id)] = "conversation_id and model_id are required"
+            continue
+        try:
+            if manager.ensure_conversation(model_id, conversation_id):
+                created += 1
+            else:
+                existing += 1
+        except ValueError as e:
+            errors[conversation_id] = str(e)
+    return jsonify({"created": created, "existing": existing, "errors": errors})
+
 @app.route('/api/conversation/<conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
     """Get the history of a specific conversation"""
@@ -1130,13 +1772,15 @@ def reset_conversation(conversation_id):
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """Send a message to a conversation and get a response (uses ThreadPoolExecutor)"""
+    """Send a message to a conversation and get a response (ordered per conversation via the dispatcher)"""
     data = request.json
     if not data:
         return jsonify({"error": "Request body must be JSON"}), 400
 
     conversation_id = data.get('conversation_id')
     message = data.get('message')
+    # Optional: a retry of a request carries the same ID and gets the original turn's response
+    request_id = data.get('request_id')
 
     if not conversation_id:
         return jsonify({"error": "conversation_id is required"}), 400
@@ -1144,14 +1788,16 @@ def chat():
         return jsonify({"error": "message is required"}), 400
     if not isinstance(message, str):
         return jsonify({"error": "message must be a string"}), 400
+    if request_id is not None and not isinstance(request_id, str):
+        return jsonify({"error": "request_id must be a string"}), 400
 
 
-    try:
-        def generate_response_sync(conv_id, msg):
-            logger.info(f"Submitting generation task for conv '{conv_id}' to executor.")
-            return manager.get_response(conv_id, msg)
+    if conversation_id not in manager.conversations:
+        return jsonify({"error": f"Conversation {conversation_id} not found"}), 404
 
-        future = executor.submit(generate_response_sync, conversation_id, message)
+    try:
+        logger.info(f"Dispatching chat turn for conv '{conversation_id}'.")
+        future = dispatcher.submit(conversation_id, message, request_id)
 
         response = future.result()
         logger.info(f"Received result from executor for conv '{conversation_id}'.")
@@ -1218,11 +1864,19 @@ def analyze_model():
 def health_check():
     """Basic health check endpoint"""
     model_count = len(manager.models)
+    budget = manager.core_budget.stats()
+    dispatch = dispatcher.stats()
     return jsonify({
         "status": "healthy",
+        "boot_id": BOOT_ID,
+        "uptime_seconds": round(time.time() - STARTED_AT, 1),
         "loaded_models": model_count,
         "active_conversations": len(manager.conversations),
-        "pending_generation_tasks": executor._work_queue.qsize() if hasattr(executor, '_work_queue') else 'N/A'
+        "pending_generation_tasks": executor._work_queue.qsize() if hasattr(executor, '_work_queue') else 'N/A',
+        "core_budget": budget,
+        "dispatcher": dispatch,
+        # Generations running or waiting for cores, plus chat turns not yet started; used by the backend to balance nodes
+        "queue_depth": budget["active_generations"] + budget["waiting_generations"] + dispatch["queued_messages"]
         })
 
 if __name__ == "__main__":
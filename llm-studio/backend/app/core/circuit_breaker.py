@@ -0,0 +1,83 @@
+# app/core/circuit_breaker.py
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream's circuit is open"""
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream is down or restarting.
+
+    The circuit opens after `failure_threshold` consecutive failures. Once
+    `reset_timeout` seconds have passed it lets a single probe through (half-open);
+    a successful probe closes the circuit, a failed one opens it again. A probe
+    that ends without either (cancelled, or failed in a way that says nothing
+    about the upstream) must be released so the next call can probe, and one
+    still running after `probe_timeout` seconds is presumed lost.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0,
+                 probe_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self) -> bool:
+        """
+        Raise CircuitOpenError if the call must not be attempted right now.
+        Returns True if the call is the half-open probe; the caller must then
+        call release_probe() once it is done, whatever the outcome.
+        """
+        state = self.state
+        if state == self.OPEN:
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        if state == self.HALF_OPEN:
+            if self._probe_in_flight and time.monotonic() - self._probe_started < self.probe_timeout:
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit half-open, probe in flight)")
+            self._probe_in_flight = True
+            self._probe_started = time.monotonic()
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """End a probe that recorded neither success nor failure, so the next call probes again"""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        was_probe = self._probe_in_flight
+        self._probe_in_flight = False
+        if was_probe or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN or was_probe:
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failures")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {"name": self.name, "state": self.state, "consecutive_failures": self._failures}
@@ -13,6 +13,17 @@ class Settings(BaseSettings):
     GOOGLE_MAIL_USER: str | None = None
     GOOGLE_MAIL_APP_PASSWORD: str | None = None
 
+    # Outbound mail: queued and sent by a background worker over one reused connection.
+    # SMTP_SECURITY is "ssl", "starttls" or "none" (e.g. the debug sink: python -m app.core.smtp_sink)
+    SMTP_HOST: str = "smtp.gmail.com"
+    SMTP_PORT: int = 465
+    SMTP_SECURITY: str = "ssl"
+    SMTP_TIMEOUT: float = 10.0
+    SMTP_IDLE_TIMEOUT: float = 60.0
+    EMAIL_QUEUE_SIZE: int = 1000
+    EMAIL_MAX_RETRIES: int = 3
+    EMAIL_RETRY_BASE_DELAY: float = 2.0
+
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
     MONGO_USER: str = "llmstudio"
@@ -27,7 +38,81 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "info"
     DEFAULT_SYSTEM_PROMPT: str = "You are a helpful AI assistant."
     LLM_TIMEOUT: int = 60
+    LLM_MANAGER_MAX_CONNECTIONS: int = 100
+    LLM_MANAGER_MAX_KEEPALIVE: int = 20
+    LLM_MANAGER_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_MANAGER_RETRIES: int = 3
+    LLM_MANAGER_RETRY_BASE_DELAY: float = 0.2
+    LLM_MANAGER_RETRY_MAX_DELAY: float = 2.0
+    LLM_MANAGER_BREAKER_FAILURES: int = 5
+    LLM_MANAGER_BREAKER_RESET_SECONDS: float = 10.0
+    # Comma-separated list of LLMManager nodes; conversations are spread across them by consistent hashing
+    LLM_MANAGER_URLS: str = "http://llm-api:5000"
+    LLM_MANAGER_VIRTUAL_NODES: int = 64
+    LLM_MANAGER_HEALTH_INTERVAL: float = 5.0
+    LLM_MANAGER_DRAIN_TIMEOUT: float = 120.0
+    # Concurrent generations per model: "model_id=limit,..." overrides the capacity learned from LLMManager
+    LLM_MODEL_CONCURRENCY: str = ""
+    LLM_DEFAULT_MODEL_CONCURRENCY: int = 1
+    LLM_MAX_WAITING_PER_MODEL: int = 100
+    # Fair-queuing weights: "user_id=weight,..." (default weight 1)
+    LLM_USER_WEIGHTS: str = ""
     WS_PING_INTERVAL: int = 30
+    # Stream relay: coalesce tokens into one frame per interval/size, and drop clients that fall too far behind
+    WS_STREAM_FLUSH_INTERVAL: float = 0.05
+    WS_STREAM_FLUSH_CHARS: int = 256
+    WS_STREAM_MAX_QUEUED_FRAMES: int = 16
+    WS_STREAM_MAX_BACKLOG_CHARS: int = 262144
+    WS_STREAM_SEND_TIMEOUT: float = 10.0
+    # Chat-path writes are batched and flushed in the background
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.25
+    WRITE_BEHIND_MAX_BATCH: int = 500
+    WRITE_BEHIND_MAX_PENDING: int = 10000
+    # Password hashing runs on a bounded thread pool; hashes with another bcrypt cost are upgraded at login
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # Attempts per AUTH_RATE_WINDOW_SECONDS on login/register/password changes
+    AUTH_IP_MAX_ATTEMPTS: int = 30
+    AUTH_USER_MAX_ATTEMPTS: int = 10
+    AUTH_RATE_WINDOW_SECONDS: float = 60.0
+    # Reverse proxies (comma-separated IPs/CIDRs, e.g. the nginx container) whose X-Forwarded-For is believed
+    # when picking the client address for per-IP limits; requests from any other peer are keyed by the peer itself
+    TRUSTED_PROXIES: str = ""
+    # Password reset codes: "mongo" (shared by all workers, expired by a TTL index) or "memory" (single worker only).
+    # A code is invalidated after RESET_CODE_MAX_ATTEMPTS wrong guesses
+    RESET_CODE_STORE: str = "mongo"
+    RESET_CODE_TTL_SECONDS: int = 600
+    RESET_CODE_MAX_ATTEMPTS: int = 5
+    # Users cached for authentication; entries older than the revalidate interval are checked
+    # against the user document's version stamp before use, so changes made by other workers show up
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 300.0
+    USER_CACHE_REVALIDATE_SECONDS: float = 5.0
+    # Message layout: "documents" (one document per message) or "buckets" (per-conversation arrays
+    # of up to MESSAGE_BUCKET_SIZE messages / ~MESSAGE_BUCKET_MAX_BYTES); see app/scripts/migrate_message_storage.py
+    MESSAGE_STORAGE: str = "documents"
+    MESSAGE_BUCKET_SIZE: int = 100
+    MESSAGE_BUCKET_MAX_BYTES: int = 262144
+    # MongoDB commands slower than this are logged with their filter shape; requests making at least
+    # DB_REQUEST_CALLS_WARN calls are logged too (0 disables). Both show up in /api/metrics/db
+    DB_SLOW_QUERY_MS: float = 100.0
+    DB_REQUEST_CALLS_WARN: int = 50
+    # Send a Server-Timing header (app/endpoint/serialize/db/upstream durations) with every HTTP response.
+    # Off by default: it shows any client the backend's internal latencies. The histograms are always kept
+    SERVER_TIMING_HEADER: bool = False
+    # The LLMManager model catalog and the llms collection are cached for this long, then refreshed in the
+    # background while the stale copy is served; changes made through this backend invalidate them at once
+    MODEL_CATALOG_TTL_SECONDS: float = 30.0
+    LLM_CATALOG_TTL_SECONDS: float = 60.0
+    # Background sync with LLMManager: the model catalog is diffed into db.llms every interval, and a node
+    # reporting a new boot ID is sent the conversations active in the last CONVERSATION_SYNC_ACTIVE_DAYS
+    # (older ones are recreated on their next message)
+    LLM_CATALOG_SYNC_INTERVAL: float = 60.0
+    CONVERSATION_SYNC_ACTIVE_DAYS: float = 7.0
+    CONVERSATION_SYNC_BATCH_SIZE: int = 500
+    # Create missing indexes and apply pending migrations at startup (otherwise: python -m app.scripts.migrate)
+    RUN_MIGRATIONS_ON_STARTUP: bool = True
 
     @root_validator(pre=True)
     def assemble_mongo_uri(cls, values):
@@ -1,6 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 import logging
 from app.core.config import settings
+from app.core.db_monitor import command_monitor
 import ssl
 
 logger = logging.getLogger(__name__)
@@ -20,7 +21,8 @@ async def connect_to_mongo():
             "serverSelectionTimeoutMS": 5000,
             "connectTimeoutMS": 10000,
             "retryWrites": True,
-            "retryReads": True
+            "retryReads": True,
+            "event_listeners": [command_monitor]
         }
         
         if settings.PRODUCTION:
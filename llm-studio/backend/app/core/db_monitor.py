@@ -0,0 +1,244 @@
+# app/core/db_monitor.py
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Commands that carry no user query and would only add noise
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+def command_collection(command_name: str, command: Dict[str, Any]) -> str:
+    """The collection a command targets, or "-" for database-level commands"""
+    target = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+def command_filter(command_name: str, command: Dict[str, Any]) -> Any:
+    """The query part of a command, where it has one"""
+    if command_name in ("find", "count", "distinct", "findAndModify", "delete", "update"):
+        if command_name == "update":
+            return (command.get("updates") or [{}])[0].get("q")
+        if command_name == "delete":
+            return (command.get("deletes") or [{}])[0].get("q")
+        return command.get("filter", command.get("query"))
+    if command_name == "aggregate":
+        stages = command.get("pipeline") or []
+        return stages[0].get("$match") if stages else None
+    return None
+
+def filter_shape(value: Any) -> Any:
+    """A query with its values replaced by placeholders, so slow queries group by shape and don't log user data"""
+    if isinstance(value, dict):
+        return {k: filter_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [filter_shape(v) for v in value[:3]] if value and isinstance(value[0], dict) else "?"
+    return "?"
+
+
+class RequestDBStats:
+    """Database calls made on behalf of one HTTP request or WebSocket message"""
+
+    __slots__ = ("calls", "total_ms", "_lock")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        # Commands may finish on motor's executor threads
+        self._lock = threading.Lock()
+
+    def add(self, duration_ms: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_ms += duration_ms
+
+# Motor runs each command on its executor with a copy of the caller's context, so
+# the listener sees the stats object of the request that issued the command
+current_request_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("current_request_stats", default=None)
+
+
+class _Totals:
+    __slots__ = ("count", "total_ms", "max_ms", "errors", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self.slow = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count, "errors": self.errors, "slow": self.slow,
+            "total_ms": round(self.total_ms, 2), "max_ms": round(self.max_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0
+        }
+
+
+class _RouteTotals:
+    __slots__ = ("requests", "db_calls", "db_ms", "max_calls")
+
+    def __init__(self):
+        self.requests = 0
+        self.db_calls = 0
+        self.db_ms = 0.0
+        self.max_calls = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests, "max_calls": self.max_calls,
+            "db_calls": self.db_calls, "db_ms": round(self.db_ms, 2),
+            "avg_calls": round(self.db_calls / self.requests, 2) if self.requests else 0.0,
+            "avg_db_ms": round(self.db_ms / self.requests, 2) if self.requests else 0.0
+        }
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Times every command sent to MongoDB.
+
+    Latency is aggregated by (collection, command); commands slower than
+    `slow_ms` are logged with the shape of their filter. Each command is also
+    added to the RequestDBStats of the request that issued it, and requests
+    are aggregated by route, so routes that issue many small queries (N+1)
+    stand out in the metrics.
+    """
+
+    def __init__(self, slow_ms: float = 100.0, request_calls_warn: int = 50):
+        self.slow_ms = slow_ms
+        self.request_calls_warn = request_calls_warn
+        self._lock = threading.Lock()
+        self._commands: Dict[Tuple[str, str], _Totals] = {}
+        self._routes: Dict[str, _RouteTotals] = {}
+        # Started commands by (connection, request id), until they succeed or fail
+        self._inflight: Dict[Tuple[Any, int], Tuple[str, Any]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = command_collection(event.command_name, event.command)
+        self._inflight[(event.connection_id, event.request_id)] = (
+            collection, command_filter(event.command_name, event.command)
+        )
+
+    def _finished(self, event, failed: bool) -> None:
+        started = self._inflight.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        collection, query = started
+        duration_ms = event.duration_micros / 1000
+        slow = duration_ms >= self.slow_ms
+        with self._lock:
+            totals = self._commands.get((collection, event.command_name))
+            if totals is None:
+                totals = self._commands[(collection, event.command_name)] = _Totals()
+            totals.count += 1
+            totals.total_ms += duration_ms
+            totals.max_ms = max(totals.max_ms, duration_ms)
+            totals.errors += failed
+            totals.slow += slow
+        request = current_request_stats.get()
+        if request is not None:
+            request.add(duration_ms)
+        if slow:
+            logger.warning(
+                f"Slow MongoDB {event.command_name} on {collection}: {duration_ms:.1f} ms, "
+                f"filter {filter_shape(query)}"
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event, failed=True)
+
+    def record_request(self, route: str, stats: RequestDBStats, elapsed_ms: float) -> None:
+        with self._lock:
+            totals = self._routes.get(route)
+            if totals is None:
+                totals = self._routes[route] = _RouteTotals()
+            totals.requests += 1
+            totals.db_calls += stats.calls
+            totals.db_ms += stats.total_ms
+            totals.max_calls = max(totals.max_calls, stats.calls)
+        if self.request_calls_warn and stats.calls >= self.request_calls_warn:
+            logger.warning(
+                f"{route} made {stats.calls} MongoDB calls ({stats.total_ms:.1f} ms of {elapsed_ms:.1f} ms)"
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            commands = [{"collection": c, "command": n, **t.as_dict()} for (c, n), t in self._commands.items()]
+            routes = [{"route": r, **t.as_dict()} for r, t in self._routes.items()]
+        commands.sort(key=lambda row: row["total_ms"], reverse=True)
+        routes.sort(key=lambda row: row["db_ms"], reverse=True)
+        return {"slow_ms": self.slow_ms, "commands": commands, "routes": routes}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._commands.clear()
+            self._routes.clear()
+
+command_monitor = CommandMonitor(settings.DB_SLOW_QUERY_MS, settings.DB_REQUEST_CALLS_WARN)
+
+
+@asynccontextmanager
+async def track_db(route: str):
+    """Attribute the database calls made inside the block to `route`"""
+    stats = RequestDBStats()
+    token = current_request_stats.set(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        current_request_stats.reset(token)
+        command_monitor.record_request(route, stats, (time.perf_counter() - start) * 1000)
+
+
+# Route template by endpoint function, filled as routes are first seen
+_route_paths: Dict[Any, str] = {}
+
+def route_template(scope) -> str:
+    """
+    "METHOD /path/{param}" for the route that handled a request, so metrics
+    are labelled by route rather than by raw path. Only known once routing
+    has run.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return f"{scope['method']} <unmatched>"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        for route in getattr(scope.get("app"), "routes", []):
+            if getattr(route, "endpoint", None) is endpoint:
+                path = route.path
+                break
+        path = _route_paths[endpoint] = path or getattr(endpoint, "__name__", "?")
+    return f"{scope['method']} {path}"
+
+
+class DBStatsMiddleware:
+    """ASGI middleware that tracks the database calls of each HTTP request by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            # WebSocket handlers track each message with track_db instead of the whole connection
+            await self.app(scope, receive, send)
+            return
+        stats = RequestDBStats()
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request_stats.reset(token)
+            command_monitor.record_request(route_template(scope), stats, (time.perf_counter() - start) * 1000)
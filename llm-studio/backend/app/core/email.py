@@ -1,19 +1,19 @@
 # app/core/email.py
-import smtplib
-import ssl
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from app.core.config import settings
+from app.core.mailer import mailer
 
 logger = logging.getLogger(__name__)
 
-async def send_reset_code_email(email: str, code: str):
+def build_reset_code_email(email: str, code: str) -> MIMEMultipart:
     """
-    Send an email using Gmail's SMTP server with an 8-digit reset code.
+    Build the email carrying an 8-digit reset code.
     The email is styled using HTML and inline CSS for enhanced visuals.
     """
     subject = "Your Password Reset Code"
+    minutes = settings.RESET_CODE_TTL_SECONDS // 60
     
     # Plain-text version (fallback)
     plain_text = f"""\
@@ -21,7 +21,7 @@ Hello,
 
 Your password reset code is: {code}
 
-This code is valid for 10 minutes.
+This code is valid for {minutes} minutes.
 
 Regards,
 LLM Studio Team
@@ -104,7 +104,7 @@ LLM Studio Team
       <p>Hello,</p>
       <p>Your password reset code is:</p>
       <div class="code">{code}</div>
-      <p>This code is valid for 10 minutes.</p>
+      <p>This code is valid for {minutes} minutes.</p>
       <p>If you did not request a password reset, please ignore this email.</p>
     </div>
     <div class="footer">
@@ -125,13 +125,14 @@ LLM Studio Team
     part2 = MIMEText(html_content, 'html')
     msg.attach(part1)
     msg.attach(part2)
-    
-    # Create a secure SSL context and send the email
-    context = ssl.create_default_context()
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(settings.GOOGLE_MAIL_USER, settings.GOOGLE_MAIL_APP_PASSWORD)
-            server.sendmail(settings.GOOGLE_MAIL_USER, email, msg.as_string())
-            logger.info(f"Email sent to {email} with reset code: {code}")
-    except Exception as e:
-        logger.error(f"Error sending email to {email} with reset code {code}: {e}")
+    return msg
+
+def send_reset_code_email(email: str, code: str) -> bool:
+    """
+    Queue the reset code email on the mailer; it is sent in the background.
+    Returns False if the queue is full and the email was dropped.
+    """
+    queued = mailer.enqueue(build_reset_code_email(email, code))
+    if queued:
+        logger.info(f"Reset code email queued for {email}")
+    return queued
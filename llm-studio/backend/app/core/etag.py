@@ -0,0 +1,53 @@
+# app/core/etag.py
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.core.responses import dumps
+
+# Clients revalidate on every poll; "private" since list contents depend on the user
+CACHE_CONTROL = "private, no-cache"
+
+def content_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+def make_etag(*parts: Any) -> str:
+    """A weak ETag from whatever identifies the state of a resource (timestamps, counts, versions)"""
+    return content_etag(dumps(parts))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag[2:] if etag.startswith("W/") else etag
+    return any((t[2:] if t.startswith("W/") else t) == tag
+               for t in (candidate.strip() for candidate in if_none_match.split(",")))
+
+def set_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = "Authorization"
+    return response
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client already has this version, else None"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return set_etag(Response(status_code=304), etag)
+    return None
+
+async def list_version(collection, match: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Identifies the state of the documents matching `match`, for lists whose
+    writes all bump `updated_at`: any update moves the newest updated_at and
+    any insert or delete changes the count. Both are answered from the
+    (field, updated_at, _id) indexes without fetching documents.
+    """
+    latest, count = await asyncio.gather(
+        collection.find_one(match, {"updated_at": 1}, sort=[("updated_at", -1), ("_id", -1)]),
+        collection.count_documents(match)
+    )
+    return (latest.get("updated_at"), latest["_id"]) if latest else None, count
@@ -0,0 +1,62 @@
+# app/core/indexes.py
+import logging
+from pymongo import ASCENDING, DESCENDING
+from app.core.db import get_database
+
+logger = logging.getLogger(__name__)
+
+# Indexes the queries in app/services rely on. mongo-init.js only runs against an
+# empty data volume, so they are (re)created at startup; create_index is a no-op
+# when the index already exists.
+INDEXES = {
+    "users": [
+        # Login and registration lookups (also created by mongo-init.js)
+        ([("username", ASCENDING)], {"unique": True}),
+        ([("email", ASCENDING)], {"unique": True}),
+    ],
+    "llms": [
+        ([("name", ASCENDING)], {}),
+    ],
+    "conversations": [
+        # Sidebar listing: a user's conversations by updated_at, keyset-paginated on (updated_at, _id)
+        ([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # Recently active conversations, paged by (updated_at, _id) for the LLMManager handshake
+        ([("updated_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "messages": [
+        # Message windows keyset-paginated on (created_at, _id), and the counters backfill
+        ([("conversation_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], {}),
+    ],
+    "tickets": [
+        # Ticket summaries keyset-paginated on (updated_at, _id), per user or by status for admins
+        ([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("status", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("updated_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "admin_messages": [
+        # A ticket's thread, and the per-ticket count/last message of the summaries
+        ([("ticket_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "message_buckets": [
+        # MESSAGE_STORAGE=buckets: appends find the open bucket and older pages walk back by (last_at, _id)...
+        ([("conversation_id", ASCENDING), ("last_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # ...newer pages and exports walk forward by (first_at, _id)
+        ([("conversation_id", ASCENDING), ("first_at", ASCENDING), ("_id", ASCENDING)], {}),
+    ],
+    "reset_codes": [
+        # RESET_CODE_STORE=mongo: expired reset codes are deleted by the TTL monitor
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+async def ensure_indexes():
+    """Create any missing indexes"""
+    db = await get_database()
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                # Only matters before MongoDB 4.2, where foreground builds lock the collection
+                name = await db[collection].create_index(keys, background=True, **options)
+                logger.debug(f"Index {collection}.{name} is in place")
+            except Exception as e:
+                logger.error(f"Could not create index on {collection} {keys}: {e}")
@@ -0,0 +1,201 @@
+# app/core/mailer.py
+import asyncio
+import smtplib
+import ssl
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from typing import Optional, Dict, Any
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class SMTPTransport:
+    """
+    One authenticated SMTP connection, reused across messages.
+
+    Not thread-safe: the mailer only calls it from its single sender thread.
+    The connection is checked with NOOP after it has been idle for a while,
+    closed after `idle_timeout`, and re-opened on demand.
+    """
+
+    def __init__(self, host: str, port: int, security: str = "ssl", username: Optional[str] = None,
+                 password: Optional[str] = None, timeout: float = 10.0, idle_timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.security = security
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._server: Optional[smtplib.SMTP] = None
+        # Idle connections are checked with NOOP before reuse after this many seconds
+        self.check_after = 5.0
+        self._last_used = 0.0
+        self.connections = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.security == "ssl":
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                server.starttls(context=ssl.create_default_context())
+        if self.username:
+            server.login(self.username, self.password or "")
+        self.connections += 1
+        logger.debug(f"SMTP connection to {self.host}:{self.port} opened")
+        return server
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.check_after:
+            # The server may have dropped an idle connection
+            try:
+                if self._server.noop()[0] != 250:
+                    self.close()
+            except OSError:
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send(self, message: Message) -> None:
+        try:
+            self._connection().send_message(message)
+        except Exception:
+            # Start the next attempt on a fresh connection rather than one left mid-transaction
+            self.close()
+            raise
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self) -> None:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+class Mailer:
+    """
+    Queue outgoing email and send it from a background worker.
+
+    `enqueue` never waits on the network, so request handlers only pay for
+    building the message. The worker sends over the transport's reused
+    connection in a dedicated thread, retrying transient failures (dropped
+    connections, 4xx replies) with exponential backoff. When the queue is
+    full new messages are dropped and logged rather than blocking callers.
+    """
+
+    def __init__(self, transport: SMTPTransport, max_queue: int = 1000,
+                 max_retries: int = 3, retry_base_delay: float = 2.0):
+        self.transport = transport
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._queue: "asyncio.Queue[Message]" = asyncio.Queue(maxsize=max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def enqueue(self, message: Message) -> bool:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"Email queue full, dropping message to {message['To']}")
+            return False
+        return True
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """Worth retrying: the connection failed or the server answered with a 4xx"""
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(400 <= code < 500 for code, _ in error.recipients.values())
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        if isinstance(error, smtplib.SMTPException):
+            return False
+        return isinstance(error, OSError)
+
+    async def _send(self, message: Message) -> None:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await loop.run_in_executor(self._executor, self.transport.send, message)
+                self.sent += 1
+                logger.info(f"Email '{message['Subject']}' sent to {message['To']}")
+                return
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_transient(e):
+                    self.failed += 1
+                    logger.error(f"Giving up on email to {message['To']} after {attempt + 1} attempts: {e}")
+                    return
+                delay = self.retry_base_delay * 2 ** attempt
+                logger.warning(f"Email to {message['To']} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                message = await asyncio.wait_for(self._queue.get(), timeout=self.transport.idle_timeout)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self._executor, self.transport.close_if_idle)
+                continue
+            try:
+                await self._send(message)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far has been sent or given up on"""
+        await self._queue.join()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Give queued messages up to `timeout` seconds to go out, then stop the worker"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping the mailer with {self._queue.qsize()} emails still queued")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.transport.close)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queued": self._queue.qsize(), "sent": self.sent, "failed": self.failed,
+                "dropped": self.dropped, "connections": self.transport.connections}
+
+mailer = Mailer(
+    SMTPTransport(
+        settings.SMTP_HOST,
+        settings.SMTP_PORT,
+        security=settings.SMTP_SECURITY,
+        username=settings.GOOGLE_MAIL_USER,
+        password=settings.GOOGLE_MAIL_APP_PASSWORD,
+        timeout=settings.SMTP_TIMEOUT,
+        idle_timeout=settings.SMTP_IDLE_TIMEOUT
+    ),
+    max_queue=settings.EMAIL_QUEUE_SIZE,
+    max_retries=settings.EMAIL_MAX_RETRIES,
+    retry_base_delay=settings.EMAIL_RETRY_BASE_DELAY
+)
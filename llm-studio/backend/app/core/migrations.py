@@ -0,0 +1,192 @@
+# app/core/migrations.py
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core.db import get_database
+from app.core.indexes import INDEXES, ensure_indexes
+
+logger = logging.getLogger(__name__)
+
+# A claim on a migration older than this is assumed to belong to a worker that died mid-run
+STALE_CLAIM = timedelta(hours=1)
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Any], Awaitable[None]]
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, description: str):
+    """Register a data migration; they run once each, in version order"""
+    def register(apply):
+        MIGRATIONS.append(Migration(version, description, apply))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return apply
+    return register
+
+
+def superseded_indexes(index_info: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Names of plain indexes whose keys are a leading prefix of another index
+    on the same collection, which serves the same queries. Unique, TTL,
+    sparse and partial indexes are kept since they do more than speed up reads.
+    """
+    keys = {name: [tuple(k) for k in info["key"]] for name, info in index_info.items()}
+    dropped = []
+    for name, info in index_info.items():
+        if name == "_id_" or any(option in info for option in
+                                 ("unique", "expireAfterSeconds", "sparse", "partialFilterExpression")):
+            continue
+        own = keys[name]
+        if any(other != name and len(other_keys) > len(own) and other_keys[:len(own)] == own
+               for other, other_keys in keys.items()):
+            dropped.append(name)
+    return dropped
+
+@migration(1, "Drop single-field indexes covered by the compound indexes")
+async def drop_superseded_indexes(db):
+    for collection in INDEXES:
+        index_info = await db[collection].index_information()
+        for name in superseded_indexes(index_info):
+            await db[collection].drop_index(name)
+            logger.info(f"Dropped index {collection}.{name}, covered by a compound index")
+
+@migration(2, "Backfill denormalized conversation counters")
+async def backfill_conversation_counters(db):
+    if await db.conversations.find_one({"message_count": {"$exists": False}}, {"_id": 1}) is None:
+        return
+    from app.scripts.backfill_conversation_counters import recompute_conversation_counters
+    await recompute_conversation_counters(db)
+
+
+async def _claim(db, migration: Migration) -> bool:
+    """Mark a migration as running, unless it is done or another worker has it"""
+    now = datetime.utcnow()
+    try:
+        await db.schema_migrations.insert_one({
+            "_id": migration.version, "description": migration.description,
+            "state": "running", "started_at": now
+        })
+        return True
+    except DuplicateKeyError:
+        stale = await db.schema_migrations.find_one_and_update(
+            {"_id": migration.version, "state": "running", "started_at": {"$lt": now - STALE_CLAIM}},
+            {"$set": {"started_at": now}}
+        )
+        return stale is not None
+
+async def apply_migrations(db, migrations: Optional[List[Migration]] = None) -> List[int]:
+    """
+    Run every migration that hasn't been applied yet, in version order, and
+    return the versions applied. Stops at the first migration that fails or
+    that another worker is still running, so later ones never run out of order.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    done = {doc["_id"] async for doc in db.schema_migrations.find({"state": "done"}, {"_id": 1})}
+    applied = []
+    for migration in migrations:
+        if migration.version in done:
+            continue
+        if not await _claim(db, migration):
+            logger.info(f"Migration {migration.version} is being applied by another worker")
+            break
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        try:
+            await migration.apply(db)
+        except Exception as e:
+            # Release the claim so the next start retries it
+            await db.schema_migrations.delete_one({"_id": migration.version, "state": "running"})
+            logger.error(f"Migration {migration.version} failed: {e}")
+            break
+        await db.schema_migrations.update_one(
+            {"_id": migration.version},
+            {"$set": {"state": "done", "finished_at": datetime.utcnow()}}
+        )
+        applied.append(migration.version)
+    return applied
+
+async def migration_status(db) -> List[Dict[str, Any]]:
+    records = {doc["_id"]: doc async for doc in db.schema_migrations.find()}
+    return [{
+        "version": m.version,
+        "description": m.description,
+        "state": records.get(m.version, {}).get("state", "pending"),
+        "finished_at": records.get(m.version, {}).get("finished_at")
+    } for m in MIGRATIONS]
+
+async def run_migrations() -> List[int]:
+    """Bring indexes and data up to date; called at startup and by app/scripts/migrate.py"""
+    await ensure_indexes()
+    db = await get_database()
+    return await apply_migrations(db)
+
+
+# The queries on the request path, as find()s with the filter and sort their
+# service code uses (aggregations included: their leading $match/$sort is what
+# picks the index). Placeholder values are enough for the query planner.
+HOT_QUERIES: List[Dict[str, Any]] = [
+    {"name": "conversation sidebar", "collection": "conversations",
+     "filter": {"user_id": "user"}, "sort": {"updated_at": -1, "_id": -1}, "limit": 51},
+    {"name": "message window", "collection": "messages",
+     "filter": {"conversation_id": "conversation"}, "sort": {"created_at": -1, "_id": -1}, "limit": 51},
+    {"name": "message buckets, older pages", "collection": "message_buckets",
+     "filter": {"conversation_id": "conversation"}, "sort": {"last_at": -1, "_id": -1}, "limit": 2},
+    {"name": "message buckets, newer pages", "collection": "message_buckets",
+     "filter": {"conversation_id": "conversation"}, "sort": {"first_at": 1, "_id": 1}, "limit": 2},
+    {"name": "user tickets", "collection": "tickets",
+     "filter": {"user_id": "user"}, "sort": {"updated_at": -1, "_id": -1}, "limit": 51},
+    {"name": "admin tickets by status", "collection": "tickets",
+     "filter": {"status": "open"}, "sort": {"updated_at": -1, "_id": -1}, "limit": 51},
+    {"name": "ticket thread", "collection": "admin_messages",
+     "filter": {"ticket_id": "ticket"}, "sort": {"created_at": 1}, "limit": 0},
+    {"name": "login by username", "collection": "users", "filter": {"username": "user"}, "sort": {}, "limit": 1},
+    {"name": "user by email", "collection": "users", "filter": {"email": "user@example.com"}, "sort": {}, "limit": 1},
+    {"name": "conversation by id", "collection": "conversations", "filter": {"_id": ObjectId()}, "sort": {}, "limit": 1},
+]
+
+def summarize_plan(winning_plan: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """The stages of a query plan (outermost first) and the indexes it scans"""
+    # Plans run by the slot-based engine nest the tree one level down
+    plan = winning_plan.get("queryPlan", winning_plan)
+    stages, indexes = [], []
+    pending = [plan]
+    while pending:
+        node = pending.pop(0)
+        stages.append(node.get("stage", "?"))
+        if node.get("indexName"):
+            indexes.append(node["indexName"])
+        if "inputStage" in node:
+            pending.append(node["inputStage"])
+        pending.extend(node.get("inputStages", []))
+    return stages, indexes
+
+async def explain_hot_queries(db) -> List[Dict[str, Any]]:
+    """
+    Explain each hot query and report the indexes it uses, and whether it
+    falls back to an in-memory SORT or a collection scan.
+    """
+    report = []
+    for query in HOT_QUERIES:
+        find: Dict[str, Any] = {"find": query["collection"], "filter": query["filter"]}
+        if query["sort"]:
+            find["sort"] = query["sort"]
+        if query["limit"]:
+            find["limit"] = query["limit"]
+        result = await db.command({"explain": find, "verbosity": "queryPlanner"})
+        stages, indexes = summarize_plan(result["queryPlanner"]["winningPlan"])
+        report.append({
+            "name": query["name"],
+            "collection": query["collection"],
+            "stages": stages,
+            "indexes": indexes,
+            "in_memory_sort": "SORT" in stages,
+            "collection_scan": "COLLSCAN" in stages
+        })
+    return report
@@ -0,0 +1,62 @@
+# app/core/password_hashing.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Callable, Any
+
+logger = logging.getLogger(__name__)
+
+class HashingBusyError(Exception):
+    """Raised when too many hashing operations are already queued"""
+
+
+class PasswordHasher:
+    """
+    Run bcrypt on a small dedicated thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so a few worker threads hash in parallel while
+    the loop keeps streaming. At most `max_pending` operations may be running
+    or queued; beyond that callers get HashingBusyError right away instead of
+    piling up behind a login burst.
+    """
+
+    def __init__(self, context, workers: int = 2, max_pending: int = 32):
+        self.context = context
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self.rejected = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusyError("Too many password operations in progress")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, and if the hash uses outdated settings (e.g. another bcrypt cost) return a new one"""
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def stats(self):
+        return {"workers": self.workers, "pending": self._pending, "rejected": self.rejected}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,45 @@
+# app/core/rate_limit.py
+import time
+from collections import deque
+from typing import Dict, Deque
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Sliding-window attempt limiter: at most `max_attempts` per key within
+    `window` seconds. State is per process; keys with no recent attempts are
+    swept as the table grows.
+    """
+
+    def __init__(self, max_attempts: int, window: float, sweep_threshold: int = 10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.sweep_threshold = sweep_threshold
+        self._attempts: Dict[str, Deque[float]] = {}
+
+    def _sweep(self, now: float) -> None:
+        cutoff = now - self.window
+        for key in [key for key, times in self._attempts.items() if not times or times[-1] <= cutoff]:
+            del self._attempts[key]
+
+    def hit(self, key: str) -> None:
+        """Record an attempt, or raise RateLimitExceeded if the key is over its limit"""
+        if self.max_attempts <= 0:
+            return
+        now = time.monotonic()
+        if len(self._attempts) >= self.sweep_threshold:
+            self._sweep(now)
+        times = self._attempts.setdefault(key, deque())
+        while times and times[0] <= now - self.window:
+            times.popleft()
+        if len(times) >= self.max_attempts:
+            raise RateLimitExceeded(times[0] + self.window - now)
+        times.append(now)
+
+    def reset(self, key: str) -> None:
+        self._attempts.pop(key, None)
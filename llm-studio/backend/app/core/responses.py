@@ -0,0 +1,59 @@
+# app/core/responses.py
+from typing import Any, AsyncIterable, AsyncIterator, Optional, Mapping
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import JSONResponse, StreamingResponse
+
+def _default(obj: Any) -> Any:
+    """Types orjson doesn't know natively; nested models are dumped as FastAPI would (by alias)"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(by_alias=True)
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. Used as the app's default response
+    class, and returned directly by listing/history endpoints: FastAPI then
+    skips validating the return value against response_model and encoding it
+    with jsonable_encoder, which is most of the CPU those endpoints spend.
+    Only return models built from data we wrote ourselves this way.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def _json_array(items: AsyncIterable[Any], batch_size: int) -> AsyncIterator[bytes]:
+    yield b"["
+    batch = []
+    first = True
+    async for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= batch_size:
+            yield (b"" if first else b",") + b",".join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield (b"" if first else b",") + b",".join(batch)
+    yield b"]"
+
+class JSONArrayStream(StreamingResponse):
+    """
+    A JSON array streamed item by item from an async iterable, so large
+    lists go out as they are read instead of being built in memory first.
+    The status is sent before the first item is read: errors after that
+    can only cut the response short.
+    """
+
+    def __init__(self, items: AsyncIterable[Any], batch_size: int = 50, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None):
+        super().__init__(_json_array(items, batch_size), status_code=status_code,
+                         headers=headers, media_type="application/json")
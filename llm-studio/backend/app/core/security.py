@@ -1,26 +1,106 @@
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Union, Tuple
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status, WebSocket
+from fastapi import Depends, HTTPException, Request, status, WebSocket
 from fastapi.security import OAuth2PasswordBearer
 from app.core.config import settings
 from app.models.user import User
+from app.core.password_hashing import PasswordHasher, HashingBusyError
+from app.core.rate_limit import RateLimiter, RateLimitExceeded
 from passlib.context import CryptContext
+import ipaddress
 import secrets
 import logging
 
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max rounds to the configured cost makes verify_and_update flag hashes made with any other cost
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.PASSWORD_BCRYPT_ROUNDS
+)
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
+ip_rate_limiter = RateLimiter(settings.AUTH_IP_MAX_ATTEMPTS, settings.AUTH_RATE_WINDOW_SECONDS)
+user_rate_limiter = RateLimiter(settings.AUTH_USER_MAX_ATTEMPTS, settings.AUTH_RATE_WINDOW_SECONDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+def parse_networks(spec: str) -> Tuple[Union[ipaddress.IPv4Network, ipaddress.IPv6Network], ...]:
+    """Parse "10.0.0.1,172.28.0.0/16,..." into networks (a bare address is a /32 or /128)"""
+    return tuple(ipaddress.ip_network(item.strip(), strict=False) for item in spec.split(",") if item.strip())
 
-def get_password_hash(password: str) -> str:
-    """Generate password hash"""
-    return pwd_context.hash(password)
+trusted_proxies = parse_networks(settings.TRUSTED_PROXIES)
+
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please try again shortly",
+        headers={"Retry-After": "1"}
+    )
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against hash (on the hashing pool)"""
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except HashingBusyError:
+        raise _hashing_busy()
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify password against hash; also returns a new hash if the stored one should be upgraded"""
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except HashingBusyError:
+        raise _hashing_busy()
+
+async def get_password_hash(password: str) -> str:
+    """Generate password hash (on the hashing pool)"""
+    try:
+        return await password_hasher.hash(password)
+    except HashingBusyError:
+        raise _hashing_busy()
+
+def enforce_rate_limit(limiter: RateLimiter, key: str) -> None:
+    """Count an authentication attempt for `key`, answering 429 once it is over the limit"""
+    try:
+        limiter.hit(key)
+    except RateLimitExceeded as e:
+        logger.warning(f"Authentication rate limit hit for {key}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(max(1, int(e.retry_after + 0.5)))}
+        )
+
+def _is_trusted(address: str, proxies) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+def client_ip(request: Request, proxies=None) -> str:
+    """
+    The address per-IP limits are keyed by. X-Forwarded-For is only believed
+    when the immediate peer is one of the trusted proxies; it is then walked
+    from the right (the entries our proxies appended) to the first address
+    that is not a trusted proxy, so a client can't pick its own bucket by
+    sending the header itself. Any other peer is keyed by its own address.
+    """
+    proxies = trusted_proxies if proxies is None else proxies
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted(peer, proxies):
+        return peer
+    forwarded = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",")]
+    for hop in reversed([hop for hop in forwarded if hop]):
+        if not _is_trusted(hop, proxies):
+            return hop
+    return peer
 
 def create_access_token(data: Union[Dict[str, Any], str], expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token with improved security"""
@@ -91,8 +171,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    from app.services.user_service import get_user_by_id
-    user = await get_user_by_id(user_id)
+    from app.services.user_service import get_cached_user
+    user = await get_cached_user(user_id)
     
     if user is None:
         raise HTTPException(
@@ -144,8 +224,8 @@ async def get_current_user_ws(websocket: WebSocket) -> User:
             detail="Could not validate credentials",
         )
     
-    from app.services.user_service import get_user_by_id
-    user = await get_user_by_id(user_id)
+    from app.services.user_service import get_cached_user
+    user = await get_cached_user(user_id)
     
     if user is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
@@ -0,0 +1,136 @@
+# app/core/smtp_sink.py
+import argparse
+import asyncio
+import logging
+from email import message_from_bytes
+from email.message import Message
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+class DebugSMTPSink:
+    """
+    A local SMTP server that accepts everything and keeps it in memory.
+
+    Enough of RFC 5321 for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any
+    credentials), MAIL, RCPT, DATA, RSET, NOOP and QUIT, without TLS. Point
+    the backend at it with SMTP_HOST/SMTP_PORT and SMTP_SECURITY=none, for
+    tests or for development without a real mailbox.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025):
+        self.host = host
+        self.port = port
+        self.messages: List[Message] = []
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._received = asyncio.Condition()
+
+    async def start(self) -> "DebugSMTPSink":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Debug SMTP sink listening on {self.host}:{self.port}")
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def wait_for(self, count: int, timeout: float = 5.0) -> List[Message]:
+        """Wait until at least `count` messages have arrived"""
+        async with self._received:
+            await asyncio.wait_for(self._received.wait_for(lambda: len(self.messages) >= count), timeout)
+        return self.messages
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(line: str) -> None:
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        async def read_line() -> Optional[str]:
+            line = await reader.readline()
+            return line.decode("utf-8", "replace").rstrip("\r\n") if line else None
+
+        await reply("220 debug-smtp-sink ready")
+        recipients: List[str] = []
+        try:
+            while True:
+                line = await read_line()
+                if line is None:
+                    break
+                verb = line.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    await reply("250-debug-smtp-sink")
+                    await reply("250-AUTH PLAIN LOGIN")
+                    await reply("250 8BITMIME")
+                elif verb == "HELO":
+                    await reply("250 debug-smtp-sink")
+                elif verb == "AUTH":
+                    parts = line.split()
+                    if len(parts) >= 2 and parts[1].upper() == "LOGIN":
+                        if len(parts) == 2:
+                            await reply("334 VXNlcm5hbWU6")
+                            await read_line()
+                        await reply("334 UGFzc3dvcmQ6")
+                        await read_line()
+                    elif len(parts) == 2:
+                        # AUTH PLAIN without an initial response
+                        await reply("334 ")
+                        await read_line()
+                    await reply("235 Authentication successful")
+                elif verb == "MAIL":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    recipients.append(line.split(":", 1)[-1].strip().strip("<>"))
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = bytearray()
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk in (b".\r\n", b".\n"):
+                            break
+                        data.extend(chunk[1:] if chunk.startswith(b"..") else chunk)
+                    message = message_from_bytes(bytes(data))
+                    message["X-Sink-Recipients"] = ", ".join(recipients)
+                    async with self._received:
+                        self.messages.append(message)
+                        self._received.notify_all()
+                    logger.info(f"Debug SMTP sink received '{message['Subject']}' for {', '.join(recipients)}")
+                    await reply("250 OK: queued")
+                elif verb in ("RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(host: str, port: int) -> None:
+    sink = await DebugSMTPSink(host, port).start()
+    try:
+        while True:
+            count = len(sink.messages)
+            await sink.wait_for(count + 1, timeout=None)
+            print(sink.messages[-1].as_string())
+    finally:
+        await sink.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Print every email sent to this local SMTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
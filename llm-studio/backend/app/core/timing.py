@@ -0,0 +1,286 @@
+# app/core/timing.py
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.routing import request_response
+
+from app.core.db_monitor import current_request_stats, route_template, track_db
+
+# Seconds; spans fast cached reads up to long LLM generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus exposes it"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket (as histogram_quantile does)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class MetricsRegistry:
+    """Histograms by name and label set, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help: str) -> None:
+        self._help[name] = help
+
+    def observe(self, name: str, labels: Dict[str, str], value: float) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @staticmethod
+    def _labels(labels: Labels, extra: str = "") -> str:
+        parts = ['{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        le = 'le="%s"' % bound
+                        lines.append(f"{name}_bucket{self._labels(labels, le)} {cumulative}")
+                    le = 'le="+Inf"'
+                    lines.append(f"{name}_bucket{self._labels(labels, le)} {h.count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {h.sum}")
+                    lines.append(f"{name}_count{self._labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name: str) -> List[Dict[str, Any]]:
+        """Count, mean and estimated p50/p95/p99 in milliseconds for each label set of a histogram"""
+        with self._lock:
+            series = list(self._histograms.get(name, {}).items())
+        rows = []
+        for labels, h in series:
+            row: Dict[str, Any] = dict(labels)
+            row["count"] = h.count
+            row["mean_ms"] = round(h.sum / h.count * 1000, 2) if h.count else None
+            for q in (0.5, 0.95, 0.99):
+                value = h.quantile(q)
+                row[f"p{int(q * 100)}_ms"] = round(value * 1000, 2) if value is not None else None
+            rows.append(row)
+        rows.sort(key=lambda row: row["count"], reverse=True)
+        return rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+metrics = MetricsRegistry()
+metrics.describe("http_request_duration_seconds", "Time from request start until the response was sent")
+metrics.describe("http_request_phase_seconds", "Time per request spent in the endpoint, serializing, MongoDB and LLMManager")
+metrics.describe("websocket_message_duration_seconds", "Time handling one WebSocket message, including streaming the reply")
+metrics.describe("websocket_message_phase_seconds", "Time per WebSocket message spent in MongoDB and LLMManager")
+
+
+class RequestTiming:
+    """Phase durations (seconds) for one request or WebSocket message"""
+
+    __slots__ = ("phases", "endpoint_done", "_lock")
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.endpoint_done: Optional[float] = None
+        # Upstream calls may be timed from several tasks of the same request
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("current_timing", default=None)
+
+@contextmanager
+def time_phase(phase: str):
+    """
+    Add the time spent in the block to the current request's `phase`. Calls
+    running concurrently within one request add up, so a phase can exceed the
+    request's wall time.
+    """
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(phase, time.perf_counter() - start)
+
+
+def _server_timing(timing: RequestTiming, total: float) -> str:
+    entries = [f"app;dur={total * 1000:.1f}"]
+    for phase in ("endpoint", "serialize", "upstream"):
+        if phase in timing.phases:
+            entries.append(f"{phase};dur={timing.phases[phase] * 1000:.1f}")
+    db = current_request_stats.get()
+    if db is not None and db.calls:
+        entries.append(f'db;dur={db.total_ms:.1f};desc="{db.calls} queries"')
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware timing each HTTP request into histograms labelled by
+    route template and, when `server_timing_header` is set (for debugging;
+    it exposes internal latencies to clients), a Server-Timing header: app
+    time until the response starts, endpoint, serialization, MongoDB and
+    LLMManager time.
+
+    Must sit inside DBStatsMiddleware, which opens the request's DB scope.
+    """
+
+    def __init__(self, app, server_timing_header: bool = False):
+        self.app = app
+        self.server_timing_header = server_timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing_header:
+                    header = _server_timing(timing, time.perf_counter() - start).encode()
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timing.reset(token)
+            elapsed = time.perf_counter() - start
+            route = route_template(scope)
+            metrics.observe("http_request_duration_seconds",
+                            {"route": route, "status": str(status)[0] + "xx"}, elapsed)
+            db = current_request_stats.get()
+            phases = dict(timing.phases)
+            if db is not None:
+                phases["db"] = db.total_ms / 1000
+            for phase, seconds in phases.items():
+                metrics.observe("http_request_phase_seconds", {"route": route, "phase": phase}, seconds)
+
+
+def _timed_endpoint(call):
+    """Wrap an endpoint function to record its own time, separately from serializing its result"""
+    def done(timing: Optional[RequestTiming], start: float) -> None:
+        if timing is not None:
+            timing.endpoint_done = time.perf_counter()
+            timing.add("endpoint", timing.endpoint_done - start)
+
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                done(current_timing.get(), start)
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                done(current_timing.get(), start)
+    return endpoint
+
+def _timed_handler(handler):
+    @functools.wraps(handler)
+    async def timed(request):
+        response = await handler(request)
+        timing = current_timing.get()
+        if timing is not None and timing.endpoint_done is not None:
+            # Validating the return value against response_model and rendering it
+            timing.add("serialize", time.perf_counter() - timing.endpoint_done)
+        return response
+    return timed
+
+def instrument_routes(app) -> None:
+    """
+    Split endpoint time from serialization time on every API route. Call it
+    once all routers are included; routes added later aren't instrumented.
+    """
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route, "_timed", False):
+            route.dependant.call = _timed_endpoint(route.dependant.call)
+            route.app = request_response(_timed_handler(route.get_route_handler()))
+            route._timed = True
+
+
+@asynccontextmanager
+async def track_ws_message(message_type: str):
+    """Time one WebSocket message and attribute its MongoDB calls and LLMManager time to it"""
+    timing = RequestTiming()
+    token = current_timing.set(timing)
+    start = time.perf_counter()
+    db = None
+    try:
+        async with track_db(f"WS {message_type}") as db:
+            yield timing
+    finally:
+        current_timing.reset(token)
+        labels = {"type": message_type}
+        metrics.observe("websocket_message_duration_seconds", labels, time.perf_counter() - start)
+        phases = dict(timing.phases)
+        if db is not None:
+            phases["db"] = db.total_ms / 1000
+        for phase, seconds in phases.items():
+            metrics.observe("websocket_message_phase_seconds", {**labels, "phase": phase}, seconds)
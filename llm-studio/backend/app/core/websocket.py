@@ -1,6 +1,8 @@
+import asyncio
 import logging
-from typing import Dict, List, Any, Callable, Awaitable
+from typing import Dict, List, Any, Callable, Awaitable, AsyncIterator, Optional
 from fastapi import WebSocket, WebSocketDisconnect, status
+from app.core.config import settings
 from app.core.security import decode_token
 
 logger = logging.getLogger(__name__)
@@ -56,4 +58,121 @@ class ConnectionManager:
         for client_id in disconnected:
             self.disconnect(client_id)
 
+class StreamRelay:
+    """
+    Relay an upstream token stream to a WebSocket in coalesced "stream" frames.
+
+    The upstream reader never waits on the socket: tokens are buffered and
+    flushed as one frame when `flush_chars` have accumulated or `flush_interval`
+    has passed, into a bounded queue drained by a separate writer. When the
+    queue is full (the client reads slower than tokens arrive) the buffer just
+    keeps growing, so the next frame carries more text. If the backlog passes
+    `max_backlog_chars` or a single send takes longer than `send_timeout`,
+    the client is dropped from the stream while the upstream is still read to
+    the end, so the full answer can be persisted.
+    """
+
+    def __init__(self, websocket: WebSocket, conversation_id: str,
+                 flush_interval: Optional[float] = None, flush_chars: Optional[int] = None,
+                 max_queued_frames: Optional[int] = None, max_backlog_chars: Optional[int] = None,
+                 send_timeout: Optional[float] = None):
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.flush_interval = flush_interval if flush_interval is not None else settings.WS_STREAM_FLUSH_INTERVAL
+        self.flush_chars = flush_chars if flush_chars is not None else settings.WS_STREAM_FLUSH_CHARS
+        self.max_backlog_chars = max_backlog_chars if max_backlog_chars is not None else settings.WS_STREAM_MAX_BACKLOG_CHARS
+        self.send_timeout = send_timeout if send_timeout is not None else settings.WS_STREAM_SEND_TIMEOUT
+        self._frames: asyncio.Queue = asyncio.Queue(
+            maxsize=max_queued_frames if max_queued_frames is not None else settings.WS_STREAM_MAX_QUEUED_FRAMES
+        )
+        self._parts: List[str] = []
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._queued_chars = 0
+        self._last_flush = 0.0
+        self._wake = asyncio.Event()
+        self._done = False
+        self.dropped = False
+        self.frames_sent = 0
+
+    def _due(self) -> bool:
+        return (self._pending_chars >= self.flush_chars
+                or asyncio.get_running_loop().time() - self._last_flush >= self.flush_interval)
+
+    def _flush(self) -> None:
+        """Move buffered tokens into one queued frame, unless the queue is full"""
+        if not self._pending or self._frames.full():
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        self._queued_chars += len(text)
+        self._frames.put_nowait(text)
+        self._last_flush = asyncio.get_running_loop().time()
+
+    def _drop(self, reason: str) -> None:
+        if not self.dropped:
+            logger.warning(f"Dropping slow client from stream of conversation {self.conversation_id}: {reason}")
+        self.dropped = True
+        self._pending.clear()
+        self._pending_chars = 0
+        self._wake.set()
+
+    async def _write(self) -> None:
+        while not self.dropped:
+            if self._frames.empty() and self._pending and (self._done or self._due()):
+                self._flush()
+            if not self._frames.empty():
+                text = self._frames.get_nowait()
+                self._queued_chars -= len(text)
+                try:
+                    await asyncio.wait_for(self.websocket.send_json({
+                        "type": "stream",
+                        "conversation_id": self.conversation_id,
+                        "content": text
+                    }), self.send_timeout)
+                    self.frames_sent += 1
+                except asyncio.TimeoutError:
+                    self._drop(f"send took longer than {self.send_timeout}s")
+                except Exception as e:
+                    self._drop(f"send failed: {e}")
+                continue
+            if self._done and not self._pending:
+                return
+            self._wake.clear()
+            timeout = None
+            if self._pending:
+                timeout = max(0.0, self._last_flush + self.flush_interval - asyncio.get_running_loop().time())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def relay(self, chunks: AsyncIterator[str]) -> str:
+        """Relay every chunk and return the complete text, even if the client was dropped"""
+        self._last_flush = asyncio.get_running_loop().time()
+        writer = asyncio.create_task(self._write())
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                self._parts.append(chunk)
+                if self.dropped:
+                    continue
+                was_empty = not self._pending
+                self._pending.append(chunk)
+                self._pending_chars += len(chunk)
+                if self._pending_chars + self._queued_chars > self.max_backlog_chars:
+                    self._drop(f"backlog over {self.max_backlog_chars} characters")
+                elif self._pending_chars >= self.flush_chars:
+                    self._flush()
+                    self._wake.set()
+                elif was_empty:
+                    self._wake.set()
+        finally:
+            self._done = True
+            self._wake.set()
+            await writer
+        return "".join(self._parts)
+
 connection_manager = ConnectionManager()
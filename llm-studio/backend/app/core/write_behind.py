@@ -0,0 +1,194 @@
+# app/core/write_behind.py
+import asyncio
+import logging
+from typing import Dict, List, Any, Hashable, Optional, Tuple
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.core.db import get_database
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+class WriteBehindWriter:
+    """
+    Buffer chat-path writes and apply them in batches with bulk_write.
+
+    Inserts get their _id up front, so replaying a batch after a failure is
+    safe: documents that already made it in are reported as duplicate keys and
+    ignored. Updates are not idempotent: when bulk_write reports per-write
+    errors only the failed writes are retried, but when the outcome of a batch
+    is unknown (a network error or timeout after the server may have applied
+    it) the whole batch is replayed, so `$inc` counters are at-least-once and
+    can overcount. `replayed_updates` counts those replays;
+    app/scripts/backfill_conversation_counters.py recomputes the conversation
+    counters from the messages. Keyed updates (e.g. a conversation's counters) collapse into one
+    per key: `$inc` amounts add up and every other operator's fields take the
+    latest value. Batches are flushed every `flush_interval` seconds or
+    as soon as `max_batch` writes are buffered; failed batches stay buffered
+    and are retried. `stop()` drains the buffer before the database
+    connection is closed.
+    """
+
+    def __init__(self, flush_interval: float = 0.25, max_batch: int = 500,
+                 max_pending: int = 10000, shutdown_retries: int = 5):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.shutdown_retries = shutdown_retries
+        self._inserts: Dict[str, List[InsertOne]] = {}
+        self._updates: Dict[str, Dict[Hashable, Tuple[Dict[str, Any], Dict[str, Any], bool]]] = {}
+        self._pending = 0
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.replayed_updates = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _admit(self) -> None:
+        if self._pending >= self.max_batch:
+            self._wake.set()
+        if self._pending >= self.max_pending:
+            # Flush inline so writers slow down to the database's pace instead of buffering without bound
+            await self.flush()
+
+    async def insert(self, collection: str, document: Dict[str, Any]) -> ObjectId:
+        """Queue an insert and return the document's _id"""
+        document.setdefault("_id", ObjectId())
+        self._inserts.setdefault(collection, []).append(InsertOne(document))
+        self._pending += 1
+        await self._admit()
+        return document["_id"]
+
+    @staticmethod
+    def _merge(older: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine two update documents for the same key into one"""
+        merged = {operator: dict(fields) for operator, fields in older.items()}
+        for operator, fields in newer.items():
+            target = merged.setdefault(operator, {})
+            for field, value in fields.items():
+                if operator == "$inc" and field in target:
+                    target[field] += value
+                else:
+                    target[field] = value
+        return merged
+
+    async def update(self, collection: str, filter: Dict[str, Any], update: Dict[str, Any],
+                     key: Optional[Hashable] = None, upsert: bool = False) -> None:
+        """Queue an update; it is merged into an unflushed earlier update with the same key"""
+        updates = self._updates.setdefault(collection, {})
+        key = key if key is not None else object()
+        if key in updates:
+            update = self._merge(updates[key][1], update)
+            upsert = upsert or updates[key][2]
+        else:
+            self._pending += 1
+        updates[key] = (filter, update, upsert)
+        await self._admit()
+
+    def _take(self) -> Dict[str, List[Tuple[Optional[Hashable], Any]]]:
+        """Swap out the buffer as (update key, (filter, update, upsert)) or (None, InsertOne) pairs per collection"""
+        batches: Dict[str, List[Tuple[Optional[Hashable], Any]]] = {}
+        for collection, ops in self._inserts.items():
+            batches.setdefault(collection, []).extend((None, op) for op in ops)
+        for collection, ops in self._updates.items():
+            batches.setdefault(collection, []).extend(ops.items())
+        self._inserts = {}
+        self._updates = {}
+        self._pending = 0
+        return batches
+
+    def _requeue(self, collection: str, entries: List[Tuple[Optional[Hashable], Any]]) -> None:
+        for key, op in entries:
+            if key is None:
+                self._inserts.setdefault(collection, []).append(op)
+                self._pending += 1
+            else:
+                updates = self._updates.setdefault(collection, {})
+                filter, update, upsert = op
+                if key in updates:
+                    # A newer update with the same key was queued meanwhile; fold this one in under it
+                    update = self._merge(update, updates[key][1])
+                    upsert = upsert or updates[key][2]
+                else:
+                    self._pending += 1
+                updates[key] = (filter, update, upsert)
+
+    async def flush(self) -> bool:
+        """Write everything buffered so far; returns False if some batch failed and was kept for retry"""
+        async with self._flush_lock:
+            batches = self._take()
+            if not batches:
+                return True
+            db = await get_database()
+            ok = True
+            for collection, entries in batches.items():
+                ops = [op if key is None else UpdateOne(op[0], op[1], upsert=op[2]) for key, op in entries]
+                try:
+                    await db[collection].bulk_write(ops, ordered=False)
+                except BulkWriteError as e:
+                    errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY_ERROR]
+                    if errors:
+                        ok = False
+                        failed = {err["index"] for err in errors}
+                        self._requeue(collection, [entry for i, entry in enumerate(entries) if i in failed])
+                        logger.error(f"Write-behind: {len(errors)} writes to {collection} failed, will retry: {errors[0].get('errmsg')}")
+                except Exception as e:
+                    ok = False
+                    self.replayed_updates += sum(1 for key, _ in entries if key is not None)
+                    self._requeue(collection, entries)
+                    logger.error(f"Write-behind: batch of {len(ops)} writes to {collection} failed, will retry: {e}")
+                else:
+                    self.flushed += len(ops)
+            if not ok:
+                self.failed_flushes += 1
+            return ok
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush error: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and drain the buffer (called before closing the database)"""
+        if self._task is not None:
+            # Let the loop finish its current flush rather than cancelling a batch halfway
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        for attempt in range(1, self.shutdown_retries + 1):
+            if await self.flush():
+                return
+            await asyncio.sleep(min(2.0, 0.1 * 2 ** attempt))
+        logger.critical(f"Write-behind: {self._pending} buffered writes could not be persisted on shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self._pending, "flushed": self.flushed, "failed_flushes": self.failed_flushes,
+                "replayed_updates": self.replayed_updates}
+
+write_behind = WriteBehindWriter(
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+    max_pending=settings.WRITE_BEHIND_MAX_PENDING
+)
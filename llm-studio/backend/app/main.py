@@ -1,13 +1,24 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 
 from app.core.config import settings
 from app.core.db import connect_to_mongo, close_mongo_connection
+from app.core.write_behind import write_behind
+from app.core.migrations import run_migrations
+from app.core.db_monitor import DBStatsMiddleware
+from app.core.responses import FastJSONResponse
+from app.core.timing import TimingMiddleware, instrument_routes, metrics as timing_metrics
+from app.core.security import password_hasher
+from app.core.mailer import mailer
 from app.routes import auth, users, conversations
 from app.routes import llm_manager
 from app.routes import websocket
 from app.routes import admin_chat
+from app.routes import metrics
+from app.services.llm_manager_service import llm_manager_service
+from app.services.catalog_sync import catalog_sync
 
 logging.basicConfig(
     level=getattr(logging, settings.LOG_LEVEL.upper()),
@@ -18,7 +29,8 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=FastJSONResponse
 )
 
 app.add_middleware(
@@ -27,17 +39,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag"],
 )
+# The last middleware added runs first: DBStatsMiddleware opens the per-request DB scope TimingMiddleware reads
+app.add_middleware(TimingMiddleware, server_timing_header=settings.SERVER_TIMING_HEADER)
+app.add_middleware(DBStatsMiddleware)
 
 @app.on_event("startup")
 async def startup():
     logger.info("Starting application")
     await connect_to_mongo()
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        await run_migrations()
+    write_behind.start()
+    mailer.start()
+    llm_manager_service.start_health_monitor()
+    catalog_sync.start()
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Shutting down application")
+    await catalog_sync.stop()
+    await llm_manager_service.close()
+    await write_behind.stop()
+    await mailer.stop()
     await close_mongo_connection()
+    password_hasher.shutdown()
 
 app.include_router(auth, prefix=f"{settings.API_V1_STR}/auth", tags=["authentication"])
 app.include_router(users, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
@@ -45,15 +72,23 @@ app.include_router(conversations, prefix=f"{settings.API_V1_STR}/conversations",
 app.include_router(llm_manager.router, prefix=f"{settings.API_V1_STR}/llm-manager", tags=["llm-manager"])
 app.include_router(websocket.router, tags=["websocket"])
 app.include_router(admin_chat.router, prefix=f"{settings.API_V1_STR}/admin-chat", tags=["admin-chat"])
+app.include_router(metrics.router, prefix=f"{settings.API_V1_STR}/metrics", tags=["metrics"])
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request latency histograms in the Prometheus text format"""
+    return PlainTextResponse(timing_metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {
         "message": "Welcome to LLM Studio API",
         "version": "1.0.0",
         "docs": f"{settings.API_V1_STR}/docs"
-    }
\ No newline at end of file
+    }
+
+instrument_routes(app)
\ No newline at end of file
@@ -65,4 +65,26 @@ class Ticket(TicketBase):
     class Config:
         orm_mode = True
         allow_population_by_field_name = True
-        json_encoders = {ObjectId: str}
\ No newline at end of file
+        json_encoders = {ObjectId: str}
+
+class TicketLastMessage(BaseModel):
+    content: str # Preview, truncated for list views
+    is_admin: bool = False
+    admin_name: Optional[str] = None
+    created_at: datetime
+
+class TicketSummary(TicketBase):
+    """List entry for a ticket: counts and the last message instead of the whole thread"""
+    id: str = Field(..., alias="_id")
+    user_id: str
+    status: TicketStatus
+    created_at: datetime
+    updated_at: datetime
+    message_count: int = 0
+    last_message: Optional[TicketLastMessage] = None
+    unread: bool = False # The other side wrote last (the user, for admin lists; an admin, for user lists)
+
+    class Config:
+        orm_mode = True
+        allow_population_by_field_name = True
+        json_encoders = {ObjectId: str}
@@ -28,12 +28,38 @@ class Conversation(ConversationBase):
     id: str
     user_id: str
     messages: List[Message] = []
+    # Cursor for the page of messages older than `messages`, if any
+    messages_before: Optional[str] = None
+    # Denormalized counters (None on conversations the backfill script hasn't reached yet)
+    message_count: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    last_message_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+class MessagePage(BaseModel):
+    """A window of a conversation's messages, oldest first, with cursors to the adjacent windows"""
+    messages: List[Message]
+    before: Optional[str] = None
+    after: Optional[str] = None
+
+class LastMessagePreview(BaseModel):
+    role: str
+    content: str
+    created_at: datetime
+
+class ConversationSummary(ConversationBase):
+    """Sidebar entry: conversation fields plus a preview of the last message, without message bodies"""
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    message_count: Optional[int] = None
+    last_message: Optional[LastMessagePreview] = None
+
 class PromptRequest(BaseModel):
     conversation_id: Optional[str] = None
     prompt: str
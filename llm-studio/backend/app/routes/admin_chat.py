@@ -1,12 +1,14 @@
 # app/routes/admin_chat.py
 import logging # <--- Import logging
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from typing import List, Optional
 from bson import ObjectId # Import ObjectId if you need to validate it here
 from pymongo.errors import OperationFailure # <--- ADD THIS IMPORT
-from app.models.admin_chat import Ticket, TicketCreate, TicketUpdate, Message, MessageCreate, TicketStatus
+from app.models.admin_chat import Ticket, TicketCreate, TicketUpdate, TicketSummary, Message, MessageCreate, TicketStatus
 from app.services import admin_chat_service # Adjust import path as needed
 from app.models.user import User # Assuming you have a User model defined in app/models/user.py
+from app.core.responses import FastJSONResponse, JSONArrayStream
+from app.core.etag import make_etag, not_modified, set_etag
 
 # --- Import security functions ---
 from app.core.security import get_current_user, check_admin_access
@@ -31,6 +33,7 @@ def validate_object_id(id_str: str, id_name: str = "ID"):
 
 @router.get("/tickets", response_model=List[Ticket])
 async def read_user_tickets(
+    request: Request,
     current_user: User = Depends(get_current_user)
     
 ):
@@ -42,16 +45,45 @@ async def read_user_tickets(
     if not current_user.id:
          logger.error(f"User ID missing for authenticated user {current_user.username}")
          raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User ID not found in token")
+    user_id_str = str(current_user.id)
+    etag = make_etag("tickets", user_id_str, await admin_chat_service.get_ticket_list_version(user_id=user_id_str))
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    logger.debug(f"Streaming tickets for user_id: {user_id_str}")
+    # Streamed as they are read; a failure midway cuts the array short (and is logged by the server)
+    query = admin_chat_service.ticket_list_query(user_id=user_id_str)
+    return set_etag(JSONArrayStream(admin_chat_service.iter_tickets(query)), etag)
+
+
+@router.get("/ticket-summaries", response_model=List[TicketSummary])
+async def read_user_ticket_summaries(
+    request: Request,
+    statuses: Optional[List[TicketStatus]] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a page of the current user's tickets without their messages.
+    Pass the X-Next-Cursor header of a page as `before` to get the next one.
+    Answers 304 to an If-None-Match with the ETag of an unchanged page.
+    """
+    user_id_str = str(current_user.id)
+    version = await admin_chat_service.get_ticket_list_version(user_id=user_id_str, statuses=statuses)
+    etag = make_etag("ticket-summaries", user_id_str, statuses, limit, before, version)
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
     try:
-        user_id_str = str(current_user.id)
-        logger.debug(f"Calling admin_chat_service.get_user_tickets for user_id: {user_id_str}")
-        tickets = await admin_chat_service.get_user_tickets(user_id=user_id_str)
-        logger.info(f"Successfully retrieved {len(tickets)} tickets for user: {current_user.username}")
-        return tickets
+        summaries, next_cursor = await admin_chat_service.get_ticket_summaries(
+            user_id=user_id_str, statuses=statuses, limit=limit, before=before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        logger.error(f"Failed to retrieve tickets for user {current_user.username} (ID: {current_user.id}): {e}", exc_info=True) # Log with traceback
+        logger.error(f"Failed to retrieve ticket summaries for user {current_user.username}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve user tickets")
-
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return set_etag(FastJSONResponse(summaries, headers=headers), etag)
 
 @router.post("/tickets", response_model=Ticket, status_code=status.HTTP_201_CREATED)
 async def create_new_ticket(
@@ -106,7 +138,7 @@ async def read_ticket(
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this ticket")
 
         logger.info(f"Successfully authorized and retrieved ticket {ticket_id} for user {current_user.username}")
-        return ticket
+        return FastJSONResponse(ticket)
     except HTTPException as e: # Re-raise HTTPExceptions directly
         raise e
     except ValueError as e: # Catch potential errors from service layer (if not caught earlier)
@@ -169,6 +201,7 @@ admin_only = Depends(check_admin_access) # check_admin_access already includes g
 
 @router.get("/admin/tickets", response_model=List[Ticket], dependencies=[admin_only])
 async def read_all_tickets_admin(
+    request: Request,
     status: Optional[TicketStatus] = Query(None),
     # Get user from dependency if needed later, but check_admin_access already does the check
     # current_admin: User = Depends(check_admin_access)
@@ -178,15 +211,43 @@ async def read_all_tickets_admin(
     Requires admin privileges.
     """
     logger.info(f"Admin attempting to read all tickets. Filter status: {status}")
+    statuses = [status] if status else None
+    etag = make_etag("admin-tickets", statuses, await admin_chat_service.get_ticket_list_version(statuses=statuses))
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    logger.debug(f"Streaming admin tickets with status filter: {status}")
+    query = admin_chat_service.ticket_list_query(statuses=statuses)
+    return set_etag(JSONArrayStream(admin_chat_service.iter_tickets(query)), etag)
+
+
+@router.get("/admin/ticket-summaries", response_model=List[TicketSummary], dependencies=[admin_only])
+async def read_ticket_summaries_admin(
+    request: Request,
+    statuses: Optional[List[TicketStatus]] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None
+):
+    """
+    Get a page of all tickets (admin view) without their messages, optionally filtered by status.
+    `unread` marks tickets whose last message came from the user.
+    Answers 304 to an If-None-Match with the ETag of an unchanged page.
+    Requires admin privileges.
+    """
+    version = await admin_chat_service.get_ticket_list_version(statuses=statuses)
+    etag = make_etag("admin-ticket-summaries", statuses, limit, before, version)
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
     try:
-        logger.debug(f"Calling admin_chat_service.get_admin_tickets with status filter: {status}")
-        tickets = await admin_chat_service.get_admin_tickets(status=status)
-        logger.info(f"Admin successfully retrieved {len(tickets)} tickets (filter: {status})")
-        return tickets
+        summaries, next_cursor = await admin_chat_service.get_ticket_summaries(
+            statuses=statuses, for_admin=True, limit=limit, before=before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        logger.error(f"Admin failed to retrieve all tickets (filter: {status}): {e}", exc_info=True)
+        logger.error(f"Admin failed to retrieve ticket summaries (filter: {statuses}): {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve tickets for admin")
-
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return set_etag(FastJSONResponse(summaries, headers=headers), etag)
 
 @router.put("/admin/tickets/{ticket_id}", response_model=Ticket, dependencies=[admin_only])
 async def update_ticket_admin(
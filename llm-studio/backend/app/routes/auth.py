@@ -1,10 +1,18 @@
 # app/routes/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 import logging
 from pydantic import BaseModel, EmailStr
-from app.core.security import create_access_token, verify_password, get_current_user
+from app.core.security import (
+    create_access_token,
+    verify_and_update_password,
+    get_current_user,
+    enforce_rate_limit,
+    client_ip,
+    ip_rate_limiter,
+    user_rate_limiter
+)
 from app.core.config import settings
 from app.models.token import Token
 from app.models.user import UserCreate, UserResponse, User, UserUpdate
@@ -13,6 +21,7 @@ from app.services.user_service import (
     get_user_by_email,
     create_user,
     change_password,
+    set_password_hash,
     set_reset_code,
     reset_password_with_code
 )
@@ -22,15 +31,27 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    enforce_rate_limit(ip_rate_limiter, f"ip:{client_ip(request)}")
+    enforce_rate_limit(user_rate_limiter, f"login:{form_data.username}")
     try:
         user = await get_user_by_username(form_data.username)
-        if not user or not verify_password(form_data.password, user.hashed_password):
+        verified, new_hash = (False, None)
+        if user:
+            verified, new_hash = await verify_and_update_password(form_data.password, user.hashed_password)
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        user_rate_limiter.reset(f"login:{form_data.username}")
+        if new_hash:
+            # Stored hash used another bcrypt cost; upgrade it now that we have the password
+            try:
+                await set_password_hash(user.id, new_hash)
+            except Exception as e:
+                logger.warning(f"Could not rehash password for user {user.id}: {e}")
         if not user.is_active:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -64,7 +85,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         )
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate):
+async def register(request: Request, user_data: UserCreate):
+    enforce_rate_limit(ip_rate_limiter, f"ip:{client_ip(request)}")
     try:
         existing_user = await get_user_by_username(user_data.username)
         if existing_user:
@@ -87,6 +109,8 @@ async def register(user_data: UserCreate):
             is_active=user.is_active,
             created_at=user.created_at
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         raise HTTPException(
@@ -104,19 +128,21 @@ class ResetPasswordCodeRequest(BaseModel):
     new_password: str
 
 @router.post("/forgot-password-code", tags=["authentication"])
-async def forgot_password_code(request: ForgotPasswordCodeRequest, background_tasks: BackgroundTasks):
+async def forgot_password_code(request: ForgotPasswordCodeRequest):
     logger.info(f"Received forgot-password-code request for email: {request.email}")
     user = await get_user_by_email(request.email)
     if user:
         reset_code = await set_reset_code(user.id)
-        background_tasks.add_task(send_reset_code_email, user.email, reset_code)
-        logger.info(f"Reset code generated and email task added for user: {user.email}")
+        # Only queues the email; the mailer sends it without holding up the response
+        send_reset_code_email(user.email, reset_code)
+        logger.info(f"Reset code generated and email queued for user: {user.email}")
     else:
         logger.info(f"No user found with email: {request.email}")
     return {"message": "If the email exists in our records, a reset code has been sent"}
 
 @router.post("/reset-password-code", tags=["authentication"])
-async def reset_password_code(request: ResetPasswordCodeRequest):
+async def reset_password_code(request: ResetPasswordCodeRequest, http_request: Request):
+    enforce_rate_limit(ip_rate_limiter, f"ip:{client_ip(http_request)}")
     logger.info(f"Received reset-password-code request for email: {request.email}")
     result = await reset_password_with_code(request.email, request.code, request.new_password)
     return result
@@ -127,5 +153,6 @@ class ChangePasswordRequest(BaseModel):
 
 @router.post("/change-password", tags=["authentication"])
 async def change_password_endpoint(data: ChangePasswordRequest, current_user: User = Depends(get_current_user)):
+    enforce_rate_limit(user_rate_limiter, f"password:{current_user.id}")
     updated_user = await change_password(current_user.id, data.old_password, data.new_password)
     return {"message": "Password changed successfully"}
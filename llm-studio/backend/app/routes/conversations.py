@@ -1,14 +1,20 @@
 # app/routes/conversations.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from typing import List, Optional
 from pydantic import BaseModel
 
 from app.models.user import User
-from app.models.conversation import Conversation, ConversationCreate, ConversationUpdate, PromptResponse
+from app.models.conversation import Conversation, ConversationCreate, ConversationUpdate, ConversationSummary, MessagePage, PromptResponse
 from app.core.security import get_current_user
+from app.core.responses import FastJSONResponse
+from app.core.etag import make_etag, not_modified, set_etag
 from app.services.conversation_service import (
     get_conversation,
-    get_user_conversations,
+    get_conversation_list_version,
+    get_conversation_owner,
+    get_message_page,
+    get_user_conversation_summaries,
+    MESSAGE_PAGE_SIZE,
     create_conversation,
     update_conversation,
     delete_conversation,
@@ -17,10 +23,32 @@ from app.services.conversation_service import (
 
 router = APIRouter()
 
-@router.get("", response_model=List[Conversation])
-async def get_conversations(current_user: User = Depends(get_current_user)):
-    """Get all conversations for the current user"""
-    return await get_user_conversations(current_user.id)
+@router.get("", response_model=List[ConversationSummary])
+async def get_conversations(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a page of the current user's conversations, most recently updated first.
+
+    Pass the X-Next-Cursor header of a page as `before` to get the next one.
+    Answers 304 to an If-None-Match with the ETag of an unchanged page.
+    """
+    version = await get_conversation_list_version(current_user.id)
+    etag = make_etag("conversations", current_user.id, limit, before, version)
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    try:
+        summaries, next_cursor = await get_user_conversation_summaries(current_user.id, limit, before)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return set_etag(FastJSONResponse(summaries, headers=headers), etag)
 
 @router.post("", response_model=Conversation)
 async def create_new_conversation(
@@ -39,10 +67,11 @@ async def create_new_conversation(
 @router.get("/{conversation_id}", response_model=Conversation)
 async def get_conversation_by_id(
     conversation_id: str,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=500),
     current_user: User = Depends(get_current_user)
 ):
-    """Get conversation by ID"""
-    conversation = await get_conversation(conversation_id)
+    """Get conversation by ID with its latest messages (older ones via /{conversation_id}/messages)"""
+    conversation = await get_conversation(conversation_id, message_limit=limit)
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -56,7 +85,38 @@ async def get_conversation_by_id(
             detail="You don't have access to this conversation"
         )
     
-    return conversation
+    return FastJSONResponse(conversation)
+
+@router.get("/{conversation_id}/messages", response_model=MessagePage)
+async def get_conversation_messages(
+    conversation_id: str,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=500),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get a window of messages: the latest page, or the page before/after a cursor"""
+    owner = await get_conversation_owner(conversation_id)
+    if not owner:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    if owner["user_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this conversation"
+        )
+    
+    try:
+        page = await get_message_page(conversation_id, limit=limit, before=before, after=after)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return FastJSONResponse(page)
 
 @router.put("/{conversation_id}", response_model=Conversation)
 async def update_conversation_info(
@@ -66,7 +126,7 @@ async def update_conversation_info(
 ):
     """Update conversation information"""
     # Check if conversation exists and user owns it
-    conversation = await get_conversation(conversation_id)
+    conversation = await get_conversation(conversation_id, message_limit=0)
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -96,7 +156,7 @@ async def delete_conversation_by_id(
 ):
     """Delete conversation"""
     # Check if conversation exists and user owns it
-    conversation = await get_conversation(conversation_id)
+    conversation = await get_conversation(conversation_id, message_limit=0)
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
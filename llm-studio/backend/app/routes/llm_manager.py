@@ -1,16 +1,23 @@
 # app/routes/llm_manager.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from typing import Optional, Dict, List, Any
+import asyncio
 import logging
 from datetime import datetime
 from bson import ObjectId
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.core.db import get_database
+from app.core.etag import content_etag, not_modified, set_etag
+from app.core.responses import FastJSONResponse
 from app.models.user import User
 from app.core.security import get_current_user, check_technician_access, check_admin_access
 from app.services.llm_manager_service import llm_manager_service
 from app.models.conversation import ConversationCreate
-from app.services.conversation_service import create_conversation, get_conversation
+from app.core.write_behind import write_behind
+from app.services.message_store import message_store
+from app.services.conversation_service import (
+    create_conversation, get_conversation, get_message_page, MESSAGE_PAGE_SIZE, EMPTY_CONVERSATION_COUNTERS
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -23,8 +30,12 @@ class ModelConfigRequest(BaseModel):
     path: str
     context_window: int = 2048
     n_threads: int = 4
+    n_batch: int = 512
     n_gpu_layers: int = 0
     temperature: float = 0.7
+    autotune: bool = False
+    recalibrate: bool = False
+    replicas: int = Field(1, ge=1)
 
 class AddModelRequest(BaseModel):
     model_id: str
@@ -33,8 +44,12 @@ class AddModelRequest(BaseModel):
     file_name: Optional[str] = None
     context_window: int = 2048
     n_threads: int = 4
+    n_batch: int = 512
     n_gpu_layers: int = 0
     temperature: float = 0.7
+    autotune: bool = False
+    recalibrate: bool = False
+    replicas: int = Field(1, ge=1)
     keep_file_on_error: bool = False
     auto_correct_type: bool = True
     download_only: bool = False
@@ -56,16 +71,20 @@ class ModifyModelResponse(BaseModel):
 # ----- Model Management Endpoints -----
 
 @router.get("/models")
-async def get_models():
+async def get_models(request: Request):
     """Get all available LLM models"""
     try:
-        return await llm_manager_service.get_models()
+        models = await llm_manager_service.get_models()
     except Exception as e:
         logger.error(f"Failed to get models: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get models: {str(e)}"
         )
+    # The catalog has no version of its own, so the ETag hashes the body; a 304 still saves the transfer
+    response = FastJSONResponse(models)
+    etag = content_etag(response.body)
+    return not_modified(request, etag) or set_etag(response, etag)
 
 @router.post("/initialize")
 async def initialize_models(
@@ -234,11 +253,14 @@ async def create_conversation_endpoint(data: dict):
 @router.get("/conversation/{conversation_id}")
 async def get_conversation_endpoint(
     conversation_id: str, 
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=500),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Get conversation history"""
+    """Get conversation history, one window of messages at a time (latest first, older via `before`)"""
     try:
-        db_conversation = await get_conversation(conversation_id)
+        db_conversation = await get_conversation(conversation_id, message_limit=0)
         if not db_conversation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -253,9 +275,14 @@ async def get_conversation_endpoint(
         
         # Optionally, you can also fetch LLMManager conversation history:
         # llm_history = await llm_manager_service.get_conversation(conversation_id)
-        return db_conversation
+        page = await get_message_page(conversation_id, limit=limit, before=before, after=after)
+        db_conversation.messages = page.messages
+        db_conversation.messages_before = page.before
+        return {**db_conversation.dict(), "messages_after": page.after}
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get conversation: {str(e)}")
         raise HTTPException(
@@ -270,7 +297,7 @@ async def reset_conversation_endpoint(
 ):
     """Reset a conversation's history"""
     try:
-        db_conversation = await get_conversation(conversation_id)
+        db_conversation = await get_conversation(conversation_id, message_limit=0)
         if not db_conversation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -285,14 +312,15 @@ async def reset_conversation_endpoint(
         # Reset conversation in LLMManager.
         await llm_manager_service.reset_conversation(conversation_id)
         
-        # Delete messages from the local database.
+        # Delete messages from the local database (including any still buffered).
         db = await get_database()
-        await db.messages.delete_many({"conversation_id": conversation_id})
+        await write_behind.flush()
+        await message_store.delete_conversation(db, conversation_id)
         
-        # Update conversation timestamp.
+        # Update conversation timestamp and zero its counters.
         await db.conversations.update_one(
             {"_id": ObjectId(conversation_id)},
-            {"$set": {"updated_at": datetime.utcnow()}}
+            {"$set": {"updated_at": datetime.utcnow(), **EMPTY_CONVERSATION_COUNTERS}}
         )
         return {"success": True, "conversation_id": conversation_id}
     except HTTPException:
@@ -340,6 +368,37 @@ async def health_check():
             detail=f"LLM Manager service is not healthy: {str(e)}"
         )
 
+# ----- LLMManager Node Pool Endpoints -----
+
+class UpstreamNodeRequest(BaseModel):
+    url: str
+
+@router.get("/nodes")
+async def list_nodes(current_user: User = Depends(check_admin_access)):
+    """List the LLMManager nodes in the pool with their health and load (admin only)"""
+    return llm_manager_service.pool.snapshot()
+
+@router.post("/nodes")
+async def add_node(
+    node: UpstreamNodeRequest,
+    current_user: User = Depends(check_admin_access)
+):
+    """Add an LLMManager node to the pool (admin only)"""
+    return llm_manager_service.add_node(node.url)
+
+@router.delete("/nodes")
+async def remove_node(
+    url: str,
+    current_user: User = Depends(check_admin_access)
+):
+    """Drain an LLMManager node and remove it from the pool (admin only)"""
+    try:
+        return await llm_manager_service.remove_node(url)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Node '{url}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 class StatsResponse(BaseModel):
     total_admin_messages: int
     total_conversations: int
@@ -353,19 +412,25 @@ async def get_system_stats(current_user: User = Depends(check_admin_access)):
     """Get system-wide statistics for admin dashboard"""
     try:
         db = await get_database()
-        total_admin_messages = await db.admin_messages.count_documents({})
-        total_conversations = await db.conversations.count_documents({})
-        total_messages = await db.messages.count_documents({})
+        # Collection metadata counts, and the bucket store's maintained message total: no scans.
+        # Approximate (metadata counts can lag, the bucket total overcounts replayed appends),
+        # which is fine as the figures are only shown as totals/averages
+        (total_admin_messages, total_conversations, total_messages,
+         total_users, total_tickets) = await asyncio.gather(
+            db.admin_messages.estimated_document_count(),
+            db.conversations.estimated_document_count(),
+            message_store.estimated_count(db),
+            db.users.estimated_document_count(),
+            db.tickets.estimated_document_count()
+        )
         if total_conversations > 0:
             avg_messages_per_conversation = total_messages / total_conversations
         else:
             avg_messages_per_conversation = 0.0
-        total_users = await db.users.count_documents({})
         if total_users > 0:
             avg_conversations_per_user = total_conversations / total_users
         else:
             avg_conversations_per_user = 0.0
-        total_tickets = await db.tickets.count_documents({})
         if total_users > 0:
             avg_tickets_per_user = total_tickets / total_users
         else:
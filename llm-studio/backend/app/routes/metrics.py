@@ -0,0 +1,34 @@
+# app/routes/metrics.py
+from fastapi import APIRouter, Depends
+from app.core.security import check_admin_access
+from app.core.db_monitor import command_monitor
+from app.core.timing import metrics
+from app.models.user import User
+
+router = APIRouter()
+
+@router.get("/db")
+async def get_db_metrics(reset: bool = False, current_user: User = Depends(check_admin_access)):
+    """
+    MongoDB command latency by collection and command, and database calls
+    and time per route, busiest first (admin only). `reset=true` starts a new
+    measurement window after returning the current one.
+    """
+    snapshot = command_monitor.snapshot()
+    if reset:
+        command_monitor.reset()
+    return snapshot
+
+@router.get("/latency")
+async def get_latency_metrics(current_user: User = Depends(check_admin_access)):
+    """
+    Request count, mean and estimated p50/p95/p99 per route (HTTP) and per
+    message type (WebSocket), most requested first (admin only). The raw
+    histograms are on /metrics in the Prometheus format.
+    """
+    return {
+        "http": metrics.summary("http_request_duration_seconds"),
+        "http_phases": metrics.summary("http_request_phase_seconds"),
+        "websocket": metrics.summary("websocket_message_duration_seconds"),
+        "websocket_phases": metrics.summary("websocket_message_phase_seconds")
+    }
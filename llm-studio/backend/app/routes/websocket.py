@@ -1,16 +1,20 @@
 import json
 import uuid
+import asyncio
 import logging
 from typing import Dict, Any
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.core.db import get_database
-from app.core.websocket import connection_manager
+from app.core.websocket import connection_manager, StreamRelay
 from app.services.llm_manager_service import llm_manager_service
+from app.services.generation_scheduler import QueueFullError
 from app.models.conversation import ConversationCreate
-from app.services.conversation_service import create_conversation
+from app.services.conversation_service import create_conversation, get_conversation_owner, message_counter_update
+from app.core.write_behind import write_behind
+from app.services.message_store import message_store
 from datetime import datetime
 from bson import ObjectId
 from app.core.security import decode_token
+from app.core.timing import track_ws_message
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -68,10 +72,12 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
 
             if message_type == "prompt":
                 logger.info("Dispatching to handle_prompt_message")
-                await handle_prompt_message(client_id, user_id, message, websocket)
+                async with track_ws_message("prompt"):
+                    await handle_prompt_message(client_id, user_id, message, websocket)
             elif message_type == "conversation_create":
                 logger.info("Dispatching to handle_conversation_create")
-                await handle_conversation_create(client_id, user_id, message, websocket)
+                async with track_ws_message("conversation_create"):
+                    await handle_conversation_create(client_id, user_id, message, websocket)
             elif message_type != "ping":
                 logger.warning(f"Unknown message type: {message_type}")
                 await websocket.send_json({
@@ -130,6 +136,28 @@ async def handle_conversation_create(client_id: str, user_id: str, message: Dict
         logger.error(f"[Conversation Create] Error creating conversation for user_id={user_id} with model_id={model_id}: {e}", exc_info=True)
         await websocket.send_json({"type": "error", "error": f"Error creating conversation: {str(e)}"})
 
+async def record_message(conversation_id: str, role: str, content: str) -> None:
+    """
+    Queue a message insert together with its conversation's counter update.
+
+    Counter updates for the same conversation within one flush merge into a
+    single write, so a prompt and its answer cost one conversation update.
+    """
+    created_at = datetime.utcnow()
+    await message_store.buffer({
+        "conversation_id": conversation_id,
+        "role": role,
+        "content": content,
+        "created_at": created_at,
+        "metadata": {}
+    })
+    await write_behind.update(
+        "conversations",
+        {"_id": ObjectId(conversation_id)},
+        message_counter_update(role, content, created_at),
+        key=("counters", conversation_id)
+    )
+
 async def handle_prompt_message(client_id: str, user_id: str, message: Dict[str, Any], websocket: WebSocket):
     """Handle a prompt message for an LLM with database synchronization"""
     conversation_id = message.get("conversation_id")
@@ -141,66 +169,48 @@ async def handle_prompt_message(client_id: str, user_id: str, message: Dict[str,
         return
 
     logger.info(f"Received prompt from user {user_id} for conversation {conversation_id}.")
-    await websocket.send_json({"type": "acknowledgment", "status": "processing", "conversation_id": conversation_id})
-    logger.debug(f"Sent acknowledgment for conversation {conversation_id}.")
 
     try:
-        db = await get_database()
-        logger.debug(f"Connected to database for conversation {conversation_id}.")
-
-        logger.info(f"Fetching conversation {conversation_id} from database for user {user_id}.")
-        conv = await db.conversations.find_one({"_id": ObjectId(conversation_id)})
+        # The access check (usually a cache hit) runs alongside the acknowledgment; generation
+        # only starts once it passes, since it would otherwise write into someone else's conversation.
+        _, conv = await asyncio.gather(
+            websocket.send_json({"type": "acknowledgment", "status": "processing", "conversation_id": conversation_id}),
+            get_conversation_owner(conversation_id)
+        )
         if not conv or conv["user_id"] != user_id:
             logger.warning(f"Access denied for user {user_id} on conversation {conversation_id}.")
             await websocket.send_json({"type": "error", "error": "You don't have access to this conversation"})
             return
         
-        message_doc = {
-            "conversation_id": conversation_id,
-            "role": "user",
-            "content": prompt,
-            "created_at": datetime.utcnow(),
-            "metadata": {}
-        }
-        logger.info(f"Inserting user message into conversation {conversation_id}.")
-        await db.messages.insert_one(message_doc)
-        
-        logger.debug(f"Updating conversation {conversation_id} timestamp (first update).")
-        await db.conversations.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {"$set": {"updated_at": datetime.utcnow()}}
-        )
+        # Persisted by the write-behind writer, off the time-to-first-token path
+        await record_message(conversation_id, "user", prompt)
         
-        streaming_content = ""
-        logger.info(f"Starting streaming response for conversation {conversation_id}.")
-        async for chunk in llm_manager_service.stream_message(conversation_id, prompt):
-            streaming_content += chunk
-            logger.debug(f"Received chunk of length {len(chunk)} for conversation {conversation_id}.")
+        async def send_queue_position(position: int):
             await websocket.send_json({
-                "type": "stream",
+                "type": "queue_position",
                 "conversation_id": conversation_id,
-                "content": chunk
+                "position": position
             })
+
+        relay = StreamRelay(websocket, conversation_id)
+        async with llm_manager_service.scheduler.slot(conv.get("llm_id", "unknown"), user_id, on_position=send_queue_position):
+            logger.info(f"Starting streaming response for conversation {conversation_id}.")
+            streaming_content = await relay.relay(llm_manager_service.stream_message(conversation_id, prompt))
+        logger.debug(f"Relayed {len(streaming_content)} characters in {relay.frames_sent} frames for conversation {conversation_id}.")
             
-        assistant_message = {
-            "conversation_id": conversation_id,
-            "role": "assistant",
-            "content": streaming_content,
-            "created_at": datetime.utcnow(),
-            "metadata": {}
-        }
-        logger.info(f"Inserting assistant response into conversation {conversation_id}.")
-        await db.messages.insert_one(assistant_message)
-        
-        logger.debug(f"Updating conversation {conversation_id} timestamp (second update).")
-        await db.conversations.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {"$set": {"updated_at": datetime.utcnow()}}
-        )
+        await record_message(conversation_id, "assistant", streaming_content)
         
         logger.info(f"Streaming complete for conversation {conversation_id}. Sending completion message.")
-        await websocket.send_json({"type": "complete", "conversation_id": conversation_id})
+        if relay.dropped:
+            # The client missed part of the stream; hand it the whole answer in one go
+            await websocket.send_json({"type": "complete", "conversation_id": conversation_id,
+                                       "truncated": True, "content": streaming_content})
+        else:
+            await websocket.send_json({"type": "complete", "conversation_id": conversation_id})
         
+    except QueueFullError as e:
+        logger.warning(f"Rejected prompt for conversation {conversation_id}: {e}")
+        await websocket.send_json({"type": "error", "error": "The model is busy, please try again shortly"})
     except Exception as e:
         logger.error(f"Error processing prompt for conversation {conversation_id}: {e}")
         await websocket.send_json({"type": "error", "error": f"Error processing prompt: {str(e)}"})
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.db import connect_to_mongo, close_mongo_connection, get_database
+from app.services.conversation_service import EMPTY_CONVERSATION_COUNTERS, LAST_MESSAGE_PREVIEW_CHARS
+from app.services.message_store import message_store
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+def _estimated_tokens(role: str):
+    """Sum of ~4-characters-per-token estimates over one role's messages (same rule as estimate_tokens)"""
+    return {"$sum": {"$cond": [
+        {"$eq": ["$role", role]},
+        {"$ceil": {"$divide": [{"$strLenCP": "$content"}, 4]}},
+        0
+    ]}}
+
+async def recompute_conversation_counters(db) -> Tuple[int, int]:
+    """
+    Recompute the denormalized counters of every conversation from its messages
+    (in whichever layout MESSAGE_STORAGE selects). Returns the number of
+    conversations updated and the number reset to empty.
+
+    Safe to re-run at any time, e.g. after a crash lost buffered writes; the
+    counters are overwritten, not incremented.
+    """
+    pipeline = [
+        {"$sort": {"conversation_id": 1, "created_at": 1, "_id": 1}},
+        {"$group": {
+            "_id": "$conversation_id",
+            "message_count": {"$sum": 1},
+            "prompt_tokens": _estimated_tokens("user"),
+            "completion_tokens": _estimated_tokens("assistant"),
+            "last": {"$last": {"role": "$role", "content": "$content", "created_at": "$created_at"}}
+        }}
+    ]
+
+    seen = set()
+    batch = []
+    updated = 0
+    async for row in message_store.aggregate(db, pipeline, allowDiskUse=True):
+        try:
+            object_id = ObjectId(row["_id"])
+        except Exception:
+            logger.warning(f"Skipping messages with invalid conversation_id {row['_id']!r}")
+            continue
+        seen.add(object_id)
+        last = row["last"]
+        content = last.get("content") or ""
+        if len(content) > LAST_MESSAGE_PREVIEW_CHARS:
+            content = content[:LAST_MESSAGE_PREVIEW_CHARS] + "..."
+        batch.append(UpdateOne({"_id": object_id}, {"$set": {
+            "message_count": row["message_count"],
+            "prompt_tokens": int(row["prompt_tokens"]),
+            "completion_tokens": int(row["completion_tokens"]),
+            "last_message_at": last.get("created_at"),
+            "last_message_preview": {"role": last.get("role"), "content": content, "created_at": last.get("created_at")}
+        }}))
+        if len(batch) >= BATCH_SIZE:
+            result = await db.conversations.bulk_write(batch, ordered=False)
+            updated += result.modified_count
+            batch = []
+    if batch:
+        result = await db.conversations.bulk_write(batch, ordered=False)
+        updated += result.modified_count
+
+    # Conversations without any messages
+    emptied = 0
+    async for conv in db.conversations.find({}, {"_id": 1}):
+        if conv["_id"] not in seen:
+            batch.append(UpdateOne({"_id": conv["_id"]}, {"$set": dict(EMPTY_CONVERSATION_COUNTERS)}))
+        if len(batch) >= BATCH_SIZE:
+            result = await db.conversations.bulk_write(batch, ordered=False)
+            emptied += result.modified_count
+            batch = []
+    if batch:
+        result = await db.conversations.bulk_write(batch, ordered=False)
+        emptied += result.modified_count
+
+    logger.info(f"Conversation counters backfilled: {updated} conversations updated, {emptied} reset to empty")
+    return updated, emptied
+
+async def backfill_conversation_counters():
+    try:
+        await connect_to_mongo()
+        db = await get_database()
+        await recompute_conversation_counters(db)
+        total = await message_store.recount(db)
+        logger.info(f"Message total recounted: {total}")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill_conversation_counters())
@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import logging
+from app.core.db import connect_to_mongo, close_mongo_connection, get_database
+from app.core.migrations import run_migrations, migration_status, explain_hot_queries
+
+logger = logging.getLogger(__name__)
+
+async def main(command: str) -> int:
+    """
+    up:      create missing indexes and apply pending migrations (what startup does)
+    status:  list migrations and whether they have been applied
+    explain: show how the hot queries are planned; exits non-zero if any of them
+             sorts in memory or scans the whole collection
+    """
+    try:
+        await connect_to_mongo()
+        db = await get_database()
+        if command == "up":
+            applied = await run_migrations()
+            logger.info(f"Applied migrations: {applied or 'none pending'}")
+        elif command == "status":
+            for row in await migration_status(db):
+                print(f"{row['version']:>4}  {row['state']:<8} {row['description']}")
+        else:
+            slow = 0
+            for row in await explain_hot_queries(db):
+                problems = [p for p, flag in (("in-memory sort", row["in_memory_sort"]),
+                                             ("collection scan", row["collection_scan"])) if flag]
+                slow += bool(problems)
+                print(f"{row['name']:<32} {row['collection']:<16} {', '.join(row['indexes']) or '-':<48} "
+                      f"{' > '.join(row['stages'])}{'  <-- ' + ', '.join(problems) if problems else ''}")
+            return 1 if slow else 0
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Index and schema migrations for the backend database")
+    parser.add_argument("command", choices=["up", "status", "explain"], nargs="?", default="up")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.command)))
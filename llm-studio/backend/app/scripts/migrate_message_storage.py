@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import logging
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, get_database
+from app.services.message_store import DocumentMessageStore, BucketMessageStore
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+def _stores():
+    documents = DocumentMessageStore()
+    buckets = BucketMessageStore(settings.MESSAGE_BUCKET_SIZE, settings.MESSAGE_BUCKET_MAX_BYTES)
+    return documents, buckets
+
+async def _insert_ignoring_duplicates(collection, docs) -> int:
+    """Insert messages that keep their _id; ones copied by an earlier run are skipped"""
+    try:
+        result = await collection.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+        return result.inserted_count
+    except BulkWriteError as e:
+        errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY_ERROR]
+        if errors:
+            raise
+        return e.details.get("nInserted", 0)
+
+async def migrate(target: str, drop_source: bool = False):
+    """
+    Copy every conversation's messages into the `target` layout.
+
+    Messages keep their _id, and each conversation is rewritten as a whole,
+    so the migration can be re-run after an interruption. Run it while the
+    backend is stopped (messages written meanwhile would be missed), then set
+    MESSAGE_STORAGE to the target layout. The source is only deleted with
+    --drop-source.
+    """
+    try:
+        await connect_to_mongo()
+        db = await get_database()
+        documents, buckets = _stores()
+        source, destination = (documents, buckets) if target == "buckets" else (buckets, documents)
+
+        conversation_ids = await db[source.collection].distinct("conversation_id")
+        logger.info(f"Migrating {len(conversation_ids)} conversations from {source.collection} to {destination.collection}")
+
+        copied = 0
+        for conversation_id in conversation_ids:
+            messages = [doc async for doc in source.iter_messages(db, conversation_id)]
+            if target == "buckets":
+                # Replace whatever an interrupted run left for this conversation
+                await buckets.delete_conversation(db, conversation_id)
+                packed = buckets.pack(conversation_id, messages)
+                if packed:
+                    await db.message_buckets.insert_many(packed)
+                copied += len(messages)
+            else:
+                for start in range(0, len(messages), BATCH_SIZE):
+                    copied += await _insert_ignoring_duplicates(db.messages, messages[start:start + BATCH_SIZE])
+            if drop_source:
+                await source.delete_conversation(db, conversation_id)
+
+        if target == "buckets":
+            # Packed buckets are inserted directly, bypassing the maintained total
+            await buckets.recount(db)
+        logger.info(f"Message storage migration complete: {copied} messages copied to {destination.collection}")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Move chat messages between the document and bucket layouts")
+    parser.add_argument("target", choices=["buckets", "documents"])
+    parser.add_argument("--drop-source", action="store_true", help="Delete the migrated messages from the old layout")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.target, args.drop_source))
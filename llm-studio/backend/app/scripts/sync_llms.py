@@ -1,29 +1,44 @@
 import asyncio
 import logging
-from app.core.db import connect_to_mongo, close_mongo_connection
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, get_database
 from app.services.llm_manager_service import llm_manager_service
+from app.services.catalog_sync import catalog_sync, handshake_conversations
 
 logger = logging.getLogger(__name__)
 
+# The backend runs this sync in the background (app/services/catalog_sync.py); this
+# script runs it once by hand, and sends every node its active conversations even if
+# its current boot was handled already
+
 async def sync_llms():
     try:
         await connect_to_mongo()
-        await llm_manager_service.start_worker()
-        result = await llm_manager_service.sync_llms_to_database()
-        logger.info(f"LLM synchronization complete: {result}")
+        writes = await catalog_sync.sync_catalog()
+        logger.info(f"LLM synchronization complete: {writes} changes written")
     finally:
         await close_mongo_connection()
 
 async def run_conversation_sync_task():
     try:
         await connect_to_mongo()
-        result = await llm_manager_service.sync_all_conversations_with_llm_manager()
-        logger.info(f"Global Conversation synchronization task complete: {result}")
+        db = await get_database()
+        await llm_manager_service.refresh_health()
+        for node in llm_manager_service.pool.active_nodes():
+            if not node.healthy:
+                logger.warning(f"Skipping unhealthy node {node.url}")
+                continue
+            totals = await handshake_conversations(
+                db, llm_manager_service, node,
+                settings.CONVERSATION_SYNC_ACTIVE_DAYS, settings.CONVERSATION_SYNC_BATCH_SIZE
+            )
+            logger.info(f"Conversation synchronization with {node.url} complete: {totals}")
     finally:
+        await llm_manager_service.close()
         await close_mongo_connection()
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     asyncio.run(sync_llms())
-    asyncio.run(run_conversation_sync_task())
\ No newline at end of file
+    asyncio.run(run_conversation_sync_task())
@@ -1,13 +1,62 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict, Any, AsyncIterator
 from datetime import datetime
 from bson import ObjectId
 from app.core.db import get_database  # This now uses settings.MONGO_URI and enhanced options
-from app.models.admin_chat import Ticket, TicketCreate, TicketUpdate, Message, MessageCreate, TicketStatus
+from app.models.admin_chat import Ticket, TicketCreate, TicketUpdate, TicketSummary, Message, MessageCreate, TicketStatus
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.core.etag import list_version
 import logging # Import logging
 from pymongo.errors import WriteError, OperationFailure # Import specific errors
 
 logger = logging.getLogger(__name__)
 
+def ticket_list_query(user_id: Optional[str] = None, statuses: Optional[List[TicketStatus]] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if user_id is not None:
+        query["user_id"] = user_id
+    if statuses:
+        query["status"] = {"$in": [s.value for s in statuses]}
+    return query
+
+TICKET_BATCH_SIZE = 100
+
+async def iter_tickets(query: Dict[str, Any]) -> AsyncIterator[Ticket]:
+    """
+    Tickets matching `query` with their messages, most recently updated first,
+    so callers can stream them out as they are read. Tickets are read in
+    batches of TICKET_BATCH_SIZE and each batch's messages are loaded with a
+    single $in query; list pages should use get_ticket_summaries instead.
+    """
+    db = await get_database()
+    if db is None:
+        raise Exception("Database connection not established. Please check your MongoDB configuration.")
+    
+    cursor = db.tickets.find(query).sort([("updated_at", -1), ("_id", -1)]).batch_size(TICKET_BATCH_SIZE)
+    batch: List[Dict[str, Any]] = []
+    async for ticket_data in cursor:
+        batch.append(ticket_data)
+        if len(batch) >= TICKET_BATCH_SIZE:
+            for ticket in await _with_messages(db, batch):
+                yield ticket
+            batch = []
+    if batch:
+        for ticket in await _with_messages(db, batch):
+            yield ticket
+
+async def _with_messages(db, tickets: List[Dict[str, Any]]) -> List[Ticket]:
+    """Attach their threads (oldest message first) to a batch of ticket documents in one query"""
+    threads: Dict[str, List[Message]] = {}
+    for ticket_data in tickets:
+        ticket_data["_id"] = str(ticket_data["_id"])
+        threads[ticket_data["_id"]] = []
+    messages_cursor = db.admin_messages.find({"ticket_id": {"$in": list(threads)}}).sort(
+        [("ticket_id", 1), ("created_at", 1)]
+    )
+    async for message_data in messages_cursor:
+        message_data["_id"] = str(message_data["_id"])
+        threads[message_data["ticket_id"]].append(Message(**message_data))
+    return [Ticket(**{**ticket_data, "messages": threads[ticket_data["_id"]]}) for ticket_data in tickets]
+
 async def get_user_tickets(user_id: str) -> List[Ticket]:
     """
     Get all tickets for a user
@@ -18,61 +67,111 @@ async def get_user_tickets(user_id: str) -> List[Ticket]:
     Returns:
         List of tickets
     """
-    db = await get_database()
-    if db is None:
-        raise Exception("Database connection not established. Please check your MongoDB configuration.")
-    
-    cursor = db.tickets.find({"user_id": user_id}).sort("updated_at", -1)
-    tickets = []
-    
-    async for ticket_data in cursor:
-        # Ensure _id is properly set and converted to string
-        ticket_data["_id"] = str(ticket_data["_id"])
-        
-        messages_cursor = db.admin_messages.find({"ticket_id": ticket_data["_id"]}).sort("created_at", 1)
-        messages = []
-        
-        async for message_data in messages_cursor:
-            message_data["_id"] = str(message_data["_id"])
-            messages.append(Message(**message_data))
-        
-        ticket_data["messages"] = messages
-        tickets.append(Ticket(**ticket_data))
-    
-    return tickets
+    return [ticket async for ticket in iter_tickets(ticket_list_query(user_id=user_id))]
 
 async def get_admin_tickets(status: Optional[TicketStatus] = None) -> List[Ticket]:
     """
     Get all tickets for admin view, optionally filtered by status
     """
+    return [ticket async for ticket in iter_tickets(ticket_list_query(statuses=[status] if status else None))]
+
+
+TICKET_PREVIEW_CHARS = 100
+
+async def get_ticket_list_version(user_id: Optional[str] = None,
+                                  statuses: Optional[List[TicketStatus]] = None) -> Tuple[Any, ...]:
+    """
+    Changes whenever a matching ticket is created, deleted, updated or gets a
+    message (adding one bumps the ticket's updated_at); for ETags.
+    """
+    db = await get_database()
+    return await list_version(db.tickets, ticket_list_query(user_id, statuses))
+
+async def get_ticket_summaries(
+    user_id: Optional[str] = None,
+    statuses: Optional[List[TicketStatus]] = None,
+    for_admin: bool = False,
+    limit: int = 50,
+    before: Optional[str] = None
+) -> Tuple[List[TicketSummary], Optional[str]]:
+    """
+    Get one page of ticket summaries, most recently updated first
+    
+    A single aggregation returns each ticket with its message count, a preview
+    of its last message and an unread flag; message threads are only loaded
+    by get_ticket.
+    
+    Args:
+        user_id: Only this user's tickets (None for all tickets)
+        statuses: Only tickets in these states
+        for_admin: Whether `unread` is computed for the admin side (last message from the user)
+        limit: Page size
+        before: The cursor of the previous page
+        
+    Returns:
+        The page and the cursor for the next one (None on the last page)
+    """
     db = await get_database()
     if db is None:
         raise Exception("Database connection not established. Please check your MongoDB configuration.")
     
-    query = {}
-    if status:
-        query["status"] = status.value
+    match = ticket_list_query(user_id, statuses)
+    if before:
+        updated_at, object_id = decode_cursor(before)
+        match["$or"] = [
+            {"updated_at": {"$lt": updated_at}},
+            {"updated_at": updated_at, "_id": {"$lt": object_id}}
+        ]
     
-    cursor = db.tickets.find(query).sort("updated_at", -1)
-    tickets = []
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"updated_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {"messages": 0}},
+        {"$lookup": {
+            "from": "admin_messages",
+            "let": {"ticket_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$ticket_id", "$$ticket_id"]}}},
+                {"$sort": {"created_at": -1}},
+                {"$group": {
+                    "_id": None,
+                    "count": {"$sum": 1},
+                    "last": {"$first": {
+                        "is_admin": "$is_admin",
+                        "admin_name": "$admin_name",
+                        "created_at": "$created_at",
+                        "content": {"$cond": [
+                            {"$gt": [{"$strLenCP": "$content"}, TICKET_PREVIEW_CHARS]},
+                            {"$concat": [{"$substrCP": ["$content", 0, TICKET_PREVIEW_CHARS]}, "..."]},
+                            "$content"
+                        ]}
+                    }}
+                }}
+            ],
+            "as": "thread"
+        }},
+        {"$set": {
+            "message_count": {"$ifNull": [{"$first": "$thread.count"}, 0]},
+            "last_message": {"$first": "$thread.last"}
+        }},
+        {"$set": {
+            "unread": {"$eq": ["$last_message.is_admin", not for_admin]}
+        }},
+        {"$project": {"thread": 0}}
+    ]
     
-    async for ticket_data in cursor:
-        # Convert the ObjectId to a string and keep the key as "_id"
-        ticket_data["_id"] = str(ticket_data["_id"])
-        
-        # Use the _id string when querying messages
-        messages_cursor = db.admin_messages.find({"ticket_id": ticket_data["_id"]}).sort("created_at", 1)
-        messages = []
-        
-        async for message_data in messages_cursor:
-            # Ensure message _id is also a string and keep key as "_id"
-            message_data["_id"] = str(message_data["_id"])
-            messages.append(Message(**message_data))
-        
-        ticket_data["messages"] = messages
-        tickets.append(Ticket(**ticket_data))
+    docs = await db.tickets.aggregate(pipeline).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["updated_at"], str(docs[-1]["_id"]))
     
-    return tickets
+    summaries = []
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+        summaries.append(TicketSummary(**doc))
+    return summaries, next_cursor
 
 
 async def get_ticket(ticket_id: str) -> Optional[Ticket]:
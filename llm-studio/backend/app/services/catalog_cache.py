@@ -0,0 +1,95 @@
+# app/services/catalog_cache.py
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class CatalogCache(Generic[T]):
+    """
+    One cached value (a whole catalog) refreshed from `load`.
+
+    - Fresh for `ttl` seconds. After that the stale value is still returned
+      while a single background refresh runs, so readers never wait on a
+      refresh once the cache has been filled.
+    - Concurrent refreshes collapse into one call to `load`; every caller
+      waiting for a value awaits that same call.
+    - `invalidate()` drops the value so the next read waits for a fresh one,
+      and discards any refresh started before it.
+    - A failed refresh keeps serving the stale value (retried after
+      `retry_after` seconds); with nothing cached the error is raised.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Awaitable[T]], ttl: float = 30.0, retry_after: float = 5.0):
+        self.name = name
+        self.load = load
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._expires_at = 0.0
+        self._generation = 0
+        self._refresh: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.loads = 0
+        self.errors = 0
+
+    async def _run_load(self, generation: int) -> T:
+        self.loads += 1
+        try:
+            value = await self.load()
+        except Exception:
+            self.errors += 1
+            if generation == self._generation and self._loaded:
+                self._expires_at = time.monotonic() + self.retry_after
+            raise
+        finally:
+            if generation == self._generation:
+                self._refresh = None
+        if generation == self._generation:
+            self._value = value
+            self._loaded = True
+            self._expires_at = time.monotonic() + self.ttl
+        return value
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh is None:
+            # A fresh context: the refresh outlives the request that triggered it and
+            # must not add its time or DB calls to that request's metrics
+            self._refresh = asyncio.get_running_loop().create_task(
+                self._run_load(self._generation), context=contextvars.Context()
+            )
+            self._refresh.add_done_callback(self._log_failure)
+        return self._refresh
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Refreshing the {self.name} catalog failed: {task.exception()}")
+
+    async def get(self) -> T:
+        if self._loaded:
+            if time.monotonic() < self._expires_at:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._start_refresh()
+            return self._value
+        # shield: one caller giving up (e.g. a client disconnect) doesn't cancel the load for the others
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._value = None
+        self._loaded = False
+        self._refresh = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"loaded": self._loaded, "hits": self.hits, "stale_hits": self.stale_hits,
+                "loads": self.loads, "errors": self.errors}
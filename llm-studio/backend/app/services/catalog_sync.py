@@ -0,0 +1,236 @@
+# app/services/catalog_sync.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Set
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.db import get_database
+from app.services.llm_manager_service import LLMManagerService, llm_manager_service
+from app.services.llm_service import llm_catalog
+from app.services.llm_upstream_pool import UpstreamNode
+
+logger = logging.getLogger(__name__)
+
+# api_endpoint of the llms documents mirrored from LLMManager (others are managed through /api/llms)
+LLM_MANAGER_ENDPOINT = "internal://llm-manager"
+
+def llm_fields(model_id: str, model: Dict[str, Any]) -> Dict[str, Any]:
+    """The llms document fields mirrored from an LLMManager catalog entry"""
+    model_type = model.get("type", "unknown")
+    size_mb = model.get("size_mb")
+    size = f"{size_mb / 1024:.1f} GB" if isinstance(size_mb, (int, float)) else "size unknown"
+    context_window = model.get("context_window", 2048)
+    return {
+        "name": model.get("id", model_id),
+        "type": model_type,
+        "description": f"{model.get('type', 'LLM')} model ({size})",
+        "token_limit": context_window,
+        "api_endpoint": LLM_MANAGER_ENDPOINT,
+        "parameters": {
+            "max_tokens": context_window,
+            "temperature": model.get("temperature", 0.7)
+        },
+        "status": "active"
+    }
+
+def diff_llm_catalog(models: Dict[str, Dict[str, Any]], existing: Dict[str, Dict[str, Any]],
+                     now: datetime) -> List[UpdateOne]:
+    """
+    Writes that bring the mirrored llms documents in line with the catalog:
+    new models are inserted, changed fields are set, and models LLMManager
+    no longer serves are marked inactive (conversations still reference them).
+    Unchanged documents produce no write.
+    """
+    operations = []
+    for model_id, model in models.items():
+        if not isinstance(model, dict) or "error" in model:
+            continue
+        fields = llm_fields(model_id, model)
+        doc = existing.get(model_id)
+        if doc is None:
+            operations.append(UpdateOne(
+                {"_id": model_id},
+                {"$set": {**fields, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            ))
+            continue
+        changed = {k: v for k, v in fields.items() if doc.get(k) != v}
+        if changed:
+            operations.append(UpdateOne({"_id": model_id}, {"$set": {**changed, "updated_at": now}}))
+    for model_id, doc in existing.items():
+        if (model_id not in models and doc.get("api_endpoint") == LLM_MANAGER_ENDPOINT
+                and doc.get("status") == "active"):
+            operations.append(UpdateOne({"_id": model_id}, {"$set": {"status": "inactive", "updated_at": now}}))
+    return operations
+
+async def sync_llm_catalog(db, models: Dict[str, Dict[str, Any]]) -> int:
+    """Mirror the LLMManager catalog into db.llms, writing only what changed; returns the number of writes"""
+    existing = {
+        doc["_id"]: doc async for doc in db.llms.find(
+            {"$or": [{"_id": {"$in": list(models)}}, {"api_endpoint": LLM_MANAGER_ENDPOINT}]}
+        )
+    }
+    operations = diff_llm_catalog(models, existing, datetime.utcnow())
+    if operations:
+        await db.llms.bulk_write(operations, ordered=False)
+        llm_catalog.invalidate()
+        logger.info(f"LLM catalog sync wrote {len(operations)} changes")
+    return len(operations)
+
+
+async def claim_node_boot(db, url: str, boot_id: str) -> bool:
+    """
+    Record that `boot_id` of a node is being handled. True for the first
+    worker to see it; False if it was handled already (another worker, or
+    before this backend restarted), so each LLMManager boot is synced once.
+    """
+    try:
+        # No match means the node's document already has this boot ID, and the upsert collides on _id
+        await db.llm_manager_nodes.update_one(
+            {"_id": url, "boot_id": {"$ne": boot_id}},
+            {"$set": {"boot_id": boot_id, "synced_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+async def handshake_conversations(db, service: LLMManagerService, node: UpstreamNode,
+                                  active_days: float, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Send a node the conversations routed to it that were active in the last
+    `active_days`, a page at a time, most recent first. Older conversations
+    are recreated on their next message instead (see _recreate_conversation).
+    """
+    totals = {"scanned": 0, "sent": 0, "created": 0, "existing": 0, "errors": 0}
+    base: Dict[str, Any] = {"updated_at": {"$gte": datetime.utcnow() - timedelta(days=active_days)}}
+    match = base
+    while True:
+        docs = await db.conversations.find(match, {"llm_id": 1, "updated_at": 1}) \
+            .sort([("updated_at", -1), ("_id", -1)]).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+        totals["scanned"] += len(docs)
+        page = [(str(doc["_id"]), doc["llm_id"]) for doc in docs
+                if doc.get("llm_id") and service.pool.pick(str(doc["_id"])) is node]
+        if page:
+            result = await service.ensure_conversations(node, page)
+            totals["sent"] += len(page)
+            totals["created"] += result.get("created", 0)
+            totals["existing"] += result.get("existing", 0)
+            totals["errors"] += len(result.get("errors") or {})
+        if len(docs) < batch_size:
+            break
+        last = docs[-1]
+        match = {"$and": [base, {"$or": [
+            {"updated_at": {"$lt": last["updated_at"]}},
+            {"updated_at": last["updated_at"], "_id": {"$lt": last["_id"]}}
+        ]}]}
+    return totals
+
+
+class CatalogSync:
+    """
+    Background task keeping the backend in step with LLMManager.
+
+    Every `interval` seconds the model catalog is diffed against db.llms and
+    only the differences are written. When a node reports a new boot ID (it
+    restarted and lost its in-memory conversations) the recently active
+    conversations routed to it are sent over in pages with an idempotent
+    bulk call; a boot ID is handled by one worker only.
+    """
+
+    def __init__(self, service: LLMManagerService, interval: float = 60.0,
+                 active_days: float = 7.0, batch_size: int = 500):
+        self.service = service
+        self.interval = interval
+        self.active_days = active_days
+        self.batch_size = batch_size
+        self._booted: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.catalog_writes = 0
+        self.handshakes = 0
+        self.last_sync: Optional[datetime] = None
+        service.on_node_boot(self.node_booted)
+
+    def node_booted(self, node: UpstreamNode) -> None:
+        self._booted.add(node.url)
+        self._wake.set()
+
+    async def sync_catalog(self) -> int:
+        db = await get_database()
+        # Straight from the cache: a failed fetch raises instead of looking like an empty catalog
+        models = await self.service.catalog.get()
+        writes = await sync_llm_catalog(db, models)
+        self.catalog_writes += writes
+        self.last_sync = datetime.utcnow()
+        return writes
+
+    async def sync_node(self, node: UpstreamNode) -> Optional[Dict[str, int]]:
+        """Send a restarted node its active conversations, unless its current boot was handled already"""
+        db = await get_database()
+        if node.boot_id is None or not await claim_node_boot(db, node.url, node.boot_id):
+            return None
+        totals = await handshake_conversations(db, self.service, node, self.active_days, self.batch_size)
+        self.handshakes += 1
+        logger.info(f"Conversation handshake with {node.url} (boot {node.boot_id}): {totals}")
+        return totals
+
+    async def run_once(self) -> None:
+        booted, self._booted = self._booted, set()
+        try:
+            await self.sync_catalog()
+        except Exception as e:
+            logger.error(f"LLM catalog sync failed: {e}")
+        for url in booted:
+            node = self.service.pool.nodes.get(url)
+            if node is None:
+                continue
+            try:
+                await self.sync_node(node)
+            except Exception as e:
+                logger.error(f"Conversation handshake with {url} failed: {e}")
+                # Release the claim so this boot is retried
+                db = await get_database()
+                await db.llm_manager_nodes.update_one({"_id": url, "boot_id": node.boot_id},
+                                                      {"$unset": {"boot_id": ""}})
+                self._booted.add(url)
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"catalog_writes": self.catalog_writes, "handshakes": self.handshakes,
+                "last_sync": self.last_sync, "pending_nodes": sorted(self._booted)}
+
+catalog_sync = CatalogSync(
+    llm_manager_service,
+    interval=settings.LLM_CATALOG_SYNC_INTERVAL,
+    active_days=settings.CONVERSATION_SYNC_ACTIVE_DAYS,
+    batch_size=settings.CONVERSATION_SYNC_BATCH_SIZE
+)
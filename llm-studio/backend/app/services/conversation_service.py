@@ -1,18 +1,97 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from collections import OrderedDict
 from datetime import datetime
 from bson import ObjectId
 import time
 import logging
 
 from app.core.db import get_database
-from app.models.conversation import Conversation, ConversationCreate, ConversationUpdate, Message
+from app.core.write_behind import write_behind
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.core.etag import list_version
+from app.models.conversation import Conversation, ConversationCreate, ConversationUpdate, ConversationSummary, Message, MessagePage
 from app.services.llm_service import get_llm_by_id
 from app.services.llm_manager_service import llm_manager_service
+from app.services.message_store import message_store
 
 logger = logging.getLogger(__name__)
 
-async def get_conversation(conversation_id: str) -> Optional[Conversation]:
-    """Get conversation by ID with messages"""
+# Owner and model of recently used conversations. Neither changes after creation, but
+# another worker may delete the conversation (this worker's deletes drop the entry at
+# once), so entries are looked up again after CONVERSATION_OWNER_CACHE_TTL seconds.
+CONVERSATION_OWNER_CACHE_SIZE = 10000
+CONVERSATION_OWNER_CACHE_TTL = 30.0
+LAST_MESSAGE_PREVIEW_CHARS = 100
+MESSAGE_PAGE_SIZE = 50
+_conversation_owners: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+async def get_conversation_owner(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Return {"user_id", "llm_id"} for a conversation, or None if it doesn't exist"""
+    cached = _conversation_owners.get(conversation_id)
+    if cached is not None:
+        owner, cached_at = cached
+        if time.monotonic() - cached_at < CONVERSATION_OWNER_CACHE_TTL:
+            _conversation_owners.move_to_end(conversation_id)
+            return owner
+        del _conversation_owners[conversation_id]
+    try:
+        object_id = ObjectId(conversation_id)
+    except Exception:
+        return None
+    db = await get_database()
+    conv = await db.conversations.find_one({"_id": object_id}, {"user_id": 1, "llm_id": 1})
+    if not conv:
+        return None
+    owner = {"user_id": conv.get("user_id"), "llm_id": conv.get("llm_id")}
+    _conversation_owners[conversation_id] = (owner, time.monotonic())
+    if len(_conversation_owners) > CONVERSATION_OWNER_CACHE_SIZE:
+        _conversation_owners.popitem(last=False)
+    return owner
+
+# Denormalized per-conversation counters, kept current by every message write (see
+# message_counter_update) and recomputed by app/scripts/backfill_conversation_counters.py.
+# They go through the write-behind writer, which can replay an update whose batch had an
+# unknown outcome, so they may overcount until the next backfill.
+# Token totals are estimates (~4 characters per token); LLMManager doesn't report usage.
+EMPTY_CONVERSATION_COUNTERS = {
+    "message_count": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "last_message_at": None,
+    "last_message_preview": None
+}
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+def message_preview(content: str) -> str:
+    if len(content) > LAST_MESSAGE_PREVIEW_CHARS:
+        return content[:LAST_MESSAGE_PREVIEW_CHARS] + "..."
+    return content
+
+def message_counter_update(role: str, content: str, created_at: datetime) -> Dict[str, Any]:
+    """The conversation update that goes with inserting a message"""
+    inc = {"message_count": 1}
+    if role == "user":
+        inc["prompt_tokens"] = estimate_tokens(content)
+    elif role == "assistant":
+        inc["completion_tokens"] = estimate_tokens(content)
+    return {
+        "$inc": inc,
+        "$set": {
+            "updated_at": created_at,
+            "last_message_at": created_at,
+            "last_message_preview": {"role": role, "content": message_preview(content), "created_at": created_at}
+        }
+    }
+
+async def get_conversation(conversation_id: str, message_limit: int = MESSAGE_PAGE_SIZE) -> Optional[Conversation]:
+    """
+    Get conversation by ID with its latest `message_limit` messages.
+
+    `messages_before` is the cursor for the page of older messages (None if
+    there are none); pass message_limit=0 to skip loading messages.
+    """
     db = await get_database()
     
     try:
@@ -20,68 +99,114 @@ async def get_conversation(conversation_id: str) -> Optional[Conversation]:
     except:
         logger.error(f"Invalid ObjectId format: {conversation_id}")
         return None
-    logger.error("Searching for elements in the database with the ID of conversation...")
     conversation_data = await db.conversations.find_one({"_id": object_id})
     if not conversation_data:
         return None
     
     conversation_data["id"] = str(conversation_data.pop("_id"))
     
-    messages = []
-    cursor = db.messages.find({"conversation_id": conversation_id}).sort("created_at", 1)
-    
-    async for message_data in cursor:
-        content["id"] = str(message_data.pop("_id"))
-        messages.append(Message(**message_data))
-    
-    conversation_data["messages"] = messages
+    if message_limit > 0:
+        page = await get_message_page(conversation_id, limit=message_limit)
+        conversation_data["messages"] = page.messages
+        conversation_data["messages_before"] = page.before
     
     return Conversation(**conversation_data)
 
+async def get_message_page(
+    conversation_id: str,
+    limit: int = MESSAGE_PAGE_SIZE,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> MessagePage:
+    """
+    A window of a conversation's messages in chronological order, keyset-paginated on (created_at, _id).
+
+    Without cursors this is the latest page. `before` pages back to older
+    messages and `after` forward to newer ones; the returned page carries the
+    cursors for the adjacent pages, or None where there are no more messages.
+    """
+    if before and after:
+        raise ValueError("Use either before or after, not both")
+    db = await get_database()
+
+    cursor = before or after
+    key = decode_cursor(cursor) if cursor else None
+    direction = 1 if after else -1
+
+    docs = await message_store.fetch(db, conversation_id, limit + 1, key, direction)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if direction == -1:
+        docs.reverse()
+
+    messages = []
+    for message_data in docs:
+        message_data["id"] = str(message_data.pop("_id"))
+        messages.append(Message(**message_data))
+
+    def position(message: Message) -> str:
+        return encode_cursor(message.created_at, message.id)
 
+    if not messages:
+        # Nothing past the cursor; point back the way the client came (None for an empty conversation)
+        return MessagePage(messages=[], before=after, after=before)
+    older = has_more if direction == -1 else bool(after)
+    newer = has_more if direction == 1 else bool(before)
+    return MessagePage(
+        messages=messages,
+        before=position(messages[0]) if older else None,
+        after=position(messages[-1]) if newer else None
+    )
 
 
-async def get_user_conversations(user_id: str) -> List[Conversation]:
-    """Get all conversations for a user, including all their messages."""
+async def get_conversation_list_version(user_id: str) -> Tuple[Any, ...]:
+    """Changes whenever any of the user's conversations is created, updated or deleted (for ETags)"""
     db = await get_database()
+    return await list_version(db.conversations, {"user_id": user_id})
 
-    # Query conversations belonging to the user, sorted by updated_at descending.
-    cursor = db.conversations.find({"user_id": user_id}).sort("updated_at", -1)
-    conversations = []
+async def get_user_conversation_summaries(
+    user_id: str,
+    limit: int = 50,
+    before: Optional[str] = None
+) -> Tuple[List[ConversationSummary], Optional[str]]:
+    """
+    One page of a user's conversations, most recently updated first, for the sidebar.
 
-    async for conv in cursor:
-        # Convert the conversation _id to a string.
-        conv["id"] = str(conv.pop("_id"))
-        
-        # Fetch all messages belonging to this conversation.
-        # Here we assume messages store "conversation_id" as a string.
-        messages_cursor = db.messages.find({"conversation_id": conv["id"]}).sort("created_at", 1)
-        messages = []
-        async for msg in messages_cursor:
-            # Convert message _id to a string.
-            msg["id"] = str(msg.pop("_id"))
-            # Optionally, ensure conversation_id is a string too.
-            if "conversation_id" in msg and isinstance(msg["conversation_id"], ObjectId):
-                msg["conversation_id"] = str(msg["conversation_id"])
-            messages.append(msg)
-        
-        conv["messages"] = messages
-        
-        # Optionally, compute a 'last_message' summary.
-        if messages:
-            last_message = messages[-1]  # Since we sort ascending, the last is the most recent.
-            conv["last_message"] = {
-                "role": last_message.get("role"),
-                "content": last_message.get("content", "")[:100] + ("..." if len(last_message.get("content", "")) > 100 else ""),
-                "created_at": last_message.get("created_at")
-            }
-        else:
-            conv["last_message"] = None
-        
-        # Create a Conversation model instance from the dictionary.
-        conversations.append(Conversation(**conv))
-    
-    return conversations
+    A single aggregation returns the conversation fields with the denormalized
+    message count and last-message preview; no messages are read. Returns the
+    page and the cursor for the next one (None on the last page).
+    """
+    db = await get_database()
+
+    match: Dict[str, Any] = {"user_id": user_id}
+    if before:
+        updated_at, object_id = decode_cursor(before)
+        match["$or"] = [
+            {"updated_at": {"$lt": updated_at}},
+            {"updated_at": updated_at, "_id": {"$lt": object_id}}
+        ]
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"updated_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {
+            "title": 1, "llm_id": 1, "created_at": 1, "updated_at": 1,
+            "message_count": 1, "last_message": "$last_message_preview"
+        }}
+    ]
+
+    docs = await db.conversations.aggregate(pipeline).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["updated_at"], str(docs[-1]["_id"]))
+
+    summaries = []
+    for doc in docs:
+        doc["id"] = str(doc.pop("_id"))
+        summaries.append(ConversationSummary(**doc))
+    return summaries, next_cursor
 
 
 async def create_conversation(user_id: str, data: ConversationCreate) -> Conversation:
@@ -98,7 +223,8 @@ async def create_conversation(user_id: str, data: ConversationCreate) -> Convers
         "title": data.title,
         "llm_id": data.llm_id,
         "created_at": now,
-        "updated_at": now
+        "updated_at": now,
+        **EMPTY_CONVERSATION_COUNTERS
     }
     
     result = await db.conversations.insert_one(conversation_doc)
@@ -150,13 +276,17 @@ async def delete_conversation(conversation_id: str) -> bool:
     result = await db.conversations.delete_one({"_id": object_id})
     if result.deleted_count == 0:
         return False
+    _conversation_owners.pop(conversation_id, None)
     
-    await db.messages.delete_many({"conversation_id": conversation_id})
+    # Buffered chat messages must land before the delete, or they would outlive the conversation
+    await write_behind.flush()
+    await message_store.delete_conversation(db, conversation_id)
     
     try:
         await llm_manager_service.reset_conversation(conversation_id)
     except Exception as e:
         logger.warning(f"Could not reset LLMManager conversation {conversation_id}: {e}")
+    llm_manager_service.forget_conversation(conversation_id)
     
     return True
 
@@ -164,16 +294,6 @@ async def add_message(conversation_id: str, role: str, content: str, metadata: D
     """Add a message to a conversation"""
     db = await get_database()
     
-    try:
-        print("adding message...")
-        object_id = ObjectId(conversation_id)
-        conversation = await db.conversations.find_one({"_id": object_id})
-        if not conversation:
-            raise ValueError(f"Conversation {conversation_id} not found")
-    except Exception as e:
-        logger.error(f"Error validating conversation: {e}")
-        raise ValueError(f"Conversation validation error: {str(e)}")
-    
     message_doc = {
         "conversation_id": conversation_id,
         "role": role,
@@ -182,33 +302,46 @@ async def add_message(conversation_id: str, role: str, content: str, metadata: D
         "metadata": metadata or {}
     }
     
-    result = await db.messages.insert_one(message_doc)
-    message_id = str(result.inserted_id)
+    try:
+        object_id = ObjectId(conversation_id)
+    except Exception as e:
+        logger.error(f"Error validating conversation: {e}")
+        raise ValueError(f"Conversation validation error: {str(e)}")
     
-    await db.conversations.update_one(
+    # The message goes in first, so the counters never describe a message that failed to insert
+    await message_store.insert(db, message_doc)
+    # Bumping the counters doubles as the existence check
+    result = await db.conversations.update_one(
         {"_id": object_id},
-        {"$set": {"updated_at": datetime.utcnow()}}
+        message_counter_update(role, content, message_doc["created_at"])
     )
+    if result.matched_count == 0:
+        # The conversation is gone (or never existed): don't leave its message behind
+        await message_store.delete_conversation(db, conversation_id)
+        logger.error(f"Error validating conversation: Conversation {conversation_id} not found")
+        raise ValueError(f"Conversation validation error: Conversation {conversation_id} not found")
     
-    message_doc["id"] = message_id
+    message_doc["id"] = str(message_doc.pop("_id"))
     return Message(**message_doc)
 
 async def process_prompt(user_id: str, conversation_id: str, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
     """Process a prompt and get response from LLM using LLMManager"""
     try:
-        conversation = await get_conversation(conversation_id)
+        conversation = await get_conversation(conversation_id, message_limit=0)
         if not conversation:
             raise ValueError(f"Conversation with ID {conversation_id} not found")
         
         if conversation.user_id != user_id:
             raise ValueError("You don't have access to this conversation")
-        print("in process_prompt adding message...")
+        
+        # First exchange of the conversation: title it after the prompt once answered
+        is_first_exchange = conversation.message_count == 0
         await add_message(conversation_id, "user", prompt)
         
         start_time = time.time()
         
         try:
-            response_data = await llm_manager_service.send_message(conversation_id, prompt)
+            response_data = await llm_manager_service.queue_send_message(conversation_id, prompt, user_id=user_id)
             response_text = response_data.get("response", "")
             
             processing_time = time.time() - start_time
@@ -217,9 +350,7 @@ async def process_prompt(user_id: str, conversation_id: str, prompt: str, system
                 "processing_time": processing_time
             })
             
-            db = await get_database()
-            messages = await db.messages.count_documents({"conversation_id": conversation_id})
-            if messages <= 2:
+            if is_first_exchange:
                 title_from_prompt = ' '.join(prompt.split()[:5]) + "..."
                 await update_conversation(
                     conversation_id,
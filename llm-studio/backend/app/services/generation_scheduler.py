@@ -0,0 +1,160 @@
+# app/services/generation_scheduler.py
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Any, AsyncIterator, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+class QueueFullError(Exception):
+    """Raised when a model already has as many waiting requests as allowed"""
+
+class _Ticket:
+    __slots__ = ("user_id", "start_tag", "seq", "granted", "position", "changed")
+
+    def __init__(self, user_id: str, start_tag: float, seq: int):
+        self.user_id = user_id
+        self.start_tag = start_tag
+        self.seq = seq
+        self.granted = False
+        self.position: Optional[int] = None
+        self.changed = asyncio.Event()
+
+    @property
+    def order(self):
+        return (self.start_tag, self.seq)
+
+
+class _ModelQueue:
+    """Waiting requests and running slots of one model"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.waiting: List[_Ticket] = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.served = 0
+
+
+class GenerationScheduler:
+    """
+    Admit generations per model, with bounded concurrency and per-user fairness.
+
+    Each model runs at most `limit` generations at once; the limit comes from
+    configuration or from the capacity LLMManager reports. Waiting requests are
+    ordered by start-time fair queuing: every user's request is tagged with
+    max(virtual time, that user's previous finish tag), and finishes
+    1/weight later, so a user with many queued requests only gets their share
+    of slots instead of blocking everyone behind them.
+    """
+
+    def __init__(self, default_limit: int = 1, max_waiting: int = 100,
+                 limits: Optional[Dict[str, int]] = None, weights: Optional[Dict[str, float]] = None):
+        self.default_limit = max(1, default_limit)
+        self.max_waiting = max_waiting
+        self.configured_limits = dict(limits or {})
+        self.weights = dict(weights or {})
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+
+    def _queue(self, model_id: str) -> _ModelQueue:
+        queue = self._queues.get(model_id)
+        if queue is None:
+            limit = self.configured_limits.get(model_id, self.default_limit)
+            queue = self._queues[model_id] = _ModelQueue(max(1, limit))
+        return queue
+
+    def learn_capacity(self, model_id: str, capacity: int) -> None:
+        """Use the capacity LLMManager reports for a model unless a limit is configured for it"""
+        if model_id in self.configured_limits or capacity < 1:
+            return
+        queue = self._queue(model_id)
+        if queue.limit != capacity:
+            logger.info(f"Concurrency limit for model '{model_id}' set to {capacity}")
+            queue.limit = capacity
+            self._dispatch(queue)
+
+    def _enqueue(self, model_id: str, user_id: str, weight: Optional[float]) -> _Ticket:
+        queue = self._queue(model_id)
+        if len(queue.waiting) >= self.max_waiting:
+            raise QueueFullError(f"Too many requests are waiting for model '{model_id}'")
+        weight = weight or self.weights.get(user_id, 1.0)
+        start = max(queue.virtual_time, queue.last_finish.get(user_id, 0.0))
+        queue.last_finish[user_id] = start + 1.0 / max(weight, 1e-6)
+        ticket = _Ticket(user_id, start, next(self._seq))
+        queue.waiting.append(ticket)
+        queue.waiting.sort(key=lambda t: t.order)
+        self._dispatch(queue)
+        return ticket
+
+    def _dispatch(self, queue: _ModelQueue) -> None:
+        """Grant free slots in fair-queuing order and tell the rest where they stand"""
+        while queue.waiting and queue.running < queue.limit:
+            ticket = queue.waiting.pop(0)
+            queue.running += 1
+            queue.served += 1
+            queue.virtual_time = max(queue.virtual_time, ticket.start_tag)
+            ticket.granted = True
+            ticket.changed.set()
+        for position, ticket in enumerate(queue.waiting, start=1):
+            if ticket.position != position:
+                ticket.position = position
+                ticket.changed.set()
+        if not queue.waiting and queue.running == 0:
+            # Idle: old finish tags no longer matter
+            queue.last_finish.clear()
+
+    def _release(self, queue: _ModelQueue) -> None:
+        queue.running -= 1
+        self._dispatch(queue)
+
+    def _abandon(self, queue: _ModelQueue, ticket: _Ticket) -> None:
+        if ticket.granted:
+            self._release(queue)
+        elif ticket in queue.waiting:
+            queue.waiting.remove(ticket)
+            self._dispatch(queue)
+
+    @asynccontextmanager
+    async def slot(self, model_id: str, user_id: str, weight: Optional[float] = None,
+                   on_position: Optional[PositionCallback] = None) -> AsyncIterator[None]:
+        """
+        Wait for a generation slot on `model_id`.
+
+        `on_position` is awaited with the 1-based queue position whenever it
+        changes while the request waits (it is not called if a slot is free).
+        """
+        queue = self._queue(model_id)
+        ticket = self._enqueue(model_id, user_id, weight)
+        try:
+            while not ticket.granted:
+                await ticket.changed.wait()
+                ticket.changed.clear()
+                if not ticket.granted and on_position is not None and ticket.position is not None:
+                    try:
+                        await on_position(ticket.position)
+                    except Exception as e:
+                        logger.debug(f"Queue position callback failed: {e}")
+        except BaseException:
+            self._abandon(queue, ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release(queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            model_id: {
+                "limit": queue.limit,
+                "running": queue.running,
+                "waiting": len(queue.waiting),
+                "waiting_users": len({ticket.user_id for ticket in queue.waiting}),
+                "served": queue.served,
+            }
+            for model_id, queue in self._queues.items()
+        }
@@ -1,227 +1,491 @@
 import httpx
 import logging
 import asyncio
-from typing import Optional, Dict, List, Any, AsyncIterator, Tuple
-from datetime import datetime
+import random
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Any, AsyncIterator, Callable, Tuple
+from bson import ObjectId
 from app.core.config import settings
+from app.core.db import get_database
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.timing import time_phase
+from app.services.llm_upstream_pool import UpstreamPool, UpstreamNode
+from app.services.generation_scheduler import GenerationScheduler, PositionCallback
+from app.services.catalog_cache import CatalogCache
 
 logger = logging.getLogger(__name__)
 
+# Upstream responses that mean "LLMManager is down or restarting", as opposed to a request error.
+UNAVAILABLE_STATUS_CODES = {502, 503, 504}
+
+# Model of recently used conversations, for recreating them on another node. A conversation's
+# model never changes, but another worker may delete it (this worker's deletes drop the entry
+# at once), so entries are looked up again after CONVERSATION_MODEL_CACHE_TTL seconds.
+CONVERSATION_MODEL_CACHE_SIZE = 10000
+CONVERSATION_MODEL_CACHE_TTL = 30.0
+
+def _parse_pairs(value: str) -> List[Tuple[str, str]]:
+    """Parse a "key=value,key=value" setting"""
+    pairs = []
+    for item in value.split(","):
+        if "=" in item:
+            key, _, val = item.partition("=")
+            pairs.append((key.strip(), val.strip()))
+    return pairs
+
+@asynccontextmanager
+async def _release_probe_on_abort(node: UpstreamNode, probe: bool):
+    """
+    Release the node's half-open probe if the block ends without recording a
+    verdict: cancelled (e.g. the client disconnected) or failed in a way that
+    says nothing about the node. Transport errors are recorded as failures by the caller.
+    """
+    try:
+        yield
+    except httpx.TransportError:
+        raise
+    except BaseException:
+        if probe:
+            node.breaker.release_probe()
+        raise
+
 class LLMManagerService:
-    """Service to interact with the new LLMManager API with streaming support, plus a request queue
-    to ensure only one prompt is processed at a time."""
+    """Service to interact with the new LLMManager API with streaming support, plus a scheduler
+    that bounds concurrent generations per model and shares them fairly between users."""
     
     def __init__(self):
-        self.base_url = "http://llm-api:5000"
-        logger.info(f"LLMManager service initialized with base URL: {self.base_url}")
+        self.pool = self._build_pool(settings.LLM_MANAGER_URLS.split(","))
+        logger.info(f"LLMManager service initialized with nodes: {list(self.pool.nodes)}")
         
-        self.request_queue: asyncio.Queue[Tuple[str, str, asyncio.Future, str]] = asyncio.Queue()
-        self._worker_task = None
+        self.scheduler = GenerationScheduler(
+            default_limit=settings.LLM_DEFAULT_MODEL_CONCURRENCY,
+            max_waiting=settings.LLM_MAX_WAITING_PER_MODEL,
+            limits={model_id: int(limit) for model_id, limit in _parse_pairs(settings.LLM_MODEL_CONCURRENCY)},
+            weights={user_id: float(weight) for user_id, weight in _parse_pairs(settings.LLM_USER_WEIGHTS)}
+        )
+        self._health_task = None
+        self._client: Optional[httpx.AsyncClient] = None
+        # model_id per conversation, so a conversation can be recreated on the node it moves to
+        self._conversation_models: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # /api/models, refreshed in the background; invalidated by every model change made through this service
+        self.catalog: CatalogCache[Dict[str, Any]] = CatalogCache(
+            "model", self._fetch_models, ttl=settings.MODEL_CATALOG_TTL_SECONDS
+        )
+        # Called with a node when its /health reports a boot ID not seen before (first contact or a restart)
+        self._boot_listeners: List[Callable[[UpstreamNode], None]] = []
 
-    async def start_worker(self):
-        """Start the background worker if it hasn't been started yet."""
-        if self._worker_task is None:
-            self._worker_task = asyncio.create_task(self._process_queue())
-    
-    async def _process_queue(self):
-        """Background worker that processes requests from the queue sequentially."""
-        while True:
-            conversation_id, message, future, mode = await self.request_queue.get()
+    @staticmethod
+    def _build_pool(urls: List[str]) -> UpstreamPool:
+        return UpstreamPool(
+            [url.strip() for url in urls if url.strip()],
+            virtual_nodes=settings.LLM_MANAGER_VIRTUAL_NODES,
+            failure_threshold=settings.LLM_MANAGER_BREAKER_FAILURES,
+            reset_timeout=settings.LLM_MANAGER_BREAKER_RESET_SECONDS
+        )
+
+    @property
+    def base_url(self) -> str:
+        """URL of the first configured node (the only one in a single-node setup)"""
+        return next(iter(self.pool.nodes))
+
+    @base_url.setter
+    def base_url(self, url: str):
+        self.pool = self._build_pool([url])
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared keep-alive client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MANAGER_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MANAGER_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.LLM_MANAGER_KEEPALIVE_EXPIRY
+                )
+            )
+        return self._client
+
+    async def close(self):
+        """Stop the health monitor and close pooled connections (called on application shutdown)."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) retry attempt."""
+        ceiling = min(settings.LLM_MANAGER_RETRY_MAX_DELAY, settings.LLM_MANAGER_RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    async def _request(self, method: str, path: str, *, conversation_id: Optional[str] = None,
+                       node: Optional[UpstreamNode] = None, idempotent: bool = False,
+                       timeout: Optional[float] = 30.0, **kwargs) -> httpx.Response:
+        """
+        Send a request over the pooled client, guarded by the node's circuit breaker.
+
+        Requests about a conversation go to the node that owns it; the rest go
+        to the least-loaded healthy node unless a node is given. Only idempotent
+        calls are retried (with jittered backoff, re-picking the node), and only
+        when LLMManager could not be reached or answered 502/503/504.
+        """
+        attempts = max(1, settings.LLM_MANAGER_RETRIES) if idempotent else 1
+        for attempt in range(1, attempts + 1):
+            target = node or self.pool.pick(conversation_id)
+            probe = target.breaker.before_call()
             try:
-                if mode == 'send':
-                    logger.info(f"Processing send request for conversation {conversation_id}")
-                    result = await self.send_message(conversation_id, message)
-                elif mode == 'stream':
-                    logger.info(f"Processing stream request for conversation {conversation_id}")
-                    chunks = []
-                    async for chunk in self.stream_message(conversation_id, message):
-                        chunks.append(chunk)
-                    result = ''.join(chunks)
-                else:
-                    raise ValueError("Unknown mode in request queue")
-                future.set_result(result)
+                async with _release_probe_on_abort(target, probe), self.pool.lease(target):
+                    with time_phase("upstream"):
+                        response = await self._get_client().request(
+                            method, f"{target.url}{path}", timeout=timeout, **kwargs
+                        )
+            except httpx.TransportError as e:
+                target.breaker.record_failure()
+                logger.warning(f"{method} {target.url}{path} failed on attempt {attempt}/{attempts}: {e!r}")
+                if attempt == attempts:
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            if response.status_code in UNAVAILABLE_STATUS_CODES:
+                target.breaker.record_failure()
+                if attempt < attempts:
+                    logger.warning(f"{method} {target.url}{path} returned {response.status_code} on attempt {attempt}/{attempts}, retrying")
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                    continue
+            else:
+                target.breaker.record_success()
+            response.raise_for_status()
+            return response
+
+    async def _broadcast(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Send a model management call to every node so they serve the same models.
+
+        Returns the first successful response; raises the first error only if
+        no node accepted the call.
+        """
+        nodes = self.pool.active_nodes()
+        results = await asyncio.gather(
+            *(self._request(method, path, node=node, **kwargs) for node in nodes),
+            return_exceptions=True
+        )
+        first_error = None
+        first_response = None
+        for node, result in zip(nodes, results):
+            if isinstance(result, BaseException):
+                logger.error(f"{method} {path} failed on {node.url}: {result!r}")
+                first_error = first_error or result
+            elif first_response is None:
+                first_response = result
+        if first_response is None:
+            raise first_error
+        return first_response
+
+    def _remember_model(self, conversation_id: str, model_id: str) -> None:
+        self._conversation_models[conversation_id] = (model_id, time.monotonic())
+        self._conversation_models.move_to_end(conversation_id)
+        while len(self._conversation_models) > CONVERSATION_MODEL_CACHE_SIZE:
+            self._conversation_models.popitem(last=False)
+
+    def forget_conversation(self, conversation_id: str) -> None:
+        """Drop what this worker remembers about a deleted conversation"""
+        self._conversation_models.pop(conversation_id, None)
+        self.pool.forget(conversation_id)
+
+    async def _conversation_model(self, conversation_id: str) -> Optional[str]:
+        cached = self._conversation_models.get(conversation_id)
+        if cached is not None:
+            model_id, cached_at = cached
+            if time.monotonic() - cached_at < CONVERSATION_MODEL_CACHE_TTL:
+                self._conversation_models.move_to_end(conversation_id)
+                return model_id
+            del self._conversation_models[conversation_id]
+        db = await get_database()
+        conv = await db.conversations.find_one({"_id": ObjectId(conversation_id)}, {"llm_id": 1})
+        model_id = conv.get("llm_id") if conv else None
+        if model_id:
+            self._remember_model(conversation_id, model_id)
+        return model_id
+
+    async def _recreate_conversation(self, conversation_id: str) -> bool:
+        """Recreate a conversation on its current node after it moved or the node restarted."""
+        try:
+            model_id = await self._conversation_model(conversation_id)
+            if not model_id:
+                return False
+            logger.info(f"Recreating conversation {conversation_id} on {self.pool.pick(conversation_id).url}")
+            await self.create_conversation(model_id, conversation_id)
+            return True
+        except Exception as e:
+            logger.error(f"Could not recreate conversation {conversation_id}: {e}")
+            return False
+
+    async def refresh_health(self) -> List[Dict[str, Any]]:
+        """Poll every node's /health and update its health flag and queue depth."""
+        nodes = list(self.pool.nodes.values())
+
+        async def probe(node: UpstreamNode) -> Optional[Dict[str, Any]]:
+            try:
+                response = await self._get_client().get(f"{node.url}/health", timeout=5.0)
+                response.raise_for_status()
+                payload = response.json()
             except Exception as e:
-                logger.error(f"Error processing queued request: {e}", exc_info=True)
-                future.set_exception(e)
-            finally:
-                self.request_queue.task_done()
-    
-    async def queue_send_message(self, conversation_id: str, message: str) -> Dict[str, Any]:
-        """Enqueue a send_message request so that only one is processed at a time."""
-        loop = asyncio.get_running_loop()
-        future = loop.create_future()
-        await self.request_queue.put((conversation_id, message, future, 'send'))
-        return await future
-
-    async def queue_stream_message(self, conversation_id: str, message: str) -> str:
-        """Enqueue a stream_message request and return the complete response as a string."""
-        loop = asyncio.get_running_loop()
-        future = loop.create_future()
-        await self.request_queue.put((conversation_id, message, future, 'stream'))
-        return await future
+                if node.healthy:
+                    logger.warning(f"LLMManager node {node.url} failed its health check: {e!r}")
+                node.healthy = False
+                payload = None
+            else:
+                if not node.healthy:
+                    logger.info(f"LLMManager node {node.url} is healthy again")
+                node.healthy = True
+                node.queue_depth = int(payload.get("queue_depth", 0) or 0)
+                self._check_boot(node, payload.get("boot_id"))
+            node.last_checked = time.monotonic()
+            return payload
 
-    async def get_models(self) -> Dict[str, Any]:
-        logger.info(f"Fetching models from {self.base_url}/api/models")
-        max_retries = 1
-        for attempt in range(max_retries):
+        return await asyncio.gather(*(probe(node) for node in nodes))
+
+    def _check_boot(self, node: UpstreamNode, boot_id: Optional[str]) -> None:
+        if not boot_id or boot_id == node.boot_id:
+            return
+        if node.boot_id is not None:
+            logger.warning(f"LLMManager node {node.url} restarted (boot {node.boot_id} -> {boot_id})")
+            # It may have come back with other models
+            self.catalog.invalidate()
+        node.boot_id = boot_id
+        for listener in self._boot_listeners:
+            try:
+                listener(node)
+            except Exception as e:
+                logger.error(f"Boot listener failed for {node.url}: {e}")
+
+    def on_node_boot(self, listener: Callable[[UpstreamNode], None]) -> None:
+        """Register a callback for nodes reporting a new boot ID"""
+        self._boot_listeners.append(listener)
+
+    async def _monitor_health(self):
+        while True:
             try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(f"{self.base_url}/api/models")
-                    response.raise_for_status()
-                    models = response.json()
-                    for model in models:
-                        if 'id' in model:
-                            model['id'] = model['id'].split(' ')[0]
-                    logger.info(f"Successfully fetched {len(models)} models")
-                    return models
-            except httpx.ConnectError as e:
-                logger.error(f"Connection error on attempt {attempt+1}/{max_retries}: {str(e)}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-            except httpx.TimeoutException as e:
-                logger.error(f"Timeout error on attempt {attempt+1}/{max_retries}: {str(e)}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
+                await self.refresh_health()
             except Exception as e:
-                logger.error(f"Unexpected error fetching models on attempt {attempt+1}/{max_retries}: {str(e)}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
+                logger.error(f"Health monitor error: {e}")
+            await asyncio.sleep(settings.LLM_MANAGER_HEALTH_INTERVAL)
+
+    def start_health_monitor(self):
+        """Start polling node health in the background if it isn't running yet."""
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._monitor_health())
+
+    def add_node(self, url: str) -> Dict[str, Any]:
+        return self.pool.add_node(url).snapshot()
+
+    async def remove_node(self, url: str) -> Dict[str, Any]:
+        """Drain a node (let its in-flight requests finish) and remove it from the pool."""
+        if not [node for node in self.pool.active_nodes() if node.url != url.rstrip("/")]:
+            raise ValueError("Cannot remove the last LLMManager node")
+        drained = await self.pool.remove_node(url, timeout=settings.LLM_MANAGER_DRAIN_TIMEOUT)
+        return {"url": url, "drained": drained, "nodes": self.pool.snapshot()}
+
+    async def queue_send_message(self, conversation_id: str, message: str, user_id: str = "system",
+                                 on_position: Optional[PositionCallback] = None) -> Dict[str, Any]:
+        """Wait for a slot on the conversation's model, then send the message."""
+        model_id = await self._conversation_model(conversation_id)
+        async with self.scheduler.slot(model_id or "unknown", user_id, on_position=on_position):
+            return await self.send_message(conversation_id, message)
+
+    async def queue_stream_message(self, conversation_id: str, message: str, user_id: str = "system",
+                                   on_position: Optional[PositionCallback] = None) -> str:
+        """Wait for a slot on the conversation's model and return the complete streamed response as a string."""
+        model_id = await self._conversation_model(conversation_id)
+        async with self.scheduler.slot(model_id or "unknown", user_id, on_position=on_position):
+            chunks = []
+            async for chunk in self.stream_message(conversation_id, message):
+                chunks.append(chunk)
+            return ''.join(chunks)
+
+    async def _fetch_models(self) -> Dict[str, Any]:
+        logger.info("Fetching models from LLMManager /api/models")
+        response = await self._request("GET", "/api/models", idempotent=True, timeout=10.0)
+        models = response.json()
+        for model_id, model in models.items():
+            if isinstance(model, dict) and 'id' in model:
+                model['id'] = model['id'].split(' ')[0]
+            replicas = model.get('replicas') if isinstance(model, dict) else None
+            if isinstance(replicas, dict):
+                # LLMManager reports the replica pool's stats
+                replicas = replicas.get('count')
+            if replicas:
+                # Each node serves the model with its own replicas
+                self.scheduler.learn_capacity(model_id, int(replicas) * len(self.pool.active_nodes()))
+        logger.info(f"Successfully fetched {len(models)} models")
+        return models
+
+    async def get_models(self) -> Dict[str, Any]:
+        """The model catalog, from the cache; the returned dict is shared and must not be modified"""
+        try:
+            return await self.catalog.get()
+        except CircuitOpenError as e:
+            logger.error(f"Not fetching models: {e}")
+        except httpx.ConnectError as e:
+            logger.error(f"Connection error fetching models: {str(e)}")
+        except httpx.TimeoutException as e:
+            logger.error(f"Timeout error fetching models: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error fetching models: {str(e)}")
         
         logger.error("All attempts to fetch models failed, returning empty model list")
         return {}
     
+    @staticmethod
+    def _upstream_conversation_id(conversation_id: str) -> str:
+        """
+        The ID a conversation has on LLMManager: database IDs (24 hex digits)
+        are offset by one, other IDs (e.g. ones LLMManager generated) are used
+        as they are. Every call about a conversation must go through this.
+        """
+        if len(conversation_id) != 24:
+            return conversation_id
+        try:
+            conv_int = int(conversation_id, 16)
+        except ValueError:
+            return conversation_id
+        return format(conv_int - 1, '024x')
+
     async def create_conversation(self, model_id: str, conversation_id: Optional[str] = None) -> Dict[str, Any]:
-        if conversation_id is not None:
-            try:
-                conv_int = int(conversation_id, 16)
-                adjusted_conv_int = conv_int - 1
-                adjusted_conversation_id = format(adjusted_conv_int, '024x')
-            except Exception as e:
-                raise ValueError("Invalid conversation_id format, must be a valid 24-character hex string") from e
-        else:
-            adjusted_conversation_id = None
+        upstream_id = self._upstream_conversation_id(conversation_id) if conversation_id is not None else None
 
         data = {
             "model_id": model_id,
-            "conversation_id": adjusted_conversation_id
+            "conversation_id": upstream_id
         }
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(f"{self.base_url}/api/conversation", json=data)
-            response.raise_for_status()
-            return response.json()
+        # Without an ID there is nothing to hash on yet, so create it on the least-loaded node and pin it there.
+        node = None if conversation_id is not None else self.pool.pick()
+        # Creating with an explicit ID converges to the same state, so it is safe to retry.
+        response = await self._request("POST", "/api/conversation", json=data, conversation_id=conversation_id,
+                                       node=node, idempotent=upstream_id is not None)
+        result = response.json()
+        if node is not None and result.get("conversation_id"):
+            self.pool.pin(result["conversation_id"], node.url)
+        if conversation_id or result.get("conversation_id"):
+            self._remember_model(conversation_id or result["conversation_id"], model_id)
+        return result
 
     async def get_conversation(self, conversation_id: str) -> Dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(f"{self.base_url}/api/conversation/{conversation_id}")
-            response.raise_for_status()
-            return response.json()
+        response = await self._request("GET", f"/api/conversation/{self._upstream_conversation_id(conversation_id)}",
+                                       conversation_id=conversation_id, idempotent=True)
+        return response.json()
     
     async def reset_conversation(self, conversation_id: str) -> Dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(f"{self.base_url}/api/conversation/{conversation_id}/reset")
-            response.raise_for_status()
-            return response.json()
+        response = await self._request("POST", f"/api/conversation/{self._upstream_conversation_id(conversation_id)}/reset",
+                                       conversation_id=conversation_id, idempotent=True)
+        return response.json()
     
     async def send_message(self, conversation_id: str, message: str) -> Dict[str, Any]:
+        # The request ID lets LLMManager answer a resend of this turn without generating it again
         data = {
-            "conversation_id": conversation_id,
-            "message": message
+            "conversation_id": self._upstream_conversation_id(conversation_id),
+            "message": message,
+            "request_id": uuid.uuid4().hex
         }
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(f"{self.base_url}/api/chat", json=data)
-            response.raise_for_status()
-            return response.json()
+        try:
+            response = await self._request("POST", "/api/chat", json=data, conversation_id=conversation_id, timeout=60.0)
+        except httpx.HTTPStatusError as e:
+            # The node doesn't know the conversation (it moved or the node restarted);
+            # nothing was generated, so recreate it there and send the turn once more.
+            if e.response.status_code != 404 or not await self._recreate_conversation(conversation_id):
+                raise
+            response = await self._request("POST", "/api/chat", json=data, conversation_id=conversation_id, timeout=60.0)
+        return response.json()
         
     async def stream_message(self, conversation_id: str, message: str) -> AsyncIterator[str]:
         import json
-        data = {"conversation_id": conversation_id, "message": message}
-        print(data)
-        try:
-            async with httpx.AsyncClient(timeout=None) as client:
-                async with client.stream("POST", f"{self.base_url}/api/chat", json=data) as response:
-                    response.raise_for_status()
-                    async for chunk in response.aiter_text():
-                        chunk = chunk.strip()
-                        if not chunk:
+        data = {"conversation_id": self._upstream_conversation_id(conversation_id), "message": message,
+                "request_id": uuid.uuid4().hex}
+        node = None
+        # The whole generation counts as upstream time, including while the client reads it
+        with time_phase("upstream"):
+            try:
+                for attempt in range(2):
+                    node = self.pool.pick(conversation_id)
+                    probe = node.breaker.before_call()
+                    async with _release_probe_on_abort(node, probe), self.pool.lease(node), \
+                            self._get_client().stream("POST", f"{node.url}/api/chat", json=data, timeout=None) as response:
+                        if response.status_code in UNAVAILABLE_STATUS_CODES:
+                            node.breaker.record_failure()
+                        else:
+                            node.breaker.record_success()
+                        # Unknown conversation on this node: recreate it and retry once (nothing was generated yet)
+                        if response.status_code == 404 and attempt == 0 and await self._recreate_conversation(conversation_id):
                             continue
-                        try:
-                            json_data = json.loads(chunk)
-                            if "error" in json_data:
-                                logger.error(f"Error in stream: {json_data['error']}")
-                                yield f"Error: {json_data['error']}"
-                                return
-                            content = json_data.get("response") or json_data.get("text") or json_data.get("content", "")
-                            yield content
-                        except json.JSONDecodeError:
-                            yield chunk
-        except asyncio.TimeoutError:
-            logger.error("Timeout streaming response")
-            yield "Error: Request timed out"
-        except Exception as e:
-            logger.error(f"Error streaming response: {e}")
-            yield f"Error: {str(e)}"
+                        response.raise_for_status()
+                        async for chunk in response.aiter_text():
+                            chunk = chunk.strip()
+                            if not chunk:
+                                continue
+                            try:
+                                json_data = json.loads(chunk)
+                                if "error" in json_data:
+                                    logger.error(f"Error in stream: {json_data['error']}")
+                                    yield f"Error: {json_data['error']}"
+                                    return
+                                content = json_data.get("response") or json_data.get("text") or json_data.get("content", "")
+                                yield content
+                            except json.JSONDecodeError:
+                                yield chunk
+                        return
+            except asyncio.TimeoutError:
+                logger.error("Timeout streaming response")
+                yield "Error: Request timed out"
+            except httpx.TransportError as e:
+                if node is not None:
+                    node.breaker.record_failure()
+                logger.error(f"Error streaming response: {e!r}")
+                yield f"Error: {str(e)}"
+            except Exception as e:
+                logger.error(f"Error streaming response: {e}")
+                yield f"Error: {str(e)}"
 
     async def add_model(self, model_data: Dict[str, Any]) -> Dict[str, Any]:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(f"{self.base_url}/api/add-llm", json=model_data)
-            response.raise_for_status()
-            return response.json()
+        try:
+            response = await self._broadcast("POST", "/api/add-llm", json=model_data, timeout=60.0)
+        finally:
+            # Some nodes may have applied the change even if the broadcast failed
+            self.catalog.invalidate()
+        return response.json()
     
     async def delete_model(self, model_id: str) -> Dict[str, Any]:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.delete(f"{self.base_url}/api/delete-llm/{model_id}")
-            response.raise_for_status()
-            return response.json()
+        try:
+            response = await self._broadcast("DELETE", f"/api/delete-llm/{model_id}")
+        finally:
+            self.catalog.invalidate()
+        return response.json()
     
     async def analyze_models(self, model_path: str) -> Dict[str, Any]:
         data = {"model_path": model_path}
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(f"{self.base_url}/api/analyze-model", json=data)
-            response.raise_for_status()
-            return response.json()
+        response = await self._request("POST", "/api/analyze-model", json=data, idempotent=True)
+        return response.json()
     
     async def initialize_models(self, models_config: List[Dict[str, Any]]) -> Dict[str, Any]:
         data = {"models": models_config}
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(f"{self.base_url}/api/initialize", json=data)
-            response.raise_for_status()
-            return response.json()
+        try:
+            response = await self._broadcast("POST", "/api/initialize", json=data, timeout=60.0)
+        finally:
+            self.catalog.invalidate()
+        return response.json()
     
     async def health_check(self) -> Dict[str, Any]:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{self.base_url}/health")
-            response.raise_for_status()
-            return response.json()
-
-    async def sync_llms_to_database(self) -> Dict[str, Any]:
-        try:
-            llm_models = await self.get_models()
-            from app.core.db import get_database
-            db = await get_database()
-            for llm_id, llm_data in llm_models.items():
-                await db.llms.update_one(
-                    {"_id": llm_id},
-                    {"$set": {
-                        "_id": llm_id,
-                        "name": llm_data.get("id", llm_id),
-                        "type": llm_data.get("type", "unknown"),
-                        "description": f"{llm_data.get('type', 'LLM')} model ({llm_data.get('size_mb', 0)/1024:.1f} GB)",
-                        "token_limit": llm_data.get("context_window", 2048),
-                        "api_endpoint": "internal://llm-manager",
-                        "parameters": {
-                            "max_tokens": llm_data.get("context_window", 2048),
-                            "temperature": llm_data.get("temperature", 0.7)
-                        },
-                        "status": "active",
-                        "created_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
-                    }},
-                    upsert=True
-                )
-            return {"success": True, "llms_synchronized": len(llm_models)}
-        except Exception as e:
-            logger.error(f"Failed to sync LLMs to database: {e}")
-            return {"success": False, "error": str(e)}
+        """Refresh every node's health and return the first healthy node's report"""
+        payloads = await self.refresh_health()
+        healthy = [payload for payload in payloads if payload is not None]
+        if not healthy:
+            raise CircuitOpenError("No healthy LLMManager nodes")
+        return healthy[0]
 
     async def modify_model_parameters(
         self,
@@ -249,15 +513,10 @@ class LLMManagerService:
 
         logger.info(f"Modifying model '{model_id}' with parameters: {data}")
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.put(
-                    f"{self.base_url}/api/modify-model/{model_id}",
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Successfully modified model '{model_id}': {result}")
-                return result
+            response = await self._broadcast("PUT", f"/api/modify-model/{model_id}", json=data, idempotent=True)
+            result = response.json()
+            logger.info(f"Successfully modified model '{model_id}': {result}")
+            return result
         except httpx.HTTPStatusError as e:
             error_detail = e.response.json().get("detail", str(e))
             logger.error(f"Failed to modify model '{model_id}': {error_detail}")
@@ -265,6 +524,8 @@ class LLMManagerService:
         except Exception as e:
             logger.error(f"Unexpected error modifying model '{model_id}': {str(e)}")
             raise
+        finally:
+            self.catalog.invalidate()
 
     async def get_model_info(self, model_id: str) -> Dict[str, Any]:
         """Get detailed information about a specific model"""
@@ -280,6 +541,9 @@ class LLMManagerService:
                     "model_path": model_info.get("model_path", "N/A"),
                     "context_window": model_info.get("context_window", 2048),
                     "n_threads": model_info.get("n_threads", 4),
+                    "n_batch": model_info.get("n_batch"),
+                    "calibration": model_info.get("calibration"),
+                    "replicas": model_info.get("replicas"),
                     "n_gpu_layers": model_info.get("n_gpu_layers", 0),
                     "temperature": model_info.get("temperature", 0.7),
                     "backend": model_info.get("backend"),
@@ -293,36 +557,21 @@ class LLMManagerService:
             logger.error(f"Failed to fetch model info for '{model_id}': {str(e)}")
             raise ValueError(f"Failed to fetch model info: {str(e)}") from e
 
-    async def sync_all_conversations_with_llm_manager(self) -> Dict[str, Any]:
-        logger.info("Starting global sync of ALL conversations with LLM Manager.")
-        synced_count = 0
-        error_count = 0
-        total_processed = 0
-        try:
-            from app.core.db import get_database
-            db = await get_database()
-            conversations_cursor = db.conversations.find(
-                {},
-                {"_id": 1, "llm_id": 1, "user_id": 1}
-            )
-            async for conv in conversations_cursor:
-                total_processed += 1
-                conversation_id = str(conv.get("_id"))
-                model_id = conv.get("llm_id")
-                user_id = conv.get("user_id")
-                if not conversation_id or not model_id:
-                    logger.warning(f"[Global Sync] Skipping conversation due to missing data: {conv}")
-                    continue
-                try:
-                    await self.create_conversation(model_id, conversation_id)
-                    synced_count += 1
-                except Exception as sync_exc:
-                    error_count += 1
-                    logger.error(f"[Global Sync] Error syncing conv_id={conversation_id} (user: {user_id}): {sync_exc}", exc_info=False)
-            logger.info(f"Global conversation sync finished. Processed: {total_processed}, Synced/Ensured: {synced_count}, Errors: {error_count}")
-            return {"success": True, "processed": total_processed, "synced": synced_count, "errors": error_count}
-        except Exception as e:
-            logger.error(f"Major error during global conversation sync: {e}", exc_info=True)
-            return {"success": False, "error": str(e), "processed": total_processed, "synced": synced_count, "errors": error_count}
+    async def ensure_conversations(self, node: UpstreamNode, conversations: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        Make sure `node` has each (conversation_id, model_id), creating only
+        the missing ones; existing conversations keep their history, so the
+        call is safe to repeat. IDs are mapped as for chat calls, so the
+        conversations ensured are the ones later turns address.
+        """
+        data = {"conversations": [
+            {"conversation_id": self._upstream_conversation_id(conversation_id), "model_id": model_id}
+            for conversation_id, model_id in conversations
+        ]}
+        response = await self._request("POST", "/api/conversations/ensure", json=data, node=node,
+                                       idempotent=True, timeout=60.0)
+        for conversation_id, model_id in conversations:
+            self._remember_model(conversation_id, model_id)
+        return response.json()
 
 llm_manager_service = LLMManagerService()
\ No newline at end of file
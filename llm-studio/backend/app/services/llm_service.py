@@ -8,11 +8,40 @@ import asyncio
 from app.core.db import get_database
 from app.models.llm import LLM, LLMCreate, LLMUpdate
 from app.core.config import settings
+from app.services.catalog_cache import CatalogCache
 
 logger = logging.getLogger(__name__)
 
+async def _load_llm_catalog() -> Dict[str, LLM]:
+    db = await get_database()
+    catalog = {}
+    async for llm_data in db.llms.find():
+        llm_data["id"] = str(llm_data.pop("_id"))
+        try:
+            catalog[llm_data["id"]] = LLM(**llm_data)
+        except ValueError as e:
+            logger.warning(f"Skipping invalid LLM document {llm_data['id']}: {e}")
+    return catalog
+
+# Every LLM by ID. The collection is small and read on every new conversation, so it is
+# kept whole and refreshed in the background; writes below invalidate it
+llm_catalog: CatalogCache[Dict[str, LLM]] = CatalogCache(
+    "llm", _load_llm_catalog, ttl=settings.LLM_CATALOG_TTL_SECONDS
+)
+
 async def get_llm_by_id(llm_id: str) -> Optional[LLM]:
-    """Get LLM by ID"""
+    """Get LLM by ID; cached LLMs are shared and must not be modified"""
+    try:
+        llm = (await llm_catalog.get()).get(llm_id)
+    except Exception as e:
+        logger.warning(f"LLM catalog unavailable, reading {llm_id} directly: {e}")
+        llm = None
+    if llm is not None:
+        return llm
+    # Created by another worker since the last refresh, or unknown
+    return await _read_llm(llm_id)
+
+async def _read_llm(llm_id: str) -> Optional[LLM]:
     db = await get_database()
     
     try:
@@ -65,6 +94,7 @@ async def create_llm(llm_data: LLMCreate) -> LLM:
     }
     
     result = await db.llms.insert_one(llm_doc)
+    llm_catalog.invalidate()
     llm_id = str(result.inserted_id)
     
     llm_doc["id"] = llm_id
@@ -86,6 +116,7 @@ async def update_llm(llm_id: str, llm_data: LLMUpdate) -> Optional[LLM]:
             {"_id": ObjectId(llm_id)},
             {"$set": update_data}
         )
+        llm_catalog.invalidate()
     
     return await get_llm_by_id(llm_id)
 
@@ -93,6 +124,7 @@ async def delete_llm(llm_id: str) -> bool:
     """Delete an LLM"""
     db = await get_database()
     result = await db.llms.delete_one({"_id": ObjectId(llm_id)})
+    llm_catalog.invalidate()
     return result.deleted_count > 0
 
 async def call_llm_api(llm: LLM, prompt: str, system_prompt: Optional[str] = None) -> str:
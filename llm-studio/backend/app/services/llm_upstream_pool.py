@@ -0,0 +1,218 @@
+# app/services/llm_upstream_pool.py
+import asyncio
+import bisect
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Any, AsyncIterator
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+class UpstreamNode:
+    """One LLMManager process, with its own circuit breaker and load figures."""
+
+    def __init__(self, url: str, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.url = url.rstrip("/")
+        self.breaker = CircuitBreaker(f"LLMManager {self.url}", failure_threshold, reset_timeout)
+        self.healthy = True
+        self.draining = False
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.last_checked: Optional[float] = None
+        # Reported by the node's /health; changes when the LLMManager process restarts
+        self.boot_id: Optional[str] = None
+
+    @property
+    def load(self) -> int:
+        """Work queued on the node (as of the last health check) plus requests we have in flight to it"""
+        return self.queue_depth + self.in_flight
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and not self.draining and self.breaker.state != CircuitBreaker.OPEN
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "draining": self.draining,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "breaker": self.breaker.state,
+            "boot_id": self.boot_id,
+            "last_checked_seconds_ago": (
+                round(time.monotonic() - self.last_checked, 1) if self.last_checked else None
+            ),
+        }
+
+
+class UpstreamPool:
+    """
+    Route requests across several LLMManager nodes.
+
+    Conversations are placed with consistent hashing on their ID, so a
+    conversation's state (and the KV cache behind it) stays on one node and
+    adding or removing a node only moves the conversations that hashed to it.
+    If a conversation's node is unavailable it is moved to the least-loaded
+    healthy node and stays there, so its turns don't bounce between nodes.
+    """
+
+    def __init__(self, urls: List[str], virtual_nodes: int = 64, failure_threshold: int = 5,
+                 reset_timeout: float = 10.0, max_pinned: int = 10000):
+        self.virtual_nodes = max(1, virtual_nodes)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_pinned = max_pinned
+        self.nodes: Dict[str, UpstreamNode] = {}
+        self._ring: List[int] = []
+        self._ring_urls: List[str] = []
+        self._pinned: "OrderedDict[str, str]" = OrderedDict()
+        self._idle = asyncio.Condition()
+        for url in urls:
+            self._add(url)
+        self._rebuild_ring()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def _add(self, url: str) -> UpstreamNode:
+        node = UpstreamNode(url, self.failure_threshold, self.reset_timeout)
+        self.nodes[node.url] = node
+        return node
+
+    def _rebuild_ring(self) -> None:
+        points = sorted(
+            (self._hash(f"{node.url}#{i}"), node.url)
+            for node in self.nodes.values() if not node.draining
+            for i in range(self.virtual_nodes)
+        )
+        self._ring = [point for point, _ in points]
+        self._ring_urls = [url for _, url in points]
+
+    def owner(self, key: str) -> Optional[UpstreamNode]:
+        """The node a key hashes to, ignoring health"""
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._ring, self._hash(key)) % len(self._ring)
+        return self.nodes[self._ring_urls[index]]
+
+    def least_loaded(self) -> Optional[UpstreamNode]:
+        candidates = [node for node in self.nodes.values() if node.available]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda node: node.load)
+
+    def pick(self, key: Optional[str] = None) -> UpstreamNode:
+        """
+        Choose the node for a request.
+
+        Keyed requests go to their pinned or hashed node while it is available;
+        everything else goes to the least-loaded healthy node. When nothing is
+        available the hashed node is returned anyway, so its breaker decides
+        whether to fail fast or let a probe through.
+        """
+        if key is not None:
+            pinned = self._pinned.get(key)
+            if pinned is not None:
+                node = self.nodes.get(pinned)
+                if node is not None and node.available:
+                    self._pinned.move_to_end(key)
+                    return node
+                del self._pinned[key]
+
+            node = self.owner(key)
+            if node is not None and node.available:
+                return node
+
+            fallback = self.least_loaded()
+            if fallback is not None:
+                if node is not None:
+                    logger.warning(f"Node {node.url} unavailable, moving conversation {key} to {fallback.url}")
+                self.pin(key, fallback.url)
+                return fallback
+            if node is not None:
+                return node
+        else:
+            node = self.least_loaded()
+            if node is not None:
+                return node
+
+        for node in self.nodes.values():
+            if not node.draining:
+                return node
+        raise CircuitOpenError("No LLMManager nodes are configured")
+
+    def pin(self, key: str, url: str) -> None:
+        self._pinned[key] = url
+        self._pinned.move_to_end(key)
+        while len(self._pinned) > self.max_pinned:
+            self._pinned.popitem(last=False)
+
+    def forget(self, key: str) -> None:
+        self._pinned.pop(key, None)
+
+    def active_nodes(self) -> List[UpstreamNode]:
+        """Nodes that should receive model management calls (everything not being drained)"""
+        return [node for node in self.nodes.values() if not node.draining]
+
+    @asynccontextmanager
+    async def lease(self, node: UpstreamNode) -> AsyncIterator[UpstreamNode]:
+        """Count a request against a node for load balancing and draining"""
+        node.in_flight += 1
+        try:
+            yield node
+        finally:
+            node.in_flight -= 1
+            if node.in_flight == 0:
+                async with self._idle:
+                    self._idle.notify_all()
+
+    def add_node(self, url: str) -> UpstreamNode:
+        url = url.rstrip("/")
+        node = self.nodes.get(url)
+        if node is not None:
+            node.draining = False
+        else:
+            node = self._add(url)
+        self._rebuild_ring()
+        logger.info(f"LLMManager node {url} added to the pool")
+        return node
+
+    async def remove_node(self, url: str, timeout: Optional[float] = None) -> bool:
+        """
+        Drain a node and drop it from the pool.
+
+        The node is taken off the ring straight away, so new requests go to
+        the node that will own its conversations afterwards, while requests
+        already running on it are allowed to finish. Returns False if the
+        timeout expired before it went idle (it is removed either way).
+        """
+        node = self.nodes.get(url.rstrip("/"))
+        if node is None:
+            raise KeyError(url)
+        node.draining = True
+        self._rebuild_ring()
+        for key in [key for key, pinned in self._pinned.items() if pinned == node.url]:
+            del self._pinned[key]
+        logger.info(f"Draining LLMManager node {node.url} ({node.in_flight} requests in flight)")
+
+        drained = True
+        try:
+            async with self._idle:
+                await asyncio.wait_for(self._idle.wait_for(lambda: node.in_flight == 0), timeout)
+        except asyncio.TimeoutError:
+            drained = False
+            logger.warning(f"Node {node.url} still had {node.in_flight} requests in flight after {timeout}s")
+
+        if node.draining:
+            self.nodes.pop(node.url, None)
+            logger.info(f"LLMManager node {node.url} removed from the pool")
+        return drained
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [node.snapshot() for node in self.nodes.values()]
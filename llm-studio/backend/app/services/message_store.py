@@ -0,0 +1,237 @@
+# app/services/message_store.py
+import logging
+from datetime import datetime
+from typing import Optional, Dict, List, Any, AsyncIterator, Tuple
+
+import bson
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.write_behind import write_behind
+
+logger = logging.getLogger(__name__)
+
+# Keyset position of a message: (created_at, _id)
+MessageKey = Tuple[datetime, ObjectId]
+
+def _key(doc: Dict[str, Any]) -> MessageKey:
+    return doc["created_at"], doc["_id"]
+
+
+class DocumentMessageStore:
+    """One document per message in `messages` (the original layout)."""
+
+    collection = "messages"
+
+    async def insert(self, db, message: Dict[str, Any]) -> ObjectId:
+        message.setdefault("_id", ObjectId())
+        await db.messages.insert_one(message)
+        return message["_id"]
+
+    async def buffer(self, message: Dict[str, Any]) -> ObjectId:
+        """Queue the insert on the write-behind writer"""
+        return await write_behind.insert("messages", message)
+
+    async def fetch(self, db, conversation_id: str, limit: int,
+                    key: Optional[MessageKey] = None, direction: int = -1) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` messages past `key` in `direction` (-1: older, newest
+        first; 1: newer, oldest first). Without a key, starts from the newest
+        (or oldest) message.
+        """
+        query: Dict[str, Any] = {"conversation_id": conversation_id}
+        if key is not None:
+            created_at, object_id = key
+            op = "$gt" if direction == 1 else "$lt"
+            query["$or"] = [
+                {"created_at": {op: created_at}},
+                {"created_at": created_at, "_id": {op: object_id}}
+            ]
+        return await db.messages.find(query).sort(
+            [("created_at", direction), ("_id", direction)]
+        ).limit(limit).to_list(length=limit)
+
+    async def iter_messages(self, db, conversation_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """All of a conversation's messages, oldest first"""
+        cursor = db.messages.find({"conversation_id": conversation_id}).sort([("created_at", 1), ("_id", 1)])
+        async for doc in cursor:
+            yield doc
+
+    def aggregate(self, db, pipeline: List[Dict[str, Any]], **kwargs):
+        """Run a pipeline over flat message documents"""
+        return db.messages.aggregate(pipeline, **kwargs)
+
+    async def delete_conversation(self, db, conversation_id: str) -> int:
+        result = await db.messages.delete_many({"conversation_id": conversation_id})
+        return result.deleted_count
+
+    async def estimated_count(self, db) -> int:
+        return await db.messages.estimated_document_count()
+
+    async def recount(self, db) -> int:
+        """Nothing to rebuild: the count comes from collection metadata"""
+        return await self.estimated_count(db)
+
+
+class BucketMessageStore:
+    """
+    Messages grouped into per-conversation buckets in `message_buckets`.
+
+    A bucket holds up to `bucket_size` messages (or roughly `max_bytes` of
+    them) in append order, with the time range it covers. Appending is a
+    single $push upsert into the conversation's open bucket; when every
+    bucket is full the upsert starts a new one. History reads fetch whole
+    buckets, so a page of N messages costs a handful of documents and index
+    entries instead of N.
+
+    Appends through the write-behind writer are at-least-once (a batch that
+    failed midway is replayed whole), so reads drop repeated message ids.
+
+    The total number of messages is kept in a counter document in
+    `message_counts`, incremented with every append and decremented when a
+    conversation is deleted, so the admin stats never scan the buckets. It
+    drifts upwards when an append is replayed; `recount()` (run by
+    app/scripts/backfill_conversation_counters.py) rebuilds it.
+    """
+
+    collection = "message_buckets"
+    TOTAL = {"_id": "message_buckets"}
+
+    def __init__(self, bucket_size: int = 100, max_bytes: int = 262144):
+        self.bucket_size = max(1, bucket_size)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def _entry(message: Dict[str, Any]) -> Dict[str, Any]:
+        """A message as stored inside its bucket (the bucket carries the conversation_id)"""
+        message.setdefault("_id", ObjectId())
+        return {k: v for k, v in message.items() if k != "conversation_id"}
+
+    def _append(self, message: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        entry = self._entry(message)
+        created_at = message["created_at"]
+        filter = {
+            "conversation_id": message["conversation_id"],
+            "count": {"$lt": self.bucket_size},
+            "bytes": {"$lt": self.max_bytes}
+        }
+        update = {
+            "$push": {"messages": entry},
+            "$inc": {"count": 1, "bytes": len(bson.encode(entry))},
+            "$min": {"first_at": created_at},
+            "$max": {"last_at": created_at}
+        }
+        return filter, update
+
+    async def insert(self, db, message: Dict[str, Any]) -> ObjectId:
+        filter, update = self._append(message)
+        await db.message_buckets.update_one(filter, update, upsert=True)
+        await db.message_counts.update_one(self.TOTAL, {"$inc": {"messages": 1}}, upsert=True)
+        return message["_id"]
+
+    async def buffer(self, message: Dict[str, Any]) -> ObjectId:
+        filter, update = self._append(message)
+        await write_behind.update("message_buckets", filter, update, upsert=True)
+        # Keyed, so a flush bumps the counter once however many messages it carries
+        await write_behind.update("message_counts", self.TOTAL, {"$inc": {"messages": 1}},
+                                  key=("total", self.collection), upsert=True)
+        return message["_id"]
+
+    def pack(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Group a conversation's messages (oldest first) into full buckets, as the migration writes them"""
+        buckets: List[Dict[str, Any]] = []
+        for message in messages:
+            entry = self._entry(dict(message))
+            bucket = buckets[-1] if buckets else None
+            if bucket is None or bucket["count"] >= self.bucket_size or bucket["bytes"] >= self.max_bytes:
+                bucket = {"conversation_id": conversation_id, "count": 0, "bytes": 0,
+                          "first_at": entry["created_at"], "messages": []}
+                buckets.append(bucket)
+            bucket["messages"].append(entry)
+            bucket["count"] += 1
+            bucket["bytes"] += len(bson.encode(entry))
+            bucket["last_at"] = entry["created_at"]
+        return buckets
+
+    @staticmethod
+    def _unpack(bucket: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [{**entry, "conversation_id": bucket["conversation_id"]} for entry in bucket.get("messages", [])]
+
+    async def fetch(self, db, conversation_id: str, limit: int,
+                    key: Optional[MessageKey] = None, direction: int = -1) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"conversation_id": conversation_id}
+        if direction == 1:
+            # Buckets are walked oldest first; stop once a bucket starts after everything we'll keep
+            if key is not None:
+                query["last_at"] = {"$gte": key[0]}
+            sort, bound = [("first_at", 1), ("_id", 1)], "first_at"
+            beyond = (lambda k: k > key) if key is not None else (lambda k: True)
+        else:
+            if key is not None:
+                query["first_at"] = {"$lte": key[0]}
+            sort, bound = [("last_at", -1), ("_id", -1)], "last_at"
+            beyond = (lambda k: k < key) if key is not None else (lambda k: True)
+
+        found: Dict[ObjectId, Dict[str, Any]] = {}
+        ordered: List[Dict[str, Any]] = []
+        async for bucket in db.message_buckets.find(query).sort(sort):
+            if len(ordered) >= limit:
+                # Buckets may overlap in time (two appends racing to open one), so keep
+                # reading until the next bucket can't hold anything inside the page
+                edge = ordered[limit - 1]["created_at"]
+                if (bucket[bound] > edge) if direction == 1 else (bucket[bound] < edge):
+                    break
+            for doc in self._unpack(bucket):
+                if doc["_id"] not in found and beyond(_key(doc)):
+                    found[doc["_id"]] = doc
+            ordered = sorted(found.values(), key=_key, reverse=direction == -1)
+        return ordered[:limit]
+
+    async def iter_messages(self, db, conversation_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """All of a conversation's messages, oldest first (one bucket read per batch of messages)"""
+        found: Dict[ObjectId, Dict[str, Any]] = {}
+        async for bucket in db.message_buckets.find({"conversation_id": conversation_id}).sort([("first_at", 1), ("_id", 1)]):
+            for doc in self._unpack(bucket):
+                found.setdefault(doc["_id"], doc)
+        for doc in sorted(found.values(), key=_key):
+            yield doc
+
+    def aggregate(self, db, pipeline: List[Dict[str, Any]], **kwargs):
+        """Run a pipeline over flat message documents, unwound from the buckets"""
+        unwind = [
+            {"$unwind": "$messages"},
+            {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$messages", {"conversation_id": "$conversation_id"}]}}}
+        ]
+        return db.message_buckets.aggregate(unwind + pipeline, **kwargs)
+
+    async def delete_conversation(self, db, conversation_id: str) -> int:
+        messages = sum([bucket.get("count", 0) async for bucket in
+                        db.message_buckets.find({"conversation_id": conversation_id}, {"count": 1})])
+        result = await db.message_buckets.delete_many({"conversation_id": conversation_id})
+        if messages:
+            await db.message_counts.update_one(self.TOTAL, {"$inc": {"messages": -messages}}, upsert=True)
+        return result.deleted_count
+
+    async def estimated_count(self, db) -> int:
+        """The maintained total (see the class docstring): one document read"""
+        doc = await db.message_counts.find_one(self.TOTAL)
+        return max(0, doc.get("messages", 0)) if doc else 0
+
+    async def recount(self, db) -> int:
+        """Rebuild the maintained total from the buckets (a full scan; for scripts, not requests)"""
+        rows = await db.message_buckets.aggregate([
+            {"$group": {"_id": None, "messages": {"$sum": "$count"}}}
+        ]).to_list(length=1)
+        total = rows[0]["messages"] if rows else 0
+        await db.message_counts.update_one(self.TOTAL, {"$set": {"messages": total}}, upsert=True)
+        return total
+
+
+def create_message_store(layout: str):
+    if layout == "buckets":
+        return BucketMessageStore(settings.MESSAGE_BUCKET_SIZE, settings.MESSAGE_BUCKET_MAX_BYTES)
+    if layout != "documents":
+        logger.warning(f"Unknown MESSAGE_STORAGE '{layout}', using one document per message")
+    return DocumentMessageStore()
+
+message_store = create_message_store(settings.MESSAGE_STORAGE)
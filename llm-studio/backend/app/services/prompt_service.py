@@ -20,7 +20,7 @@ async def send_prompt(prompt_request: PromptRequest) -> PromptResponse:
     if not llm:
         raise ValueError(f"LLM with ID {prompt_request.llm_id} not found")
     
-    conversation = await get_conversation(prompt_request.conversation_id)
+    conversation = await get_conversation(prompt_request.conversation_id, message_limit=0)
     if not conversation:
         raise ValueError(f"Conversation with ID {prompt_request.conversation_id} not found")
     
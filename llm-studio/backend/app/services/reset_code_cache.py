@@ -1,29 +1,143 @@
 # app/services/reset_code_cache.py
-import random
+import hmac
+import logging
+import secrets
+import time
 from datetime import datetime, timedelta
+from typing import Dict, Any
 
-# Global dictionary for temporary reset codes: keyed by user id.
-reset_code_cache = {}
-
-def set_reset_code_in_memory(user_id: str) -> str:
-    """Generate an 8-digit reset code, store it in memory with a 10-minute expiration, and return the code."""
-    code = str(random.randint(10000000, 99999999))
-    expires_at = datetime.utcnow() + timedelta(minutes=10)
-    reset_code_cache[user_id] = {"code": code, "expires_at": expires_at}
-    return code
-
-def get_reset_code(user_id: str) -> str:
-    """Retrieve the reset code for the user if it exists and has not expired; otherwise return None."""
-    entry = reset_code_cache.get(user_id)
-    if entry:
-        if datetime.utcnow() < entry["expires_at"]:
-            return entry["code"]
-        else:
-            # Code expired: remove it.
-            del reset_code_cache[user_id]
-    return None
-
-def clear_reset_code(user_id: str):
-    """Remove the reset code from the in-memory cache."""
-    if user_id in reset_code_cache:
-        del reset_code_cache[user_id]
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.db import get_database
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of consuming a reset code
+CODE_OK = "ok"
+CODE_MISSING = "missing"      # never issued, already used or expired
+CODE_INVALID = "invalid"      # wrong code, attempts remain
+CODE_LOCKED = "locked"        # too many wrong codes; a new one has to be requested
+
+def generate_reset_code() -> str:
+    """An 8-digit code from the OS CSPRNG"""
+    return str(10000000 + secrets.randbelow(90000000))
+
+def _matches(stored: str, code: str) -> bool:
+    return hmac.compare_digest(stored.encode(), code.encode())
+
+
+class MemoryResetCodeStore:
+    """
+    Reset codes in a per-process dict, for single-worker or development use.
+
+    Expired codes are removed by a sweep that runs at most every
+    `sweep_interval` seconds on writes and reads, so the table doesn't keep
+    codes that were never used.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_attempts: int = 5, sweep_interval: float = 60.0):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.sweep_interval = sweep_interval
+        self._codes: Dict[str, Dict[str, Any]] = {}
+        self._last_sweep = time.monotonic()
+
+    def _sweep(self, now: float) -> None:
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for user_id in [u for u, entry in self._codes.items() if entry["expires_at"] <= now]:
+            del self._codes[user_id]
+
+    async def set(self, user_id: str) -> str:
+        """Issue a new code for the user, replacing any earlier one"""
+        now = time.monotonic()
+        self._sweep(now)
+        code = generate_reset_code()
+        self._codes[user_id] = {"code": code, "expires_at": now + self.ttl, "attempts": 0}
+        return code
+
+    async def consume(self, user_id: str, code: str) -> str:
+        """Check a code; a matching one is removed so it can only be used once"""
+        now = time.monotonic()
+        self._sweep(now)
+        entry = self._codes.get(user_id)
+        if entry is None or entry["expires_at"] <= now:
+            self._codes.pop(user_id, None)
+            return CODE_MISSING
+        if _matches(entry["code"], code):
+            del self._codes[user_id]
+            return CODE_OK
+        entry["attempts"] += 1
+        if entry["attempts"] >= self.max_attempts:
+            del self._codes[user_id]
+            return CODE_LOCKED
+        return CODE_INVALID
+
+    async def clear(self, user_id: str) -> None:
+        self._codes.pop(user_id, None)
+
+
+class MongoResetCodeStore:
+    """
+    Reset codes in the `reset_codes` collection, shared by every worker.
+
+    One document per user (_id is the user id). A TTL index on `expires_at`
+    deletes expired codes in the background; since the TTL monitor only runs
+    about once a minute, reads also check `expires_at`. Each check counts an
+    attempt atomically before the code is compared, so concurrent guesses
+    can't exceed `max_attempts`, and a matching code is deleted with a
+    conditional delete so it can only be used once.
+    """
+
+    collection = "reset_codes"
+
+    def __init__(self, ttl: float = 600.0, max_attempts: int = 5):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+
+    async def set(self, user_id: str) -> str:
+        db = await get_database()
+        code = generate_reset_code()
+        await db.reset_codes.replace_one(
+            {"_id": user_id},
+            {"code": code, "attempts": 0, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)},
+            upsert=True
+        )
+        return code
+
+    async def consume(self, user_id: str, code: str) -> str:
+        db = await get_database()
+        entry = await db.reset_codes.find_one_and_update(
+            {"_id": user_id, "expires_at": {"$gt": datetime.utcnow()}, "attempts": {"$lt": self.max_attempts}},
+            {"$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if entry is None:
+            # Expired (or locked out by an earlier attempt); either way a new code is needed
+            await db.reset_codes.delete_one({"_id": user_id})
+            return CODE_MISSING
+        if _matches(entry["code"], code):
+            result = await db.reset_codes.delete_one({"_id": user_id, "code": entry["code"]})
+            # Lost a race with another request using (or replacing) the same code
+            return CODE_OK if result.deleted_count else CODE_MISSING
+        if entry["attempts"] >= self.max_attempts:
+            await db.reset_codes.delete_one({"_id": user_id, "code": entry["code"]})
+            return CODE_LOCKED
+        return CODE_INVALID
+
+    async def clear(self, user_id: str) -> None:
+        db = await get_database()
+        await db.reset_codes.delete_one({"_id": user_id})
+
+
+def create_reset_code_store(backend: str):
+    ttl, max_attempts = settings.RESET_CODE_TTL_SECONDS, settings.RESET_CODE_MAX_ATTEMPTS
+    if backend == "memory":
+        return MemoryResetCodeStore(ttl, max_attempts)
+    if backend != "mongo":
+        logger.warning(f"Unknown RESET_CODE_STORE '{backend}', storing reset codes in MongoDB")
+    return MongoResetCodeStore(ttl, max_attempts)
+
+reset_code_store = create_reset_code_store(settings.RESET_CODE_STORE)
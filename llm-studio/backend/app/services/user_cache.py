@@ -0,0 +1,96 @@
+# app/services/user_cache.py
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+from bson import ObjectId
+from app.core.config import settings
+from app.core.db import get_database
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+UserLoader = Callable[[str], Awaitable[Tuple[Optional[User], int]]]
+
+class _Entry:
+    __slots__ = ("user", "version", "loaded_at", "checked_at")
+
+    def __init__(self, user: User, version: int, now: float):
+        self.user = user
+        self.version = version
+        self.loaded_at = now
+        self.checked_at = now
+
+
+class UserCache:
+    """
+    TTL + LRU cache of User objects for authentication.
+
+    Writes in this process invalidate entries directly. Every write to a user
+    document also bumps its `version` field, so an entry that hasn't been
+    checked for `revalidate_after` seconds is compared with the stored
+    version (a projected lookup, no model construction) and reloaded if
+    another worker changed the user. Entries are dropped after `ttl`
+    seconds regardless.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, revalidate_after: float = 5.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    async def _stored_version(self, user_id: str) -> Optional[int]:
+        db = await get_database()
+        doc = await db.users.find_one({"_id": ObjectId(user_id)}, {"version": 1})
+        if doc is None:
+            return None
+        return doc.get("version", 0)
+
+    async def get(self, user_id: str, load: UserLoader) -> Optional[User]:
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and now - entry.loaded_at < self.ttl:
+            if now - entry.checked_at < self.revalidate_after:
+                self.hits += 1
+                self._entries.move_to_end(user_id)
+                return entry.user
+            self.revalidations += 1
+            version = await self._stored_version(user_id)
+            if version is None:
+                self.invalidate(user_id)
+                return None
+            if version == entry.version:
+                entry.checked_at = now
+                self._entries.move_to_end(user_id)
+                return entry.user
+
+        self.misses += 1
+        user, version = await load(user_id)
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        self._entries[user_id] = _Entry(user, version, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "revalidations": self.revalidations}
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL,
+    revalidate_after=settings.USER_CACHE_REVALIDATE_SECONDS
+)
@@ -0,0 +1,17 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from bson import ObjectId
+
+def encode_cursor(timestamp: datetime, object_id: str) -> str:
+    """Opaque keyset cursor for a (timestamp, _id) position, used by the paginated listings"""
+    raw = f"{timestamp.isoformat()}|{object_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, object_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,98 @@
+"""
+Serialization microbenchmark for the listing/history responses.
+
+Compares what FastAPI does with returned models (validate each document
+into a model, re-validate against response_model, encode to JSON types,
+json.dumps) with returning a FastJSONResponse (validate once, orjson), and
+with building the models via model_construct instead. With pydantic v2,
+validation runs in Rust and model_construct in Python, so construct is the
+slower of the two fast variants; the services keep validating. Run from the
+backend directory:
+
+    python -m benchmarks.serialization_bench [--messages 200] [--repeat 200]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from app.core.responses import dumps
+from app.models.conversation import Conversation, Message
+from app.models.admin_chat import TicketSummary, TicketLastMessage
+
+def message_docs(n: int):
+    start = datetime(2025, 3, 1, 12, 0, 0)
+    return [{
+        "id": str(ObjectId()), "conversation_id": "c1", "role": "user" if i % 2 == 0 else "assistant",
+        "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8,
+        "created_at": start + timedelta(seconds=i), "metadata": {"tokens": 120}
+    } for i in range(n)]
+
+CONVERSATION_ID = str(ObjectId())
+
+def conversation_doc(messages):
+    now = datetime(2025, 3, 1, 12, 0, 0)
+    return {"id": CONVERSATION_ID, "title": "Benchmark", "llm_id": "model", "user_id": "u1",
+            "message_count": len(messages), "created_at": now, "updated_at": now, "messages": messages}
+
+def ticket_docs(n: int):
+    now = datetime(2025, 3, 1, 12, 0, 0)
+    return [{"_id": str(ObjectId()), "title": f"Ticket {i}", "user_id": "u1", "status": "open",
+             "created_at": now, "updated_at": now, "message_count": 4, "unread": True,
+             "last_message": {"content": "Latest reply " * 6, "is_admin": True, "admin_name": "admin", "created_at": now}}
+            for i in range(n)]
+
+def fastapi_default(adapter, build):
+    """Build models with validation, then FastAPI's response_model round trip and stdlib json"""
+    def run():
+        content = build()
+        dumped = adapter.dump_python(content, by_alias=True)
+        validated = adapter.validate_python(dumped)
+        return json.dumps(adapter.dump_python(validated, mode="json", by_alias=True)).encode()
+    return run
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    messages = message_docs(args.messages)
+    tickets = ticket_docs(args.tickets)
+    conversation_adapter = TypeAdapter(Conversation)
+    summaries_adapter = TypeAdapter(List[TicketSummary])
+
+    cases = {
+        f"conversation with {args.messages} messages": (
+            fastapi_default(conversation_adapter,
+                            lambda: Conversation(**conversation_doc([Message(**m) for m in messages]))),
+            lambda: dumps(Conversation(**conversation_doc([Message(**m) for m in messages]))),
+            lambda: dumps(Conversation.model_construct(**conversation_doc([Message.model_construct(**m) for m in messages])))
+        ),
+        f"{args.tickets} ticket summaries": (
+            fastapi_default(summaries_adapter,
+                            lambda: [TicketSummary(**t) for t in tickets]),
+            lambda: dumps([TicketSummary(**t) for t in tickets]),
+            lambda: dumps([TicketSummary.model_construct(**{**t, "last_message": TicketLastMessage.model_construct(**t["last_message"])})
+                           for t in tickets])
+        ),
+    }
+    def per_call_ms(fn):
+        return min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat * 1000
+
+    print(f"{'':<36} {'fastapi default':>16} {'validate+orjson':>16} {'construct+orjson':>17}")
+    for name, (default, fast, construct) in cases.items():
+        expected = json.loads(default())
+        assert json.loads(fast()) == expected and json.loads(construct()) == expected, f"{name}: outputs differ"
+        default_ms, fast_ms, construct_ms = per_call_ms(default), per_call_ms(fast), per_call_ms(construct)
+        print(f"{name:<36} {default_ms:13.3f} ms {fast_ms:13.3f} ms {construct_ms:14.3f} ms"
+              f"   ({default_ms / fast_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# tests/test_admin_chat_service.py
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.models.admin_chat import TicketStatus
+from app.services.admin_chat_service import get_ticket_summaries, iter_tickets
+from app.utils.cursor import decode_cursor
+
+def ticket_doc(i, **extra):
+    return {"_id": ObjectId(), "user_id": "u1", "title": f"ticket {i}", "status": "open",
+            "created_at": datetime(2025, 3, 1), "updated_at": datetime(2025, 3, 1, 12, 0, i), **extra}
+
+def fake_tickets_db(docs):
+    db = MagicMock()
+    db.tickets.aggregate.return_value.to_list = AsyncMock(return_value=docs)
+    return db
+
+@pytest.mark.asyncio
+async def test_ticket_summaries_page_with_next_cursor():
+    last = {"content": "help", "is_admin": False, "created_at": datetime(2025, 3, 1, 12, 0, 3)}
+    docs = [ticket_doc(3, message_count=2, last_message=last, unread=True), ticket_doc(2), ticket_doc(1)]
+    db = fake_tickets_db(docs)
+    with patch("app.services.admin_chat_service.get_database", new=AsyncMock(return_value=db)):
+        summaries, cursor = await get_ticket_summaries(
+            statuses=[TicketStatus.OPEN, TicketStatus.IN_PROGRESS], for_admin=True, limit=2
+        )
+    assert [s.title for s in summaries] == ["ticket 3", "ticket 2"]
+    assert summaries[0].message_count == 2 and summaries[0].unread
+    assert summaries[0].last_message.content == "help"
+    assert summaries[1].message_count == 0 and summaries[1].last_message is None
+    assert decode_cursor(cursor) == (docs[1]["updated_at"], ObjectId(docs[1]["_id"]))
+    pipeline = db.tickets.aggregate.call_args.args[0]
+    assert pipeline[0]["$match"] == {"status": {"$in": ["open", "in_progress"]}}
+    assert pipeline[2] == {"$limit": 3}
+
+@pytest.mark.asyncio
+async def test_user_ticket_summaries_continue_before_cursor():
+    db = fake_tickets_db([])
+    cursor = "MjAyNS0wMy0wMVQxMjowMDowMnw2NWYwMDAwMDAwMDAwMDAwMDAwMDAwMDA"
+    with patch("app.services.admin_chat_service.get_database", new=AsyncMock(return_value=db)):
+        summaries, next_cursor = await get_ticket_summaries(user_id="u1", before=cursor)
+    assert summaries == [] and next_cursor is None
+    match = db.tickets.aggregate.call_args.args[0][0]["$match"]
+    assert match["user_id"] == "u1" and "$or" in match
+
+class AsyncRows:
+    """A motor cursor stand-in: chainable sort/batch_size, async iteration over `rows`"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for row in self.rows:
+            yield row
+
+@pytest.mark.asyncio
+async def test_ticket_threads_are_loaded_with_one_query():
+    tickets = [ticket_doc(2, messages=[]), ticket_doc(1)]
+    ids = [str(t["_id"]) for t in tickets]
+    messages = [
+        {"_id": ObjectId(), "ticket_id": ids[0], "user_id": "u1", "content": "a", "created_at": datetime(2025, 3, 1)},
+        {"_id": ObjectId(), "ticket_id": ids[1], "user_id": "u1", "content": "b", "created_at": datetime(2025, 3, 1)},
+        {"_id": ObjectId(), "ticket_id": ids[1], "user_id": "u1", "content": "c", "created_at": datetime(2025, 3, 2)},
+    ]
+    db = MagicMock()
+    db.tickets.find.return_value = AsyncRows(tickets)
+    db.admin_messages.find.return_value = AsyncRows(messages)
+    with patch("app.services.admin_chat_service.get_database", new=AsyncMock(return_value=db)):
+        result = [ticket async for ticket in iter_tickets({"user_id": "u1"})]
+
+    assert [[m.content for m in t.messages] for t in result] == [["a"], ["b", "c"]]
+    db.admin_messages.find.assert_called_once_with({"ticket_id": {"$in": ids}})
@@ -0,0 +1,142 @@
+# tests/test_catalog_cache.py
+import pytest
+import asyncio
+import httpx
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.catalog_cache import CatalogCache
+from app.services.llm_manager_service import LLMManagerService
+
+class Loader:
+    """A load function that counts its calls and can be held until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"version": self.calls}
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    load = Loader()
+    load.release.clear()
+    cache = CatalogCache("test", load, ttl=60)
+
+    readers = [asyncio.create_task(cache.get()) for _ in range(20)]
+    await asyncio.sleep(0)
+    load.release.set()
+    results = await asyncio.gather(*readers)
+
+    assert load.calls == 1
+    assert all(result == {"version": 1} for result in results)
+    assert await cache.get() == {"version": 1}
+    assert cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_while_refreshing():
+    load = Loader()
+    cache = CatalogCache("test", load, ttl=60)
+    assert await cache.get() == {"version": 1}
+
+    cache._expires_at = 0
+    load.release.clear()
+    # Readers get the stale value at once, and only one refresh starts
+    assert await cache.get() == {"version": 1}
+    await asyncio.sleep(0)
+    assert await cache.get() == {"version": 1}
+    await asyncio.sleep(0)
+    assert load.calls == 2
+
+    load.release.set()
+    await cache._refresh
+    assert await cache.get() == {"version": 2}
+    assert load.calls == 2
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_stale_value():
+    load = Loader()
+    cache = CatalogCache("test", load, ttl=60, retry_after=60)
+    await cache.get()
+
+    cache._expires_at = 0
+    load.fail = True
+    assert await cache.get() == {"version": 1}
+    with pytest.raises(RuntimeError):
+        await cache._refresh
+    # Not retried before retry_after
+    assert await cache.get() == {"version": 1}
+    assert load.calls == 2
+    assert cache.stats()["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_miss_raises_when_load_fails():
+    load = Loader()
+    load.fail = True
+    cache = CatalogCache("test", load)
+    with pytest.raises(RuntimeError):
+        await cache.get()
+    load.fail = False
+    assert await cache.get() == {"version": 2}
+
+@pytest.mark.asyncio
+async def test_invalidate_discards_refresh_in_flight():
+    load = Loader()
+    cache = CatalogCache("test", load, ttl=60)
+    await cache.get()
+
+    cache._expires_at = 0
+    load.release.clear()
+    await cache.get()
+    stale_refresh = cache._refresh
+
+    cache.invalidate()
+    load.release.set()
+    await stale_refresh
+    # The refresh read the catalog before the change; the next read loads again
+    assert await cache.get() == {"version": 3}
+    assert load.calls == 3
+
+def make_response(payload):
+    response = MagicMock()
+    response.status_code = 200
+    response.raise_for_status = MagicMock()
+    response.json.return_value = payload
+    return response
+
+@pytest.mark.asyncio
+async def test_model_catalog_is_cached_until_a_model_changes():
+    service = LLMManagerService()
+    service.base_url = "http://test-llm-api:5000"
+    models = {"phi2": {"id": "phi2", "type": "phi2", "replicas": {"count": 2, "replicas": []}}}
+    request = AsyncMock(return_value=make_response(models))
+    with patch("httpx.AsyncClient.request", new=request):
+        assert await service.get_models() == models
+        assert await service.get_models() == models
+        assert request.await_count == 1
+        assert service.scheduler._queue("phi2").limit == 2
+
+        await service.modify_model_parameters("phi2", temperature=0.2)
+        await service.get_models()
+        assert [call.args[0] for call in request.await_args_list] == ["GET", "PUT", "GET"]
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_model_catalog_failure_returns_empty_list():
+    service = LLMManagerService()
+    service.base_url = "http://test-llm-api:5000"
+    failing = AsyncMock(side_effect=httpx.ConnectError("refused"))
+    with patch("httpx.AsyncClient.request", new=failing), \
+         patch("app.services.llm_manager_service.asyncio.sleep", new=AsyncMock()):
+        assert await service.get_models() == {}
+    await service.close()
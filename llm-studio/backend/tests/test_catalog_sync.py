@@ -0,0 +1,128 @@
+# tests/test_catalog_sync.py
+import pytest
+from datetime import datetime, timedelta
+from bson import ObjectId
+from unittest.mock import AsyncMock, MagicMock, patch
+from pymongo.errors import DuplicateKeyError
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.catalog_sync import (
+    LLM_MANAGER_ENDPOINT, claim_node_boot, diff_llm_catalog, handshake_conversations, llm_fields
+)
+from app.services.llm_manager_service import LLMManagerService
+
+NOW = datetime(2025, 3, 1, 12, 0, 0)
+
+def model(model_id, **overrides):
+    return {"id": model_id, "type": "llama", "size_mb": 2048, "context_window": 4096, "temperature": 0.7, **overrides}
+
+def test_unchanged_catalog_writes_nothing():
+    models = {"tiny": model("tiny")}
+    existing = {"tiny": {"_id": "tiny", **llm_fields("tiny", models["tiny"]), "created_at": NOW, "updated_at": NOW}}
+    assert diff_llm_catalog(models, existing, NOW) == []
+
+def test_diff_inserts_updates_and_deactivates():
+    models = {"new": model("new"), "tiny": model("tiny", temperature=0.2)}
+    existing = {
+        "tiny": {"_id": "tiny", **llm_fields("tiny", model("tiny"))},
+        "gone": {"_id": "gone", **llm_fields("gone", model("gone"))},
+        "manual": {"_id": "manual", "name": "manual", "api_endpoint": "https://example.com", "status": "active"},
+    }
+    operations = {op._filter["_id"]: op._doc for op in diff_llm_catalog(models, existing, NOW)}
+
+    assert set(operations) == {"new", "tiny", "gone"}
+    assert operations["new"]["$setOnInsert"] == {"created_at": NOW}
+    assert operations["new"]["$set"]["api_endpoint"] == LLM_MANAGER_ENDPOINT
+    # Only the changed field (and updated_at) is written; created_at is left alone
+    assert operations["tiny"] == {"$set": {"parameters": {"max_tokens": 4096, "temperature": 0.2}, "updated_at": NOW}}
+    assert operations["gone"] == {"$set": {"status": "inactive", "updated_at": NOW}}
+
+def test_llm_fields_without_numeric_size():
+    assert llm_fields("x", model("x", size_mb="N/A"))["description"] == "llama model (size unknown)"
+
+@pytest.mark.asyncio
+async def test_each_boot_is_claimed_once():
+    db = MagicMock()
+    db.llm_manager_nodes.update_one = AsyncMock()
+    assert await claim_node_boot(db, "http://llm-api:5000", "boot-1") is True
+    db.llm_manager_nodes.update_one = AsyncMock(side_effect=DuplicateKeyError("dup"))
+    assert await claim_node_boot(db, "http://llm-api:5000", "boot-1") is False
+
+def make_conversations(count):
+    start = datetime.utcnow()
+    return [{"_id": ObjectId(), "llm_id": "tiny", "updated_at": start - timedelta(minutes=i)} for i in range(count)]
+
+@pytest.mark.asyncio
+async def test_handshake_pages_through_active_conversations():
+    conversations = make_conversations(5)
+    pages = [conversations[:2], conversations[2:4], conversations[4:]]
+    matches = []
+
+    def find(match, projection):
+        matches.append(match)
+        cursor = MagicMock()
+        cursor.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=pages[len(matches) - 1])
+        return cursor
+
+    db = MagicMock()
+    db.conversations.find = find
+    service = LLMManagerService()
+    service.base_url = "http://test-llm-api:5000"
+    node = service.pool.nodes["http://test-llm-api:5000"]
+    service.ensure_conversations = AsyncMock(side_effect=lambda node, page: {"created": len(page), "existing": 0, "errors": {}})
+
+    totals = await handshake_conversations(db, service, node, active_days=7, batch_size=2)
+
+    assert totals == {"scanned": 5, "sent": 5, "created": 5, "existing": 0, "errors": 0}
+    assert service.ensure_conversations.await_count == 3
+    # Later pages continue after the last (updated_at, _id) seen
+    keyset = matches[1]["$and"][1]["$or"]
+    assert keyset[1] == {"updated_at": conversations[1]["updated_at"], "_id": {"$lt": conversations[1]["_id"]}}
+
+def test_boot_listeners_fire_on_new_boot_ids():
+    service = LLMManagerService()
+    service.base_url = "http://test-llm-api:5000"
+    node = service.pool.nodes["http://test-llm-api:5000"]
+    seen = []
+    service.on_node_boot(lambda n: seen.append(n.boot_id))
+    service.catalog.invalidate = MagicMock()
+
+    service._check_boot(node, "a")
+    service._check_boot(node, "a")
+    service._check_boot(node, None)
+    assert seen == ["a"]
+    service.catalog.invalidate.assert_not_called()
+
+    service._check_boot(node, "b")
+    assert seen == ["a", "b"]
+    service.catalog.invalidate.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_handshake_ensures_the_ids_chat_uses():
+    conversation = {"_id": ObjectId(), "llm_id": "tiny", "updated_at": datetime.utcnow()}
+
+    def find(match, projection):
+        cursor = MagicMock()
+        cursor.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[conversation])
+        return cursor
+
+    db = MagicMock()
+    db.conversations.find = find
+    service = LLMManagerService()
+    service.base_url = "http://test-llm-api:5000"
+    node = service.pool.nodes["http://test-llm-api:5000"]
+    response = MagicMock(status_code=200, raise_for_status=MagicMock())
+    response.json.return_value = {"created": 1, "existing": 0, "errors": {}, "response": "Hi"}
+    request = AsyncMock(return_value=response)
+    with patch("httpx.AsyncClient.request", new=request):
+        await handshake_conversations(db, service, node, active_days=7)
+        await service.send_message(str(conversation["_id"]), "Hello")
+    await service.close()
+
+    ensure, chat = request.await_args_list
+    assert ensure.args[1].endswith("/api/conversations/ensure")
+    ensured = [item["conversation_id"] for item in ensure.kwargs["json"]["conversations"]]
+    assert ensured == [chat.kwargs["json"]["conversation_id"]]
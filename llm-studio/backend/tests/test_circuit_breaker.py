@@ -0,0 +1,28 @@
+# tests/test_circuit_breaker.py
+import pytest
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+def test_circuit_breaker_opens_and_probes():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    # reset_timeout=0 makes the open circuit immediately eligible for a probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_lost_probe_times_out():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0, probe_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.before_call() is True
+    # The first probe never reported back; after probe_timeout another one is allowed
+    assert breaker.before_call() is True
@@ -0,0 +1,27 @@
+# tests/test_client_ip.py
+from starlette.requests import Request
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.security import client_ip, parse_networks
+
+PROXIES = parse_networks("172.28.0.10, 10.1.0.0/16")
+
+def make_request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers, "client": (peer, 12345)})
+
+def test_forwarded_for_is_used_behind_a_trusted_proxy():
+    assert client_ip(make_request("172.28.0.10", "203.0.113.7"), PROXIES) == "203.0.113.7"
+    # Entries a client sent itself are to the left of the one nginx appended
+    assert client_ip(make_request("172.28.0.10", "198.51.100.1, 203.0.113.7"), PROXIES) == "203.0.113.7"
+    # Chained trusted proxies are skipped
+    assert client_ip(make_request("172.28.0.10", "203.0.113.7, 10.1.2.3"), PROXIES) == "203.0.113.7"
+    assert client_ip(make_request("172.28.0.10"), PROXIES) == "172.28.0.10"
+
+def test_forwarded_for_from_other_peers_is_ignored():
+    assert client_ip(make_request("203.0.113.9", "198.51.100.1"), PROXIES) == "203.0.113.9"
+    assert client_ip(make_request("172.28.0.1", "198.51.100.1"), PROXIES) == "172.28.0.1"
+    assert client_ip(make_request("172.28.0.10", "198.51.100.1"), ()) == "172.28.0.10"
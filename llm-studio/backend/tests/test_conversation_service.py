@@ -0,0 +1,153 @@
+# tests/test_conversation_service.py
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services import conversation_service
+from app.services.conversation_service import (
+    encode_cursor, decode_cursor, get_message_page, add_message, message_counter_update, get_conversation_owner
+)
+from app.core.write_behind import WriteBehindWriter
+
+def test_conversation_cursor_round_trip():
+    updated_at = datetime(2025, 3, 1, 12, 30, 15, 123000)
+    conversation_id = str(ObjectId())
+    cursor = encode_cursor(updated_at, conversation_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (updated_at, ObjectId(conversation_id))
+
+def test_invalid_conversation_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def fake_messages_db(docs):
+    """A db whose messages.find(...).sort(...).limit(...).to_list() returns `docs`"""
+    query = MagicMock()
+    query.sort.return_value = query
+    query.limit.return_value = query
+    query.to_list = AsyncMock(return_value=docs)
+    db = MagicMock()
+    db.messages.find.return_value = query
+    return db
+
+def message_doc(i):
+    return {"_id": ObjectId(), "conversation_id": "c1", "role": "user",
+            "content": f"message {i}", "created_at": datetime(2025, 3, 1, 12, 0, i), "metadata": {}}
+
+@pytest.mark.asyncio
+async def test_latest_message_page_is_chronological_with_older_cursor():
+    # Newest first, as the descending query returns them; one extra doc means there are older messages
+    docs = [message_doc(i) for i in (5, 4, 3)]
+    with patch("app.services.conversation_service.get_database", new=AsyncMock(return_value=fake_messages_db(docs))):
+        page = await get_message_page("c1", limit=2)
+    assert [m.content for m in page.messages] == ["message 4", "message 5"]
+    assert page.after is None
+    assert decode_cursor(page.before)[0] == datetime(2025, 3, 1, 12, 0, 4)
+
+@pytest.mark.asyncio
+async def test_older_message_page_points_back_to_newer_messages():
+    cursor = encode_cursor(datetime(2025, 3, 1, 12, 0, 4), str(ObjectId()))
+    docs = [message_doc(i) for i in (3, 2)]
+    db = fake_messages_db(docs)
+    with patch("app.services.conversation_service.get_database", new=AsyncMock(return_value=db)):
+        page = await get_message_page("c1", limit=2, before=cursor)
+    assert [m.content for m in page.messages] == ["message 2", "message 3"]
+    assert page.before is None and page.after is not None
+    assert "$or" in db.messages.find.call_args.args[0]
+
+@pytest.mark.asyncio
+async def test_empty_message_page_points_back_to_the_cursor():
+    cursor = encode_cursor(datetime(2025, 3, 1, 12, 0, 4), str(ObjectId()))
+    with patch("app.services.conversation_service.get_database", new=AsyncMock(return_value=fake_messages_db([]))):
+        older = await get_message_page("c1", before=cursor)
+        newer = await get_message_page("c1", after=cursor)
+        latest = await get_message_page("c1")
+    assert older.messages == [] and older.before is None and older.after == cursor
+    assert newer.messages == [] and newer.before == cursor and newer.after is None
+    assert latest.before is None and latest.after is None
+
+def test_counter_update_tracks_tokens_by_role_and_previews_content():
+    now = datetime(2025, 3, 1, 12, 0, 0)
+    user = message_counter_update("user", "x" * 150, now)
+    assert user["$inc"] == {"message_count": 1, "prompt_tokens": 38}
+    assert user["$set"]["last_message_preview"]["content"] == "x" * 100 + "..."
+    assert user["$set"]["updated_at"] == user["$set"]["last_message_at"] == now
+    assistant = message_counter_update("assistant", "hi", now)
+    assert assistant["$inc"] == {"message_count": 1, "completion_tokens": 1}
+
+@pytest.mark.asyncio
+async def test_add_message_inserts_before_bumping_counters():
+    db = MagicMock()
+    calls = []
+    db.messages.insert_one = AsyncMock(side_effect=lambda doc: calls.append("insert"))
+    db.conversations.update_one = AsyncMock(side_effect=lambda *a: calls.append("counters") or MagicMock(matched_count=1))
+    conversation_id = str(ObjectId())
+    with patch("app.services.conversation_service.get_database", new=AsyncMock(return_value=db)):
+        message = await add_message(conversation_id, "user", "hello")
+    assert message.content == "hello"
+    assert calls == ["insert", "counters"]
+    db.conversations.find_one.assert_not_called()
+    assert db.conversations.update_one.call_args.args[1]["$inc"]["message_count"] == 1
+
+@pytest.mark.asyncio
+async def test_failed_insert_leaves_counters_alone():
+    db = MagicMock()
+    db.messages.insert_one = AsyncMock(side_effect=RuntimeError("write failed"))
+    db.conversations.update_one = AsyncMock()
+    with patch("app.services.conversation_service.get_database", new=AsyncMock(return_value=db)):
+        with pytest.raises(RuntimeError):
+            await add_message(str(ObjectId()), "user", "hello")
+    db.conversations.update_one.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_add_message_to_missing_conversation_keeps_nothing():
+    db = MagicMock()
+    db.messages.insert_one = AsyncMock()
+    db.messages.delete_many = AsyncMock(return_value=MagicMock(deleted_count=1))
+    db.conversations.update_one = AsyncMock(return_value=MagicMock(matched_count=0))
+    conversation_id = str(ObjectId())
+    with patch("app.services.conversation_service.get_database", new=AsyncMock(return_value=db)):
+        with pytest.raises(ValueError):
+            await add_message(conversation_id, "user", "hello")
+    db.messages.delete_many.assert_awaited_once_with({"conversation_id": conversation_id})
+
+@pytest.mark.asyncio
+async def test_keyed_counter_updates_merge_into_one_write():
+    writer = WriteBehindWriter()
+    now = datetime(2025, 3, 1, 12, 0, 0)
+    later = datetime(2025, 3, 1, 12, 0, 5)
+    await writer.update("conversations", {"_id": 1}, message_counter_update("user", "abcd", now), key="c1")
+    await writer.update("conversations", {"_id": 1}, message_counter_update("assistant", "abcdefgh", later), key="c1")
+    assert writer.pending == 1
+    db = MagicMock()
+    db.__getitem__.return_value.bulk_write = AsyncMock()
+    with patch("app.core.write_behind.get_database", new=AsyncMock(return_value=db)):
+        assert await writer.flush()
+    (op,), = db.__getitem__.return_value.bulk_write.call_args.args
+    update = op._doc
+    assert update["$inc"] == {"message_count": 2, "prompt_tokens": 1, "completion_tokens": 2}
+    assert update["$set"]["last_message_at"] == later
+    assert update["$set"]["last_message_preview"]["role"] == "assistant"
+
+@pytest.mark.asyncio
+async def test_cached_owner_is_rechecked_after_the_ttl():
+    conversation_id = str(ObjectId())
+    db = MagicMock()
+    db.conversations.find_one = AsyncMock(return_value={"user_id": "u1", "llm_id": "tiny"})
+    clock = [1000.0]
+    with patch("app.services.conversation_service.get_database", new=AsyncMock(return_value=db)), \
+         patch("app.services.conversation_service.time.monotonic", new=lambda: clock[0]):
+        assert await get_conversation_owner(conversation_id) == {"user_id": "u1", "llm_id": "tiny"}
+        assert await get_conversation_owner(conversation_id) is not None
+        assert db.conversations.find_one.await_count == 1
+
+        # Deleted by another worker: noticed once the entry expires
+        db.conversations.find_one = AsyncMock(return_value=None)
+        clock[0] += conversation_service.CONVERSATION_OWNER_CACHE_TTL
+        assert await get_conversation_owner(conversation_id) is None
+        assert conversation_id not in conversation_service._conversation_owners
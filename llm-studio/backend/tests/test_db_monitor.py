@@ -0,0 +1,72 @@
+# tests/test_db_monitor.py
+import asyncio
+import contextvars
+import logging
+import pytest
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.db_monitor import CommandMonitor, DBStatsMiddleware, filter_shape, track_db
+import app.core.db_monitor as db_monitor
+
+def run_command(monitor, name, command, micros, request_id=1):
+    monitor.started(SimpleNamespace(command_name=name, command=command, connection_id=("db", 27017), request_id=request_id))
+    monitor.succeeded(SimpleNamespace(command_name=name, connection_id=("db", 27017), request_id=request_id,
+                                      duration_micros=micros))
+
+def test_filter_shape_hides_values():
+    query = {"user_id": "u1", "$or": [{"updated_at": {"$lt": 5}}, {"_id": {"$in": [1, 2]}}]}
+    assert filter_shape(query) == {"user_id": "?", "$or": [{"updated_at": {"$lt": "?"}}, {"_id": {"$in": "?"}}]}
+
+def test_commands_are_aggregated_and_slow_ones_logged(caplog):
+    monitor = CommandMonitor(slow_ms=50)
+    with caplog.at_level(logging.WARNING, logger="app.core.db_monitor"):
+        run_command(monitor, "find", {"find": "messages", "filter": {"conversation_id": "secret"}}, 10_000, 1)
+        run_command(monitor, "find", {"find": "messages", "filter": {"conversation_id": "secret"}}, 80_000, 2)
+        run_command(monitor, "hello", {"hello": 1}, 1_000, 3)
+    (row,) = monitor.snapshot()["commands"]
+    assert row["collection"] == "messages" and row["command"] == "find"
+    assert row["count"] == 2 and row["slow"] == 1 and row["max_ms"] == 80.0
+    assert "{'conversation_id': '?'}" in caplog.text and "secret" not in caplog.text
+
+@pytest.mark.asyncio
+async def test_commands_on_executor_threads_are_attributed_to_the_request(monkeypatch):
+    monitor = CommandMonitor(request_calls_warn=0)
+    monkeypatch.setattr(db_monitor, "command_monitor", monitor)
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(2) as executor:
+        async with track_db("WS prompt") as stats:
+            for i in range(3):
+                # How motor runs pymongo calls: on its executor, in a copy of the caller's context
+                context = contextvars.copy_context()
+                await loop.run_in_executor(executor, context.run, run_command, monitor, "update",
+                                           {"update": "conversations", "updates": [{"q": {"_id": i}}]}, 2_000, i)
+        run_command(monitor, "find", {"find": "users"}, 2_000, 9)
+    assert stats.calls == 3
+    (route,) = monitor.snapshot()["routes"]
+    assert route["route"] == "WS prompt" and route["db_calls"] == 3 and route["requests"] == 1
+
+def test_middleware_groups_requests_by_route_template(monkeypatch):
+    monitor = CommandMonitor(request_calls_warn=0)
+    monkeypatch.setattr(db_monitor, "command_monitor", monitor)
+    app = FastAPI()
+    app.add_middleware(DBStatsMiddleware)
+
+    @app.get("/conversations/{conversation_id}")
+    async def get_conversation(conversation_id: str):
+        for i in range(2):
+            run_command(monitor, "find", {"find": "messages"}, 1_000, i)
+        return {}
+
+    client = TestClient(app)
+    client.get("/conversations/a")
+    client.get("/conversations/b")
+    (route,) = monitor.snapshot()["routes"]
+    assert route["route"] == "GET /conversations/{conversation_id}"
+    assert route["requests"] == 2 and route["db_calls"] == 4 and route["max_calls"] == 2
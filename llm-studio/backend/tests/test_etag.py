@@ -0,0 +1,76 @@
+# tests/test_etag.py
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.etag import content_etag, etag_matches, list_version, make_etag, not_modified, set_etag
+from app.core.responses import FastJSONResponse
+from app.models.admin_chat import TicketStatus
+
+NOW = datetime(2025, 3, 1, 12, 30, 15)
+
+def test_make_etag_is_stable_and_weak():
+    etag = make_etag("tickets", [TicketStatus.OPEN], 50, None, ((NOW, "id"), 3))
+    assert etag == make_etag("tickets", [TicketStatus.OPEN], 50, None, ((NOW, "id"), 3))
+    assert etag.startswith('W/"')
+    assert etag != make_etag("tickets", [TicketStatus.OPEN], 50, None, ((NOW, "id"), 4))
+    assert content_etag(b"[1]") != content_etag(b"[2]")
+
+def test_etag_matches_uses_weak_comparison():
+    etag = 'W/"abc"'
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"abcd"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+def test_conditional_get():
+    app = FastAPI()
+    etag = make_etag("items", 1)
+    calls = []
+
+    @app.get("/items")
+    async def items(request: Request):
+        if (cached := not_modified(request, etag)) is not None:
+            return cached
+        calls.append(1)
+        return set_etag(FastJSONResponse([1, 2]), etag)
+
+    client = TestClient(app)
+    first = client.get("/items")
+    assert first.status_code == 200
+    assert first.headers["etag"] == etag
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert first.headers["vary"] == "Authorization"
+
+    second = client.get("/items", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert calls == [1]
+
+    assert client.get("/items", headers={"If-None-Match": 'W/"stale"'}).status_code == 200
+
+@pytest.mark.asyncio
+async def test_list_version_uses_newest_update_and_count():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value={"_id": "t2", "updated_at": NOW})
+    collection.count_documents = AsyncMock(return_value=2)
+
+    assert await list_version(collection, {"user_id": "u"}) == ((NOW, "t2"), 2)
+    collection.find_one.assert_awaited_once_with(
+        {"user_id": "u"}, {"updated_at": 1}, sort=[("updated_at", -1), ("_id", -1)]
+    )
+    collection.count_documents.assert_awaited_once_with({"user_id": "u"})
+
+    collection.find_one = AsyncMock(return_value=None)
+    collection.count_documents = AsyncMock(return_value=0)
+    assert await list_version(collection, {"user_id": "u"}) == (None, 0)
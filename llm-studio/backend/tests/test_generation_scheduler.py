@@ -0,0 +1,65 @@
+# tests/test_generation_scheduler.py
+import pytest
+import asyncio
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.generation_scheduler import GenerationScheduler, QueueFullError
+
+@pytest.mark.asyncio
+async def test_scheduler_runs_models_in_parallel_and_interleaves_users():
+    scheduler = GenerationScheduler(default_limit=1)
+    order = []
+    gate = asyncio.Event()
+
+    async def generate(model_id, user_id, label):
+        async with scheduler.slot(model_id, user_id):
+            order.append(label)
+            await gate.wait()
+
+    # One request per model runs at once, even while the other model is busy
+    first = [asyncio.create_task(generate("phi2", "heavy", "heavy-1")),
+             asyncio.create_task(generate("llama", "light", "llama-1"))]
+    await asyncio.sleep(0)
+    assert sorted(order) == ["heavy-1", "llama-1"]
+
+    # A heavy user's backlog doesn't keep a light user waiting behind all of it
+    queued = [asyncio.create_task(generate("phi2", "heavy", f"heavy-{i}")) for i in range(2, 5)]
+    await asyncio.sleep(0)
+    queued.append(asyncio.create_task(generate("phi2", "light", "light-1")))
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*first, *queued)
+    phi2_order = [label for label in order if label != "llama-1"]
+    assert phi2_order.index("light-1") <= 2
+
+@pytest.mark.asyncio
+async def test_scheduler_reports_queue_positions_and_bounds_waiting():
+    scheduler = GenerationScheduler(default_limit=1, max_waiting=1)
+    positions = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("phi2", "a"):
+            await release.wait()
+
+    async def on_position(position):
+        positions.append(position)
+
+    async def wait_turn():
+        async with scheduler.slot("phi2", "b", on_position=on_position):
+            pass
+
+    running = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(wait_turn())
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFullError):
+        async with scheduler.slot("phi2", "c"):
+            pass
+    release.set()
+    await asyncio.gather(running, waiting)
+    assert positions == [1]
+    assert scheduler.stats()["phi2"]["served"] == 2
@@ -1,13 +1,15 @@
 # tests/test_llm_manager_service.py
 import pytest
 import asyncio
-from unittest.mock import patch, MagicMock
+import httpx
+from unittest.mock import patch, MagicMock, AsyncMock
 
 import sys
 import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app.services.llm_manager_service import LLMManagerService
+from app.core.circuit_breaker import CircuitBreaker
 
 @pytest.fixture
 def llm_service():
@@ -15,18 +17,23 @@ def llm_service():
     service.base_url = "http://test-llm-api:5000"
     return service
 
+def make_response(payload, status_code=200):
+    response = MagicMock()
+    response.status_code = status_code
+    response.raise_for_status = MagicMock()
+    response.json.return_value = payload
+    return response
+
 @pytest.mark.asyncio
 async def test_get_models(llm_service):
     # Mock response
-    mock_response = MagicMock()
-    mock_response.raise_for_status = MagicMock()
-    mock_response.json.return_value = {
+    mock_response = make_response({
         "phi2": {"id": "phi2", "type": "phi2", "size_mb": 2400},
         "tinyllama": {"id": "tinyllama", "type": "llama", "size_mb": 1100}
-    }
+    })
     
     # Patch the httpx client
-    with patch("httpx.AsyncClient.get", return_value=mock_response):
+    with patch("httpx.AsyncClient.request", new=AsyncMock(return_value=mock_response)):
         result = await llm_service.get_models()
         
         # Verify results
@@ -38,12 +45,10 @@ async def test_get_models(llm_service):
 @pytest.mark.asyncio
 async def test_create_conversation(llm_service):
     # Mock response
-    mock_response = MagicMock()
-    mock_response.raise_for_status = MagicMock()
-    mock_response.json.return_value = {"conversation_id": "test-conv-123"}
+    mock_response = make_response({"conversation_id": "test-conv-123"})
     
     # Patch the httpx client
-    with patch("httpx.AsyncClient.post", return_value=mock_response):
+    with patch("httpx.AsyncClient.request", new=AsyncMock(return_value=mock_response)):
         result = await llm_service.create_conversation("phi2")
         
         # Verify results
@@ -52,17 +57,138 @@ async def test_create_conversation(llm_service):
 @pytest.mark.asyncio
 async def test_send_message(llm_service):
     # Mock response
-    mock_response = MagicMock()
-    mock_response.raise_for_status = MagicMock()
-    mock_response.json.return_value = {
+    mock_response = make_response({
         "conversation_id": "test-conv-123",
         "response": "This is a test response"
-    }
+    })
     
     # Patch the httpx client
-    with patch("httpx.AsyncClient.post", return_value=mock_response):
+    with patch("httpx.AsyncClient.request", new=AsyncMock(return_value=mock_response)):
         result = await llm_service.send_message("test-conv-123", "Hello")
         
         # Verify results
         assert result["conversation_id"] == "test-conv-123"
         assert result["response"] == "This is a test response"
+
+@pytest.mark.asyncio
+async def test_client_is_reused_between_calls(llm_service):
+    mock_response = make_response({})
+    with patch("httpx.AsyncClient.request", new=AsyncMock(return_value=mock_response)):
+        await llm_service.get_models()
+        first_client = llm_service._client
+        await llm_service.health_check()
+        assert llm_service._client is first_client
+    await llm_service.close()
+
+@pytest.mark.asyncio
+async def test_idempotent_calls_retry_but_chat_does_not(llm_service):
+    failing = AsyncMock(side_effect=httpx.ConnectError("refused"))
+    with patch("httpx.AsyncClient.request", new=failing), \
+         patch("app.services.llm_manager_service.asyncio.sleep", new=AsyncMock()):
+        with pytest.raises(httpx.ConnectError):
+            await llm_service.get_conversation("abc")
+        assert failing.await_count == 3
+
+        failing.reset_mock()
+        with pytest.raises(httpx.ConnectError):
+            await llm_service.send_message("abc", "Hello")
+        assert failing.await_count == 1
+
+@pytest.mark.asyncio
+async def test_send_message_recreates_conversation_missing_on_node(llm_service):
+    conversation_id = "0" * 23 + "5"
+    not_found = make_response({"error": "Conversation not found"}, status_code=404)
+    not_found.raise_for_status.side_effect = httpx.HTTPStatusError(
+        "not found", request=MagicMock(), response=not_found
+    )
+    created = make_response({"conversation_id": conversation_id})
+    answered = make_response({"conversation_id": conversation_id, "response": "Hi"})
+    llm_service._remember_model(conversation_id, "phi2")
+
+    mock = AsyncMock(side_effect=[not_found, created, answered])
+    with patch("httpx.AsyncClient.request", new=mock):
+        result = await llm_service.send_message(conversation_id, "Hello")
+
+    assert result["response"] == "Hi"
+    assert [call.args[0] for call in mock.await_args_list] == ["POST", "POST", "POST"]
+    first_chat, create, retry = mock.await_args_list
+    assert create.args[1].endswith("/api/conversation")
+    # The conversation is recreated under the ID the chat calls use, so the retry finds it
+    upstream_id = "0" * 23 + "4"
+    assert create.kwargs["json"]["conversation_id"] == upstream_id
+    assert first_chat.kwargs["json"]["conversation_id"] == upstream_id
+    assert retry.kwargs["json"]["conversation_id"] == upstream_id
+    # A resend of the same turn, which LLMManager answers once
+    assert retry.kwargs["json"]["request_id"] == first_chat.kwargs["json"]["request_id"]
+
+    mock = AsyncMock(return_value=answered)
+    with patch("httpx.AsyncClient.request", new=mock):
+        await llm_service.send_message(conversation_id, "Hello")
+    assert mock.await_args.kwargs["json"]["request_id"] != first_chat.kwargs["json"]["request_id"]
+
+@pytest.mark.asyncio
+async def test_conversation_calls_share_one_upstream_id(llm_service):
+    conversation_id = "0" * 23 + "5"
+    mock = AsyncMock(return_value=make_response({}))
+    with patch("httpx.AsyncClient.request", new=mock):
+        await llm_service.create_conversation("phi2", conversation_id)
+        await llm_service.get_conversation(conversation_id)
+        await llm_service.reset_conversation(conversation_id)
+    create, history, reset = mock.await_args_list
+    assert create.kwargs["json"]["conversation_id"] == "0" * 23 + "4"
+    assert history.args[1].endswith("/api/conversation/" + "0" * 23 + "4")
+    assert reset.args[1].endswith("/api/conversation/" + "0" * 23 + "4/reset")
+    # IDs that aren't database IDs (e.g. generated by LLMManager) are passed through
+    assert llm_service._upstream_conversation_id("my_philosophy_chat") == "my_philosophy_chat"
+
+@pytest.mark.asyncio
+async def test_conversation_models_are_bounded_and_expire(llm_service):
+    conversation_id = "0" * 23 + "5"
+    fake_db = MagicMock()
+    fake_db.conversations.find_one = AsyncMock(return_value={"llm_id": "phi2"})
+    with patch("app.services.llm_manager_service.get_database", new=AsyncMock(return_value=fake_db)), \
+         patch("app.services.llm_manager_service.CONVERSATION_MODEL_CACHE_SIZE", 2):
+        assert await llm_service._conversation_model(conversation_id) == "phi2"
+        assert await llm_service._conversation_model(conversation_id) == "phi2"
+        assert fake_db.conversations.find_one.await_count == 1
+
+        # Stale entries are looked up again
+        with patch("app.services.llm_manager_service.CONVERSATION_MODEL_CACHE_TTL", 0):
+            await llm_service._conversation_model(conversation_id)
+        assert fake_db.conversations.find_one.await_count == 2
+
+        llm_service._remember_model("a", "llama")
+        llm_service._remember_model("b", "llama")
+        assert list(llm_service._conversation_models) == ["a", "b"]
+
+    llm_service.pool.pin("a", llm_service.base_url)
+    llm_service.forget_conversation("a")
+    assert list(llm_service._conversation_models) == ["b"]
+    assert "a" not in llm_service.pool._pinned
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_does_not_wedge_the_breaker(llm_service):
+    node = llm_service.pool.nodes["http://test-llm-api:5000"]
+    breaker = node.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.reset_timeout = 0.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    started = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(3600)
+
+    with patch("httpx.AsyncClient.request", new=hang):
+        probe = asyncio.create_task(llm_service.get_conversation("abc"))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    # The next call is let through as a new probe, and its success closes the circuit
+    with patch("httpx.AsyncClient.request", new=AsyncMock(return_value=make_response({}))):
+        await llm_service.get_conversation("abc")
+    assert breaker.state == CircuitBreaker.CLOSED
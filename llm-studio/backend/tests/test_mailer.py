@@ -0,0 +1,89 @@
+# tests/test_mailer.py
+import pytest
+import smtplib
+from email.message import EmailMessage
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.mailer import Mailer, SMTPTransport
+from app.core.smtp_sink import DebugSMTPSink
+
+def email(to, subject="Hello"):
+    msg = EmailMessage()
+    msg["From"] = "studio@example.com"
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg.set_content("body")
+    return msg
+
+@pytest.mark.asyncio
+async def test_queued_emails_share_one_connection():
+    sink = await DebugSMTPSink(port=0).start()
+    transport = SMTPTransport("127.0.0.1", sink.port, security="none", username="user", password="secret")
+    mailer = Mailer(transport)
+    mailer.start()
+    try:
+        assert mailer.enqueue(email("a@example.com", "first"))
+        assert mailer.enqueue(email("b@example.com", "second"))
+        await mailer.drain()
+        messages = await sink.wait_for(2)
+    finally:
+        await mailer.stop()
+        await sink.stop()
+    assert [m["Subject"] for m in messages] == ["first", "second"]
+    assert sink.connections == 1
+    assert mailer.stats()["sent"] == 2
+
+class FlakyTransport:
+    """Fails the first `failures` sends with a dropped connection"""
+
+    idle_timeout = 60.0
+    connections = 0
+
+    def __init__(self, failures, error=None):
+        self.failures = failures
+        self.error = error or smtplib.SMTPServerDisconnected("gone")
+        self.sent = []
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.sent.append(message)
+
+    def close_if_idle(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    transport = FlakyTransport(failures=2)
+    mailer = Mailer(transport, max_retries=3, retry_base_delay=0)
+    mailer.start()
+    mailer.enqueue(email("a@example.com"))
+    await mailer.drain()
+    await mailer.stop()
+    assert len(transport.sent) == 1
+    assert mailer.stats()["failed"] == 0
+
+@pytest.mark.asyncio
+async def test_permanent_failures_are_not_retried():
+    transport = FlakyTransport(failures=1, error=smtplib.SMTPDataError(550, b"rejected"))
+    mailer = Mailer(transport, max_retries=3, retry_base_delay=0)
+    mailer.start()
+    mailer.enqueue(email("a@example.com"))
+    await mailer.drain()
+    await mailer.stop()
+    assert transport.sent == [] and transport.failures == 0
+    assert mailer.stats()["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_enqueue_drops_when_queue_is_full():
+    mailer = Mailer(FlakyTransport(failures=0), max_queue=1)
+    assert mailer.enqueue(email("a@example.com"))
+    assert not mailer.enqueue(email("b@example.com"))
+    assert mailer.stats()["dropped"] == 1
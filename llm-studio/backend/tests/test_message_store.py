@@ -0,0 +1,111 @@
+# tests/test_message_store.py
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.message_store import BucketMessageStore
+from app.core.write_behind import WriteBehindWriter
+
+class FakeBucketCursor:
+    """find(...).sort(...) over in-memory buckets, honouring the sort but not the filter"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.read = 0
+
+    def sort(self, keys):
+        field, direction = keys[0]
+        self.buckets = sorted(self.buckets, key=lambda b: b[field], reverse=direction == -1)
+        return self
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for bucket in self.buckets:
+            self.read += 1
+            yield bucket
+
+def message(i, conversation_id="c1"):
+    return {"_id": ObjectId(), "conversation_id": conversation_id, "role": "user",
+            "content": f"message {i}", "created_at": datetime(2025, 3, 1, 12, 0, i), "metadata": {}}
+
+def fake_db(buckets):
+    cursor = FakeBucketCursor(buckets)
+    db = MagicMock()
+    db.message_buckets.find.return_value = cursor
+    return db, cursor
+
+def test_pack_splits_by_count_and_keeps_message_ids():
+    store = BucketMessageStore(bucket_size=2)
+    messages = [message(i) for i in range(5)]
+    buckets = store.pack("c1", messages)
+    assert [b["count"] for b in buckets] == [2, 2, 1]
+    assert buckets[0]["first_at"] == messages[0]["created_at"]
+    assert buckets[1]["last_at"] == messages[3]["created_at"]
+    assert buckets[2]["messages"][0]["_id"] == messages[4]["_id"]
+    assert "conversation_id" not in buckets[0]["messages"][0]
+
+def test_append_pushes_into_an_open_bucket():
+    store = BucketMessageStore(bucket_size=10, max_bytes=1000)
+    filter, update = store._append(message(1))
+    assert filter == {"conversation_id": "c1", "count": {"$lt": 10}, "bytes": {"$lt": 1000}}
+    assert update["$inc"]["count"] == 1 and update["$inc"]["bytes"] > 0
+    assert "conversation_id" not in update["$push"]["messages"]
+
+@pytest.mark.asyncio
+async def test_latest_page_reads_only_the_buckets_it_needs():
+    store = BucketMessageStore(bucket_size=3)
+    messages = [message(i) for i in range(9)]
+    db, cursor = fake_db(store.pack("c1", messages))
+    docs = await store.fetch(db, "c1", 3)
+    assert [d["content"] for d in docs] == ["message 8", "message 7", "message 6"]
+    assert docs[0]["conversation_id"] == "c1"
+    assert cursor.read == 2
+
+@pytest.mark.asyncio
+async def test_page_before_cursor_spans_buckets_and_drops_duplicates():
+    store = BucketMessageStore(bucket_size=3)
+    messages = [message(i) for i in range(9)]
+    buckets = store.pack("c1", messages)
+    # A replayed append left message 4 in two buckets
+    buckets[2]["messages"].append(dict(buckets[1]["messages"][1]))
+    buckets[2]["last_at"] = max(buckets[2]["last_at"], messages[4]["created_at"])
+    db, _ = fake_db(buckets)
+    key = (messages[6]["created_at"], messages[6]["_id"])
+    docs = await store.fetch(db, "c1", 4, key, direction=-1)
+    assert [d["content"] for d in docs] == ["message 5", "message 4", "message 3", "message 2"]
+
+@pytest.mark.asyncio
+async def test_page_after_cursor_walks_forward():
+    store = BucketMessageStore(bucket_size=2)
+    messages = [message(i) for i in range(6)]
+    db, _ = fake_db(store.pack("c1", messages))
+    key = (messages[2]["created_at"], messages[2]["_id"])
+    docs = await store.fetch(db, "c1", 2, key, direction=1)
+    assert [d["content"] for d in docs] == ["message 3", "message 4"]
+
+@pytest.mark.asyncio
+async def test_message_total_is_maintained_without_scanning_buckets():
+    store = BucketMessageStore(bucket_size=2)
+    writer = WriteBehindWriter()
+    with patch("app.services.message_store.write_behind", new=writer):
+        for i in range(3):
+            await store.buffer(message(i))
+    totals = list(writer._updates["message_counts"].values())
+    assert totals == [(BucketMessageStore.TOTAL, {"$inc": {"messages": 3}}, True)]
+
+    db, _ = fake_db(store.pack("c1", [message(i) for i in range(3)]))
+    db.message_buckets.delete_many = AsyncMock(return_value=MagicMock(deleted_count=2))
+    db.message_counts.update_one = AsyncMock()
+    assert await store.delete_conversation(db, "c1") == 2
+    db.message_counts.update_one.assert_awaited_once_with(BucketMessageStore.TOTAL, {"$inc": {"messages": -3}}, upsert=True)
+
+    db.message_counts.find_one = AsyncMock(return_value={"_id": "message_buckets", "messages": 42})
+    assert await store.estimated_count(db) == 42
+    db.message_buckets.aggregate.assert_not_called()
@@ -0,0 +1,79 @@
+# tests/test_migrations.py
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+from pymongo.errors import DuplicateKeyError
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.migrations import Migration, apply_migrations, superseded_indexes, summarize_plan
+
+def test_prefix_indexes_are_superseded_but_unique_and_ttl_are_kept():
+    index_info = {
+        "_id_": {"key": [("_id", 1)]},
+        "user_id_1": {"key": [("user_id", 1)]},
+        "user_id_1_updated_at_-1_id_-1": {"key": [("user_id", 1), ("updated_at", -1), ("_id", -1)]},
+        "updated_at_-1": {"key": [("updated_at", -1.0)]},
+        "updated_at_-1__id_-1": {"key": [("updated_at", -1), ("_id", -1)]},
+        "updated_at_1": {"key": [("updated_at", 1)]},
+        "user_id_unique": {"key": [("user_id", 1)], "unique": True},
+        "expires": {"key": [("updated_at", -1)], "expireAfterSeconds": 0},
+    }
+    assert sorted(superseded_indexes(index_info)) == ["updated_at_-1", "user_id_1"]
+
+def test_plan_summary_flags_blocking_sort():
+    plan = {"stage": "SORT", "inputStage": {"stage": "FETCH", "inputStage": {
+        "stage": "IXSCAN", "indexName": "conversation_id_1_last_at_-1"}}}
+    stages, indexes = summarize_plan(plan)
+    assert stages == ["SORT", "FETCH", "IXSCAN"]
+    assert indexes == ["conversation_id_1_last_at_-1"]
+    sbe = {"queryPlan": {"stage": "LIMIT", "inputStage": {"stage": "COLLSCAN"}}}
+    assert summarize_plan(sbe) == (["LIMIT", "COLLSCAN"], [])
+
+class AsyncRows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for row in self.rows:
+            yield row
+
+def fake_migrations_db(done=(), taken=()):
+    db = MagicMock()
+    db.schema_migrations.find.return_value = AsyncRows([{"_id": v} for v in done])
+
+    async def insert_one(doc):
+        if doc["_id"] in taken:
+            raise DuplicateKeyError("taken")
+    db.schema_migrations.insert_one = AsyncMock(side_effect=insert_one)
+    db.schema_migrations.find_one_and_update = AsyncMock(return_value=None)
+    db.schema_migrations.update_one = AsyncMock()
+    db.schema_migrations.delete_one = AsyncMock()
+    return db
+
+@pytest.mark.asyncio
+async def test_pending_migrations_run_in_order_and_applied_ones_are_skipped():
+    ran = []
+    migrations = [Migration(v, f"m{v}", AsyncMock(side_effect=lambda db, v=v: ran.append(v))) for v in (1, 2, 3)]
+    db = fake_migrations_db(done=[1])
+    assert await apply_migrations(db, migrations) == [2, 3]
+    assert ran == [2, 3]
+
+@pytest.mark.asyncio
+async def test_runner_stops_at_a_migration_claimed_by_another_worker():
+    migrations = [Migration(v, f"m{v}", AsyncMock()) for v in (1, 2)]
+    db = fake_migrations_db(taken=[1])
+    assert await apply_migrations(db, migrations) == []
+    migrations[1].apply.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_failed_migration_releases_its_claim():
+    migrations = [Migration(1, "boom", AsyncMock(side_effect=RuntimeError("boom"))), Migration(2, "m2", AsyncMock())]
+    db = fake_migrations_db()
+    assert await apply_migrations(db, migrations) == []
+    db.schema_migrations.delete_one.assert_awaited_once_with({"_id": 1, "state": "running"})
+    migrations[1].apply.assert_not_called()
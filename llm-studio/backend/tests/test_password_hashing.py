@@ -0,0 +1,67 @@
+# tests/test_password_hashing.py
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.password_hashing import PasswordHasher, HashingBusyError
+from app.core.rate_limit import RateLimiter, RateLimitExceeded
+
+class BlockingContext:
+    """Stands in for the CryptContext: hashing blocks until released, off the event loop"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = set()
+
+    def hash(self, password):
+        self.threads.add(threading.current_thread().name)
+        self.release.wait(5)
+        return f"hashed:{password}"
+
+    def verify_and_update(self, password, hashed):
+        return hashed == f"hashed:{password}", None
+
+@pytest.mark.asyncio
+async def test_hashing_runs_on_the_pool_and_rejects_overflow():
+    context = BlockingContext()
+    hasher = PasswordHasher(context, workers=1, max_pending=2)
+    first = asyncio.create_task(hasher.hash("a"))
+    second = asyncio.create_task(hasher.hash("b"))
+    await asyncio.sleep(0.05)
+    # The loop is still free while both wait on the pool
+    with pytest.raises(HashingBusyError):
+        await hasher.hash("c")
+    context.release.set()
+    assert await asyncio.gather(first, second) == ["hashed:a", "hashed:b"]
+    assert all(name.startswith("password-hash") for name in context.threads)
+    assert hasher.stats()["rejected"] == 1
+    assert await hasher.verify_and_update("a", "hashed:a") == (True, None)
+    hasher.shutdown()
+
+def test_rate_limiter_window():
+    limiter = RateLimiter(max_attempts=2, window=60)
+    with patch("app.core.rate_limit.time.monotonic", return_value=100.0):
+        limiter.hit("ip:1")
+        limiter.hit("ip:1")
+        with pytest.raises(RateLimitExceeded) as exc:
+            limiter.hit("ip:1")
+        assert exc.value.retry_after == 60
+        limiter.hit("ip:2")
+    with patch("app.core.rate_limit.time.monotonic", return_value=161.0):
+        limiter.hit("ip:1")
+
+def test_rate_limiter_reset_and_sweep():
+    limiter = RateLimiter(max_attempts=1, window=10, sweep_threshold=2)
+    with patch("app.core.rate_limit.time.monotonic", return_value=0.0):
+        limiter.hit("a")
+        limiter.reset("a")
+        limiter.hit("a")
+        limiter.hit("b")
+    with patch("app.core.rate_limit.time.monotonic", return_value=20.0):
+        limiter.hit("c")
+    assert set(limiter._attempts) == {"c"}
@@ -0,0 +1,68 @@
+# tests/test_reset_code_store.py
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.reset_code_cache import (
+    MemoryResetCodeStore, MongoResetCodeStore, CODE_OK, CODE_MISSING, CODE_INVALID, CODE_LOCKED
+)
+
+@pytest.mark.asyncio
+async def test_memory_code_can_only_be_used_once():
+    store = MemoryResetCodeStore()
+    code = await store.set("u1")
+    assert len(code) == 8 and code.isdigit()
+    assert await store.consume("u1", code) == CODE_OK
+    assert await store.consume("u1", code) == CODE_MISSING
+
+@pytest.mark.asyncio
+async def test_memory_code_is_locked_after_too_many_wrong_guesses():
+    store = MemoryResetCodeStore(max_attempts=2)
+    code = await store.set("u1")
+    assert await store.consume("u1", "00000000") == CODE_INVALID
+    assert await store.consume("u1", "00000000") == CODE_LOCKED
+    assert await store.consume("u1", code) == CODE_MISSING
+
+@pytest.mark.asyncio
+async def test_memory_store_expires_and_sweeps_codes():
+    with patch("app.services.reset_code_cache.time.monotonic", return_value=0.0):
+        store = MemoryResetCodeStore(ttl=600, sweep_interval=60)
+        code = await store.set("u1")
+        await store.set("u2")
+    with patch("app.services.reset_code_cache.time.monotonic", return_value=601.0):
+        assert await store.consume("u1", code) == CODE_MISSING
+        await store.set("u3")
+    assert set(store._codes) == {"u3"}
+
+def fake_codes_db(entry, deleted=1):
+    db = MagicMock()
+    db.reset_codes.find_one_and_update = AsyncMock(return_value=entry)
+    db.reset_codes.delete_one = AsyncMock(return_value=MagicMock(deleted_count=deleted))
+    return db
+
+@pytest.mark.asyncio
+async def test_mongo_consume_counts_the_attempt_before_comparing():
+    db = fake_codes_db({"_id": "u1", "code": "12345678", "attempts": 1})
+    with patch("app.services.reset_code_cache.get_database", new=AsyncMock(return_value=db)):
+        assert await MongoResetCodeStore(max_attempts=5).consume("u1", "12345678") == CODE_OK
+    filter, update = db.reset_codes.find_one_and_update.call_args.args
+    assert filter["attempts"] == {"$lt": 5} and update == {"$inc": {"attempts": 1}}
+    db.reset_codes.delete_one.assert_awaited_once_with({"_id": "u1", "code": "12345678"})
+
+@pytest.mark.asyncio
+async def test_mongo_consume_loses_race_for_the_same_code():
+    db = fake_codes_db({"_id": "u1", "code": "12345678", "attempts": 1}, deleted=0)
+    with patch("app.services.reset_code_cache.get_database", new=AsyncMock(return_value=db)):
+        assert await MongoResetCodeStore().consume("u1", "12345678") == CODE_MISSING
+
+@pytest.mark.asyncio
+async def test_mongo_last_wrong_guess_locks_the_code():
+    db = fake_codes_db({"_id": "u1", "code": "12345678", "attempts": 3})
+    with patch("app.services.reset_code_cache.get_database", new=AsyncMock(return_value=db)):
+        store = MongoResetCodeStore(max_attempts=3)
+        assert await store.consume("u1", "87654321") == CODE_LOCKED
+        db.reset_codes.find_one_and_update.return_value = None
+        assert await store.consume("u1", "12345678") == CODE_MISSING
@@ -0,0 +1,72 @@
+# tests/test_responses.py
+import json
+import pytest
+from datetime import datetime
+from typing import List
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.responses import FastJSONResponse, JSONArrayStream, dumps
+from app.models.conversation import Conversation, Message
+from app.models.admin_chat import TicketSummary
+
+NOW = datetime(2025, 3, 1, 12, 30, 15, 123000)
+
+def conversation():
+    message = Message(id="m1", conversation_id="c1", role="user", content="hi", created_at=NOW, metadata={"k": 1})
+    return Conversation(id="c1", title="t", llm_id="l", user_id="u", messages=[message], created_at=NOW, updated_at=NOW)
+
+def ticket():
+    return TicketSummary(**{"_id": str(ObjectId()), "title": "t", "user_id": "u", "status": "open",
+                            "created_at": NOW, "updated_at": NOW,
+                            "last_message": {"content": "c", "is_admin": True, "created_at": NOW}})
+
+def test_fast_response_matches_fastapi_serialization():
+    app = FastAPI()
+
+    @app.get("/default", response_model=List[TicketSummary])
+    async def default():
+        return [ticket_]
+
+    @app.get("/fast", response_model=List[TicketSummary])
+    async def fast():
+        return FastJSONResponse([ticket_])
+
+    @app.get("/conversation/default", response_model=Conversation)
+    async def conversation_default():
+        return conversation_
+
+    @app.get("/conversation/fast", response_model=Conversation)
+    async def conversation_fast():
+        return FastJSONResponse(conversation_)
+
+    ticket_, conversation_ = ticket(), conversation()
+    client = TestClient(app)
+    assert client.get("/fast").json() == client.get("/default").json()
+    assert client.get("/fast").json()[0]["_id"] == ticket_.id
+    assert client.get("/conversation/fast").json() == client.get("/conversation/default").json()
+
+def test_dumps_handles_object_ids_and_non_string_keys():
+    object_id = ObjectId()
+    assert json.loads(dumps({"id": object_id, 1: "one"})) == {"id": str(object_id), "1": "one"}
+
+@pytest.mark.parametrize("count", [0, 1, 5, 7])
+def test_streamed_array_is_valid_json(count):
+    async def items():
+        for i in range(count):
+            yield {"i": i, "at": NOW}
+
+    app = FastAPI()
+
+    @app.get("/items")
+    async def read_items():
+        return JSONArrayStream(items(), batch_size=3)
+
+    response = TestClient(app).get("/items")
+    assert response.headers["content-type"] == "application/json"
+    assert [item["i"] for item in response.json()] == list(range(count))
@@ -0,0 +1,41 @@
+# tests/test_stream_relay.py
+import pytest
+import asyncio
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.websocket import StreamRelay
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+
+    async def send_json(self, data):
+        await asyncio.sleep(self.delay)
+        self.frames.append(data)
+
+async def token_stream(tokens, gap=0.0):
+    for token in tokens:
+        await asyncio.sleep(gap)
+        yield token
+
+@pytest.mark.asyncio
+async def test_stream_relay_coalesces_tokens_into_frames():
+    websocket = FakeWebSocket()
+    relay = StreamRelay(websocket, "conv", flush_interval=10.0, flush_chars=10)
+    tokens = ["ab"] * 50
+    text = await relay.relay(token_stream(tokens))
+    assert text == "ab" * 50
+    assert "".join(frame["content"] for frame in websocket.frames) == text
+    assert len(websocket.frames) <= 10 and not relay.dropped
+
+@pytest.mark.asyncio
+async def test_stream_relay_drops_stalled_client_but_keeps_reading():
+    websocket = FakeWebSocket(delay=1.0)
+    relay = StreamRelay(websocket, "conv", flush_interval=0.0, flush_chars=1, send_timeout=0.01)
+    text = await relay.relay(token_stream(["x"] * 20, gap=0.001))
+    assert relay.dropped
+    assert text == "x" * 20
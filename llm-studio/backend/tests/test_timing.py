@@ -0,0 +1,92 @@
+# tests/test_timing.py
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.db_monitor import CommandMonitor, DBStatsMiddleware
+from app.core.timing import (
+    Histogram, MetricsRegistry, TimingMiddleware, instrument_routes, time_phase, track_ws_message
+)
+import app.core.db_monitor as db_monitor
+import app.core.timing as timing
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    h = Histogram(buckets=(0.1, 0.2, 0.4))
+    for value in [0.05] * 50 + [0.15] * 45 + [0.3] * 5:
+        h.observe(value)
+    assert h.quantile(0.5) == pytest.approx(0.1)
+    assert h.quantile(0.95) == pytest.approx(0.2)
+    assert 0.2 < h.quantile(0.99) < 0.4
+
+def test_registry_renders_prometheus_histograms():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.describe("latency_seconds", "Latency")
+    registry.observe("latency_seconds", {"route": 'GET /a/{id}'}, 0.05)
+    registry.observe("latency_seconds", {"route": 'GET /a/{id}'}, 2.0)
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="GET /a/{id}",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="GET /a/{id}",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{route="GET /a/{id}"} 2' in text
+
+def test_server_timing_header_and_route_template_labels(monkeypatch):
+    registry = MetricsRegistry()
+    monitor = CommandMonitor(request_calls_warn=0)
+    monkeypatch.setattr(timing, "metrics", registry)
+    monkeypatch.setattr(db_monitor, "command_monitor", monitor)
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware, server_timing_header=True)
+    app.add_middleware(DBStatsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        monitor.started(SimpleNamespace(command_name="find", command={"find": "items"}, connection_id=1, request_id=1))
+        monitor.succeeded(SimpleNamespace(command_name="find", connection_id=1, request_id=1, duration_micros=3000))
+        with time_phase("upstream"):
+            pass
+        return {"id": item_id}
+
+    instrument_routes(app)
+    response = TestClient(app).get("/items/42")
+    header = response.headers["server-timing"]
+    for name in ("app;dur=", "endpoint;dur=", "serialize;dur=", "upstream;dur=", 'db;dur=3.0;desc="1 queries"'):
+        assert name in header
+    (row,) = registry.summary("http_request_duration_seconds")
+    assert row["route"] == "GET /items/{item_id}" and row["status"] == "2xx" and row["count"] == 1
+    phases = {r["phase"] for r in registry.summary("http_request_phase_seconds")}
+    assert phases == {"endpoint", "serialize", "upstream", "db"}
+
+def test_server_timing_header_is_off_by_default(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(timing, "metrics", registry)
+    monkeypatch.setattr(db_monitor, "command_monitor", CommandMonitor(request_calls_warn=0))
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+    app.add_middleware(DBStatsMiddleware)
+
+    @app.get("/items")
+    async def items():
+        return []
+
+    response = TestClient(app).get("/items")
+    assert "server-timing" not in response.headers
+    # The histograms are recorded either way
+    (row,) = registry.summary("http_request_duration_seconds")
+    assert row["count"] == 1
+
+@pytest.mark.asyncio
+async def test_websocket_messages_are_timed_by_type(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(timing, "metrics", registry)
+    monkeypatch.setattr(db_monitor, "command_monitor", CommandMonitor(request_calls_warn=0))
+    async with track_ws_message("prompt"):
+        with time_phase("upstream"):
+            pass
+    (row,) = registry.summary("websocket_message_duration_seconds")
+    assert row["type"] == "prompt" and row["count"] == 1
+    assert {r["phase"] for r in registry.summary("websocket_message_phase_seconds")} == {"upstream", "db"}
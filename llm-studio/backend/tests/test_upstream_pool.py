@@ -0,0 +1,56 @@
+# tests/test_upstream_pool.py
+import pytest
+import asyncio
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.llm_upstream_pool import UpstreamPool
+
+def test_pool_keeps_conversations_on_their_node():
+    pool = UpstreamPool(["http://node-a:5000", "http://node-b:5000", "http://node-c:5000"])
+    keys = [f"{i:024x}" for i in range(200)]
+    before = {key: pool.pick(key).url for key in keys}
+    assert len(set(before.values())) == 3
+    assert all(pool.pick(key).url == url for key, url in before.items())
+
+    # Adding a node only moves conversations onto the new node
+    pool.add_node("http://node-d:5000")
+    after = {key: pool.pick(key).url for key in keys}
+    moved = [key for key in keys if after[key] != before[key]]
+    assert moved and all(after[key] == "http://node-d:5000" for key in moved)
+
+def test_pool_falls_back_to_least_loaded_node():
+    pool = UpstreamPool(["http://node-a:5000", "http://node-b:5000", "http://node-c:5000"])
+    key = "0" * 24
+    owner = pool.pick(key)
+    others = [node for node in pool.nodes.values() if node is not owner]
+    others[0].queue_depth = 5
+    others[1].queue_depth = 1
+    owner.healthy = False
+    assert pool.pick(key) is others[1]
+    # The conversation stays on its fallback node even if it gets busier
+    others[1].queue_depth = 10
+    assert pool.pick(key) is others[1]
+
+@pytest.mark.asyncio
+async def test_pool_drains_node_before_removing_it():
+    pool = UpstreamPool(["http://node-a:5000", "http://node-b:5000"])
+    node = pool.nodes["http://node-a:5000"]
+    release = asyncio.Event()
+
+    async def in_flight_request():
+        async with pool.lease(node):
+            await release.wait()
+
+    request = asyncio.create_task(in_flight_request())
+    await asyncio.sleep(0)
+    removal = asyncio.create_task(pool.remove_node(node.url, timeout=5))
+    await asyncio.sleep(0)
+    assert node.draining and node.url in pool.nodes
+    assert all(pool.pick(f"{i:024x}").url == "http://node-b:5000" for i in range(20))
+    release.set()
+    assert await removal is True
+    await request
+    assert node.url not in pool.nodes
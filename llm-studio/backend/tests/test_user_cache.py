@@ -0,0 +1,68 @@
+# tests/test_user_cache.py
+import pytest
+from datetime import datetime
+from unittest.mock import patch, AsyncMock
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.models.user import User
+from app.services.user_cache import UserCache
+
+def make_user(role="user"):
+    now = datetime(2025, 3, 1)
+    return User(id="u1", username="alice", email="alice@example.com", hashed_password="x",
+                role=role, created_at=now, updated_at=now)
+
+@pytest.mark.asyncio
+async def test_fresh_entries_skip_the_database():
+    cache = UserCache(revalidate_after=60)
+    load = AsyncMock(return_value=(make_user(), 0))
+    assert (await cache.get("u1", load)).username == "alice"
+    assert (await cache.get("u1", load)).username == "alice"
+    assert load.await_count == 1
+    assert cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_a_reload():
+    cache = UserCache(revalidate_after=60)
+    load = AsyncMock(side_effect=[(make_user(), 0), (make_user("admin"), 1)])
+    await cache.get("u1", load)
+    cache.invalidate("u1")
+    assert (await cache.get("u1", load)).role == "admin"
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_kept_while_the_version_matches():
+    cache = UserCache(revalidate_after=0)
+    load = AsyncMock(return_value=(make_user(), 3))
+    await cache.get("u1", load)
+    with patch.object(UserCache, "_stored_version", new=AsyncMock(return_value=3)):
+        await cache.get("u1", load)
+    assert load.await_count == 1
+    assert cache.stats()["revalidations"] == 1
+
+@pytest.mark.asyncio
+async def test_version_bump_from_another_worker_reloads_the_user():
+    cache = UserCache(revalidate_after=0)
+    load = AsyncMock(side_effect=[(make_user(), 3), (make_user("technician"), 4)])
+    await cache.get("u1", load)
+    with patch.object(UserCache, "_stored_version", new=AsyncMock(return_value=4)):
+        assert (await cache.get("u1", load)).role == "technician"
+
+@pytest.mark.asyncio
+async def test_deleted_user_is_dropped():
+    cache = UserCache(revalidate_after=0)
+    load = AsyncMock(return_value=(make_user(), 0))
+    await cache.get("u1", load)
+    with patch.object(UserCache, "_stored_version", new=AsyncMock(return_value=None)):
+        assert await cache.get("u1", load) is None
+    assert cache.stats()["size"] == 0
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted():
+    cache = UserCache(max_size=2, revalidate_after=60)
+    load = AsyncMock(return_value=(make_user(), 0))
+    for user_id in ("a", "b", "a", "c"):
+        await cache.get(user_id, load)
+    assert list(cache._entries) == ["a", "c"]
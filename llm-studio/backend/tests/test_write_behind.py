@@ -0,0 +1,69 @@
+# tests/test_write_behind.py
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.write_behind import WriteBehindWriter
+
+@pytest.mark.asyncio
+async def test_write_behind_batches_collapses_and_retries():
+    writer = WriteBehindWriter(flush_interval=60)
+    collections = {"messages": MagicMock(), "conversations": MagicMock()}
+    collections["messages"].bulk_write = AsyncMock(side_effect=[Exception("primary stepped down"), None])
+    collections["conversations"].bulk_write = AsyncMock()
+    fake_db = MagicMock()
+    fake_db.__getitem__.side_effect = collections.__getitem__
+
+    with patch("app.core.write_behind.get_database", new=AsyncMock(return_value=fake_db)):
+        await writer.insert("messages", {"content": "hi"})
+        await writer.insert("messages", {"content": "hello"})
+        for _ in range(3):
+            await writer.update("conversations", {"_id": 1}, {"$set": {"updated_at": 1}}, key=("updated_at", 1))
+        assert writer.pending == 3
+
+        assert await writer.flush() is False
+        assert writer.pending == 2  # the failed message batch is kept
+        assert len(collections["conversations"].bulk_write.await_args.args[0]) == 1
+
+        await writer.stop()
+        assert writer.pending == 0
+        assert len(collections["messages"].bulk_write.await_args.args[0]) == 2
+
+@pytest.mark.asyncio
+async def test_stop_drains_the_buffer_before_shutdown():
+    writer = WriteBehindWriter(flush_interval=60, shutdown_retries=3)
+    collections = {"messages": MagicMock(), "conversations": MagicMock()}
+    # The background loop's last flush and the first retry fail; the second retry gets through
+    collections["messages"].bulk_write = AsyncMock(side_effect=[Exception("not primary"), Exception("not primary"), None])
+    collections["conversations"].bulk_write = AsyncMock()
+    fake_db = MagicMock()
+    fake_db.__getitem__.side_effect = collections.__getitem__
+
+    with patch("app.core.write_behind.get_database", new=AsyncMock(return_value=fake_db)), \
+         patch("app.core.write_behind.asyncio.sleep", new=AsyncMock()):
+        writer.start()
+        await writer.insert("messages", {"content": "hi"})
+        await writer.update("conversations", {"_id": 1}, {"$inc": {"message_count": 1}}, key=1)
+        await writer.stop()
+
+    assert writer.pending == 0
+    assert writer._task is None
+    assert collections["messages"].bulk_write.await_count == 3
+    assert writer.stats()["flushed"] == 2
+
+@pytest.mark.asyncio
+async def test_stop_gives_up_after_the_shutdown_retries():
+    writer = WriteBehindWriter(flush_interval=60, shutdown_retries=2)
+    fake_db = MagicMock()
+    fake_db.__getitem__.return_value.bulk_write = AsyncMock(side_effect=Exception("unreachable"))
+
+    with patch("app.core.write_behind.get_database", new=AsyncMock(return_value=fake_db)), \
+         patch("app.core.write_behind.asyncio.sleep", new=AsyncMock()):
+        await writer.insert("messages", {"content": "hi"})
+        await writer.stop()
+
+    assert writer.pending == 1
+    assert fake_db.__getitem__.return_value.bulk_write.await_count == 2
@@ -134,27 +134,68 @@ const ChatInterface = ({ conversation, isLLMSelected }) => {
   const textareaRef = useRef(null);
   const streamingContentRef = useRef("");
   const [streamingContent, setStreamingContent] = useState("");
+  const [queuePosition, setQueuePosition] = useState(null);
+  const [earlierCursor, setEarlierCursor] = useState(null);
+  const [isLoadingEarlier, setIsLoadingEarlier] = useState(false);
+  const keepScrollRef = useRef(false);
+  const shownConversationIdRef = useRef(conversation?.id);
   const { isConnected, sendPrompt, subscribeToConversation } = useWebSocketContext();
 
   // Effect to cycle through thinking messages when typing
   useEffect(() => {
     let interval;
-    if (isTyping && !isStreaming) {
+    if (isTyping && !isStreaming && queuePosition === null) {
       interval = setInterval(() => {
         const randomIndex = Math.floor(Math.random() * THINKING_MESSAGES.length);
         setThinkingMessage(THINKING_MESSAGES[randomIndex]);
       }, 4500); // Change message every 1.5 seconds
     }
     return () => clearInterval(interval);
-  }, [isTyping, isStreaming]);
+  }, [isTyping, isStreaming, queuePosition]);
 
+  // Messages typed or streamed here (`local`) that the conversation's history doesn't have yet
+  // stay after it when the history arrives or is refreshed
   useEffect(() => {
     if (conversation) {
-      setLocalMessages(conversation.messages || []);
+      const sameConversation = shownConversationIdRef.current === conversation.id;
+      shownConversationIdRef.current = conversation.id;
+      setLocalMessages((prev) => [
+        ...(conversation.messages || []),
+        ...(sameConversation ? prev.filter((msg) => msg.local) : []),
+      ]);
+      setEarlierCursor(conversation.messages_before || null);
     }
   }, [conversation]);
 
+  // Only the latest messages come with the conversation; older ones are fetched a page at a time
+  const loadEarlierMessages = async () => {
+    if (!earlierCursor || isLoadingEarlier) return;
+    setIsLoadingEarlier(true);
+    try {
+      const response = await fetch(
+        `/api/conversations/${conversation.id}/messages?before=${encodeURIComponent(earlierCursor)}`,
+        { headers: { Authorization: `Bearer ${localStorage.getItem("token")}` } }
+      );
+      if (!response.ok) {
+        throw new Error(`Failed to load messages: ${response.statusText}`);
+      }
+      const page = await response.json();
+      keepScrollRef.current = true;
+      setLocalMessages((prev) => [...page.messages, ...prev]);
+      setEarlierCursor(page.before || null);
+    } catch (error) {
+      console.error("Error loading earlier messages:", error);
+      toast.error("Failed to load earlier messages");
+    } finally {
+      setIsLoadingEarlier(false);
+    }
+  };
+
   useEffect(() => {
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [localMessages, streamingContent, thinkingMessage]);
 
@@ -172,6 +213,7 @@ const ChatInterface = ({ conversation, isLLMSelected }) => {
       role: "assistant",
       content,
       created_at: new Date().toISOString(),
+      local: true,
     };
     setLocalMessages((prev) => [...prev, newMessage]);
   }, []);
@@ -180,7 +222,11 @@ const ChatInterface = ({ conversation, isLLMSelected }) => {
     if (!conversation?.id) return;
 
     const unsubscribe = subscribeToConversation(conversation.id, (data) => {
-      if (data.type === "stream") {
+      if (data.type === "queue_position") {
+        setQueuePosition(data.position);
+        setThinkingMessage(`Waiting in queue (position ${data.position})...`);
+      } else if (data.type === "stream") {
+        setQueuePosition(null);
         setIsStreaming(true);
         setStreamingContent((prev) => {
           const newContent = prev + (data.content || "");
@@ -189,11 +235,12 @@ const ChatInterface = ({ conversation, isLLMSelected }) => {
         });
       } else if (data.type === "complete") {
         setIsStreaming(false);
-        const finalContent = streamingContentRef.current;
+        const finalContent = data.truncated ? data.content : streamingContentRef.current;
         handleNewAssistantMessage(finalContent);
         setStreamingContent("");
         streamingContentRef.current = "";
         setIsTyping(false);
+        setQueuePosition(null);
         setThinkingMessage(""); // Clear thinking message when response is complete
       }
     });
@@ -225,6 +272,7 @@ const ChatInterface = ({ conversation, isLLMSelected }) => {
       role: "user",
       content: message,
       created_at: new Date().toISOString(),
+      local: true,
     };
     setLocalMessages((prev) => [...prev, userMessage]);
 
@@ -275,6 +323,15 @@ const ChatInterface = ({ conversation, isLLMSelected }) => {
           </div>
         ) : (
           <>
+            {earlierCursor && (
+              <button
+                className="load-earlier-button"
+                onClick={loadEarlierMessages}
+                disabled={isLoadingEarlier}
+              >
+                {isLoadingEarlier ? "Loading..." : "Load earlier messages"}
+              </button>
+            )}
             {localMessages.map((msg, index) => (
               <Message
                 key={msg.id || `msg-${index}`}
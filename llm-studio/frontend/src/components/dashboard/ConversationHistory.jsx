@@ -1,7 +1,7 @@
 import React from 'react';
 import { FiMessageSquare, FiClock } from 'react-icons/fi';
 
-const ConversationHistory = ({ conversations, selectedConversationId, onConversationSelect }) => {
+const ConversationHistory = ({ conversations, selectedConversationId, onConversationSelect, hasMore, onLoadMore }) => {
   const formatDate = (dateString) => {
     const date = new Date(dateString);
     const now = new Date();
@@ -42,6 +42,11 @@ const ConversationHistory = ({ conversations, selectedConversationId, onConversa
           </div>
         </div>
       ))}
+      {hasMore && (
+        <button className="load-more-button" onClick={onLoadMore}>
+          Load more
+        </button>
+      )}
     </div>
   );
 };
@@ -61,6 +61,25 @@ export const WebSocketProvider = ({ children }) => {
         return;
       }
       
+      if (data.type === 'queue_position' && data.conversation_id) {
+        // The prompt is waiting for a free generation slot
+        if (messageListeners[data.conversation_id]) {
+          messageListeners[data.conversation_id].forEach(callback => {
+            try {
+              callback({
+                type: 'queue_position',
+                position: data.position,
+                conversationId: data.conversation_id
+              });
+            } catch (err) {
+              console.error('Error in queue position listener callback:', err);
+            }
+          });
+        }
+        
+        return;
+      }
+      
       if (data.type === 'complete' && data.conversation_id) {
         // Handle completion of a stream
         if (messageListeners[data.conversation_id]) {
@@ -69,7 +88,9 @@ export const WebSocketProvider = ({ children }) => {
               callback({
                 type: 'complete',
                 conversationId: data.conversation_id,
-                content: conversationStreams[data.conversation_id] || ''
+                truncated: data.truncated || false,
+                // A truncated stream carries the whole answer in the completion message
+                content: data.truncated ? data.content : (conversationStreams[data.conversation_id] || '')
               });
             } catch (err) {
               console.error('Error in complete listener callback:', err);
@@ -10,7 +10,10 @@ import {
   FiPlus,
 } from "react-icons/fi";
 import { useAuth } from "../hooks/useAuth";
-import { adminChatService } from "../services/admin-chat.service";
+import {
+  adminChatService,
+  mergeTicketMessages,
+} from "../services/admin-chat.service";
 import { toast } from "react-toastify";
 import DashboardHeader from "../components/dashboard/DashboardHeader";
 import "./AdminChat.css";
@@ -20,7 +23,10 @@ const AdminChat = () => {
   const { user } = useAuth();
 
   const [tickets, setTickets] = useState([]);
+  const [nextTicketsCursor, setNextTicketsCursor] = useState(null);
+  const [isLoadingMoreTickets, setIsLoadingMoreTickets] = useState(false);
   const [selectedTicketId, setSelectedTicketId] = useState(null);
+  const [ticketDetail, setTicketDetail] = useState(null);
   const [newMessage, setNewMessage] = useState("");
   const [isLoadingTickets, setIsLoadingTickets] = useState(true);
   const [isSending, setIsSending] = useState(false);
@@ -32,6 +38,7 @@ const AdminChat = () => {
   const messagesEndRef = useRef(null);
 
   const firstLoadRef = useRef(true);
+  const loadedMoreRef = useRef(false);
 
   const fetchTickets = useCallback(async () => {
     try {
@@ -39,74 +46,31 @@ const AdminChat = () => {
         setIsLoadingTickets(true);
       }
 
-      const response = await adminChatService.getUserTickets();
-
-      if (Array.isArray(response)) {
-        const normalizedTickets = response.map((t) => ({
-          ...t,
-          id: t._id || t.id,
-        }));
-
-        setTickets((prevTickets) => {
-          let hasChanges = false;
-
-          const updatedTickets = normalizedTickets.map((newTicket) => {
-            const existingTicket = prevTickets.find(
-              (t) => t.id === newTicket.id
-            );
-            if (existingTicket) {
-              const existingMessages = existingTicket.messages || [];
-              const newMessages = newTicket.messages || [];
-
-              const hasNewMessages =
-                newMessages.length >
-                  existingMessages.filter((m) => !m.optimistic).length ||
-                newMessages.some(
-                  (newMsg) =>
-                    !existingMessages.some(
-                      (oldMsg) => oldMsg.id === newMsg.id && !oldMsg.optimistic
-                    )
-                );
-
-              const hasStatusChange = existingTicket.status !== newTicket.status;
-
-              if (hasNewMessages || hasStatusChange) {
-                hasChanges = true;
-                const mergedMessages = [
-                  ...existingMessages.filter((msg) => msg.optimistic),
-                  ...newMessages.filter(
-                    (newMsg) =>
-                      !existingMessages.some(
-                        (oldMsg) =>
-                          oldMsg.id === newMsg.id && !oldMsg.optimistic
-                      )
-                  ),
-                ];
-                return { ...newTicket, messages: mergedMessages };
-              }
-              return existingTicket;
-            } else {
-              hasChanges = true;
-              return newTicket;
-            }
-          });
-
-          if (!hasChanges && prevTickets.length === normalizedTickets.length) {
-            return prevTickets;
-          }
-
-          const newTicketIds = new Set(normalizedTickets.map((t) => t.id));
-          const additionalTickets = prevTickets.filter(
-            (t) => !newTicketIds.has(t.id)
-          );
-
-          return [...updatedTickets, ...additionalTickets];
-        });
-      } else {
-        console.warn("API response for tickets was not an array:", response);
-        setError("Received invalid data format for tickets.");
-        toast.error("Failed to load tickets: Invalid data format.");
+      const { tickets: firstPage, nextCursor } =
+        await adminChatService.getUserTicketSummaries();
+
+      setTickets((prevTickets) => {
+        // Polling refreshes the first page; pages added with "Load more" are kept below it
+        let merged = firstPage;
+        if (loadedMoreRef.current && nextCursor && firstPage.length > 0) {
+          const ids = new Set(firstPage.map((t) => t.id));
+          const oldest = firstPage[firstPage.length - 1].updated_at;
+          merged = [
+            ...firstPage,
+            ...prevTickets.filter(
+              (t) => !ids.has(t.id) && t.updated_at < oldest
+            ),
+          ];
+        }
+        if (JSON.stringify(prevTickets) !== JSON.stringify(merged)) {
+          return merged;
+        }
+        return prevTickets;
+      });
+      if (!loadedMoreRef.current) {
+        setNextTicketsCursor(nextCursor);
       }
+      setError(null);
     } catch (err) {
       console.error("Error fetching tickets:", err);
       setError("Failed to load support tickets. Please try again later.");
@@ -129,10 +93,71 @@ const AdminChat = () => {
     return () => clearInterval(intervalId);
   }, [fetchTickets]);
 
-  const selectedTicket = tickets.find(
+  const loadMoreTickets = async () => {
+    if (!nextTicketsCursor || isLoadingMoreTickets) return;
+    setIsLoadingMoreTickets(true);
+    try {
+      const { tickets: page, nextCursor } =
+        await adminChatService.getUserTicketSummaries(null, nextTicketsCursor);
+      loadedMoreRef.current = true;
+      setTickets((prevTickets) => {
+        const ids = new Set(prevTickets.map((t) => t.id));
+        return [...prevTickets, ...page.filter((t) => !ids.has(t.id))];
+      });
+      setNextTicketsCursor(nextCursor);
+    } catch (err) {
+      console.error("Error loading more tickets:", err);
+      toast.error("Failed to load more tickets.");
+    } finally {
+      setIsLoadingMoreTickets(false);
+    }
+  };
+
+  const selectedSummary = tickets.find(
     (ticket) => ticket.id === selectedTicketId
   );
 
+  // (Re)load the selected ticket's thread when it is opened or its summary shows new activity;
+  // messages still being sent are kept after the fetched thread
+  useEffect(() => {
+    if (!selectedTicketId) {
+      setTicketDetail(null);
+      return;
+    }
+    let cancelled = false;
+    adminChatService
+      .getTicket(selectedTicketId)
+      .then((ticket) => {
+        if (cancelled) return;
+        setTicketDetail((prev) => ({
+          ...ticket,
+          messages: mergeTicketMessages(
+            prev && prev.id === ticket.id ? prev.messages : [],
+            ticket.messages || []
+          ),
+        }));
+      })
+      .catch((err) => console.error("Error fetching ticket:", err));
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedTicketId, selectedSummary?.updated_at]);
+
+  const selectedTicket =
+    ticketDetail && ticketDetail.id === selectedTicketId
+      ? { ...ticketDetail, status: selectedSummary?.status || ticketDetail.status }
+      : selectedSummary;
+
+  // With `fromSummary`, a thread that hasn't loaded yet starts from the summary, so a message
+  // sent before it arrives is kept (the fetched thread is merged ahead of it)
+  const updateSelectedTicket = (update, fromSummary = false) =>
+    setTicketDetail((ticket) => {
+      if (ticket && ticket.id === selectedTicketId) return update(ticket);
+      return fromSummary && selectedSummary
+        ? update({ ...selectedSummary, messages: [] })
+        : ticket;
+    });
+
   useEffect(() => {
     if (messagesEndRef.current) {
       messagesEndRef.current.scrollIntoView({ behavior: "smooth" });
@@ -180,16 +205,12 @@ const AdminChat = () => {
       optimistic: true,
     };
 
-    setTickets((prevTickets) =>
-      prevTickets.map((ticket) => {
-        if (ticket.id === selectedTicketId) {
-          return {
-            ...ticket,
-            messages: [...(ticket.messages || []), optimisticMessage],
-          };
-        }
-        return ticket;
-      })
+    updateSelectedTicket(
+      (ticket) => ({
+        ...ticket,
+        messages: [...(ticket.messages || []), optimisticMessage],
+      }),
+      true
     );
     setNewMessage("");
 
@@ -199,40 +220,24 @@ const AdminChat = () => {
         contentToSend
       );
 
-      setTickets((prevTickets) =>
-        prevTickets.map((ticket) => {
-          if (ticket.id === selectedTicketId) {
-            return {
-              ...ticket,
-              messages: (ticket.messages || []).map((msg) =>
-                msg.id === optimisticId
-                  ? { ...savedMessage, optimistic: false }
-                  : msg
-              ),
-              updated_at: savedMessage.created_at,
-            };
-          }
-          return ticket;
-        })
-      );
+      updateSelectedTicket((ticket) => ({
+        ...ticket,
+        messages: (ticket.messages || []).map((msg) =>
+          msg.id === optimisticId ? { ...savedMessage, optimistic: false } : msg
+        ),
+        updated_at: savedMessage.created_at,
+      }));
     } catch (error) {
       console.error("Error sending message:", error);
       toast.error("Failed to send message. Please try again.");
-      setTickets((prevTickets) =>
-        prevTickets.map((ticket) => {
-          if (ticket.id === selectedTicketId) {
-            return {
-              ...ticket,
-              messages: (ticket.messages || []).map((msg) =>
-                msg.id === optimisticId
-                  ? { ...msg, error: true, optimistic: false }
-                  : msg
-              ),
-            };
-          }
-          return ticket;
-        })
-      );
+      updateSelectedTicket((ticket) => ({
+        ...ticket,
+        messages: (ticket.messages || []).map((msg) =>
+          msg.id === optimisticId
+            ? { ...msg, error: true, optimistic: false }
+            : msg
+        ),
+      }));
     } finally {
       setIsSending(false);
     }
@@ -395,6 +400,15 @@ const AdminChat = () => {
                 </div>
               ))
             )}
+            {!error && nextTicketsCursor && (
+              <button
+                className="tickets-load-more"
+                onClick={loadMoreTickets}
+                disabled={isLoadingMoreTickets}
+              >
+                {isLoadingMoreTickets ? "Loading..." : "Load more"}
+              </button>
+            )}
           </div>
         </div>
         <div className="admin-chat-main">
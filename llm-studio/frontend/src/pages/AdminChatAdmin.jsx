@@ -11,7 +11,10 @@ import {
   FiRepeat,
 } from "react-icons/fi";
 import { useAuth } from "../hooks/useAuth";
-import { adminChatService } from "../services/admin-chat.service";
+import {
+  adminChatService,
+  mergeTicketMessages,
+} from "../services/admin-chat.service";
 import { toast } from "react-toastify";
 import DashboardHeader from "../components/dashboard/DashboardHeader";
 import "./AdminChat.css";
@@ -21,7 +24,10 @@ const AdminChatAdmin = () => {
   const { user } = useAuth();
 
   const [tickets, setTickets] = useState([]);
+  const [nextTicketsCursor, setNextTicketsCursor] = useState(null);
+  const [isLoadingMoreTickets, setIsLoadingMoreTickets] = useState(false);
   const [selectedTicketId, setSelectedTicketId] = useState(null);
+  const [ticketDetail, setTicketDetail] = useState(null);
   const [newMessage, setNewMessage] = useState("");
   const [isLoadingTickets, setIsLoadingTickets] = useState(true);
   const [isSending, setIsSending] = useState(false);
@@ -30,21 +36,28 @@ const AdminChatAdmin = () => {
 
   const messagesEndRef = useRef(null);
   const firstLoadRef = useRef(true);
+  const loadedMoreRef = useRef(false);
 
   const fetchTickets = useCallback(async () => {
     setIsLoadingTickets(true);
     setError(null);
     try {
-      const response = await adminChatService.getAllTickets();
-      if (Array.isArray(response)) {
-        const normalizedTickets = response.map((t) => ({
-          ...t,
-          id: t._id || t.id,
-        }));
-        setTickets(normalizedTickets);
-      } else {
-        setError("Invalid data format for tickets.");
-        setTickets([]);
+      const { tickets: firstPage, nextCursor } =
+        await adminChatService.getAdminTicketSummaries();
+      setTickets((prevTickets) => {
+        // Polling refreshes the first page; pages added with "Load more" are kept below it
+        if (!loadedMoreRef.current || !nextCursor || firstPage.length === 0) {
+          return firstPage;
+        }
+        const ids = new Set(firstPage.map((t) => t.id));
+        const oldest = firstPage[firstPage.length - 1].updated_at;
+        return [
+          ...firstPage,
+          ...prevTickets.filter((t) => !ids.has(t.id) && t.updated_at < oldest),
+        ];
+      });
+      if (!loadedMoreRef.current) {
+        setNextTicketsCursor(nextCursor);
       }
     } catch (err) {
       console.error("Error fetching tickets:", err);
@@ -71,10 +84,71 @@ const AdminChatAdmin = () => {
     };
   }, [fetchTickets]); // fetchTickets as dependency ensures it’s stable
 
-  const selectedTicket = tickets.find(
+  const loadMoreTickets = async () => {
+    if (!nextTicketsCursor || isLoadingMoreTickets) return;
+    setIsLoadingMoreTickets(true);
+    try {
+      const { tickets: page, nextCursor } =
+        await adminChatService.getAdminTicketSummaries(null, nextTicketsCursor);
+      loadedMoreRef.current = true;
+      setTickets((prevTickets) => {
+        const ids = new Set(prevTickets.map((t) => t.id));
+        return [...prevTickets, ...page.filter((t) => !ids.has(t.id))];
+      });
+      setNextTicketsCursor(nextCursor);
+    } catch (err) {
+      console.error("Error loading more tickets:", err);
+      toast.error("Failed to load more tickets.");
+    } finally {
+      setIsLoadingMoreTickets(false);
+    }
+  };
+
+  const selectedSummary = tickets.find(
     (ticket) => ticket.id === selectedTicketId
   );
 
+  // (Re)load the selected ticket's thread when it is opened or its summary shows new activity;
+  // messages still being sent are kept after the fetched thread
+  useEffect(() => {
+    if (!selectedTicketId) {
+      setTicketDetail(null);
+      return;
+    }
+    let cancelled = false;
+    adminChatService
+      .getTicket(selectedTicketId)
+      .then((ticket) => {
+        if (cancelled) return;
+        setTicketDetail((prev) => ({
+          ...ticket,
+          messages: mergeTicketMessages(
+            prev && prev.id === ticket.id ? prev.messages : [],
+            ticket.messages || []
+          ),
+        }));
+      })
+      .catch((err) => console.error("Error fetching ticket:", err));
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedTicketId, selectedSummary?.updated_at]);
+
+  const selectedTicket =
+    ticketDetail && ticketDetail.id === selectedTicketId
+      ? { ...ticketDetail, status: selectedSummary?.status || ticketDetail.status }
+      : selectedSummary;
+
+  // With `fromSummary`, a thread that hasn't loaded yet starts from the summary, so a message
+  // sent before it arrives is kept (the fetched thread is merged ahead of it)
+  const updateSelectedTicket = (update, fromSummary = false) =>
+    setTicketDetail((ticket) => {
+      if (ticket && ticket.id === selectedTicketId) return update(ticket);
+      return fromSummary && selectedSummary
+        ? update({ ...selectedSummary, messages: [] })
+        : ticket;
+    });
+
   useEffect(() => {
     if (messagesEndRef.current) {
       messagesEndRef.current.scrollIntoView({ behavior: "smooth" });
@@ -119,16 +193,12 @@ const AdminChatAdmin = () => {
       optimistic: true,
     };
 
-    setTickets((prevTickets) =>
-      prevTickets.map((ticket) => {
-        if (ticket.id === selectedTicketId) {
-          return {
-            ...ticket,
-            messages: [...(ticket.messages || []), optimisticMessage],
-          };
-        }
-        return ticket;
-      })
+    updateSelectedTicket(
+      (ticket) => ({
+        ...ticket,
+        messages: [...(ticket.messages || []), optimisticMessage],
+      }),
+      true
     );
     setNewMessage("");
 
@@ -137,40 +207,24 @@ const AdminChatAdmin = () => {
         selectedTicketId,
         contentToSend
       );
-      setTickets((prevTickets) =>
-        prevTickets.map((ticket) => {
-          if (ticket.id === selectedTicketId) {
-            return {
-              ...ticket,
-              messages: (ticket.messages || []).map((msg) =>
-                msg.id === optimisticId
-                  ? { ...savedMessage, optimistic: false }
-                  : msg
-              ),
-              updated_at: savedMessage.created_at,
-            };
-          }
-          return ticket;
-        })
-      );
+      updateSelectedTicket((ticket) => ({
+        ...ticket,
+        messages: (ticket.messages || []).map((msg) =>
+          msg.id === optimisticId ? { ...savedMessage, optimistic: false } : msg
+        ),
+        updated_at: savedMessage.created_at,
+      }));
     } catch (error) {
       console.error("Error sending admin message:", error);
       toast.error("Failed to send message. Please try again.");
-      setTickets((prevTickets) =>
-        prevTickets.map((ticket) => {
-          if (ticket.id === selectedTicketId) {
-            return {
-              ...ticket,
-              messages: (ticket.messages || []).map((msg) =>
-                msg.id === optimisticId
-                  ? { ...msg, error: true, optimistic: false }
-                  : msg
-              ),
-            };
-          }
-          return ticket;
-        })
-      );
+      updateSelectedTicket((ticket) => ({
+        ...ticket,
+        messages: (ticket.messages || []).map((msg) =>
+          msg.id === optimisticId
+            ? { ...msg, error: true, optimistic: false }
+            : msg
+        ),
+      }));
     } finally {
       setIsSending(false);
     }
@@ -305,6 +359,15 @@ const AdminChatAdmin = () => {
                 </div>
               ))
             )}
+            {!error && nextTicketsCursor && (
+              <button
+                className="tickets-load-more"
+                onClick={loadMoreTickets}
+                disabled={isLoadingMoreTickets}
+              >
+                {isLoadingMoreTickets ? "Loading..." : "Load more"}
+              </button>
+            )}
           </div>
         </div>
         <div className="admin-chat-main">
@@ -840,14 +840,19 @@ const AdminDashboard = () => {
 };
 
 const AdminChatSection = () => {
+  // Ticket summaries for the sidebar; only the selected ticket's thread is loaded
   const [tickets, setTickets] = useState([]);
+  const [nextTicketsCursor, setNextTicketsCursor] = useState(null);
+  const [isLoadingMoreTickets, setIsLoadingMoreTickets] = useState(false);
   const [selectedTicketId, setSelectedTicketId] = useState(null);
+  const [ticketDetail, setTicketDetail] = useState(null);
   const [newMessage, setNewMessage] = useState("");
   const [isLoadingTickets, setIsLoadingTickets] = useState(true);
   const [isSending, setIsSending] = useState(false);
   const [isUpdatingTicket, setIsUpdatingTicket] = useState(false);
   const [error, setError] = useState(null);
   const messagesEndRef = useRef(null);
+  const loadedMoreRef = useRef(false);
 
   const fetchTickets = useCallback(async () => {
     // Only show loading state on initial load
@@ -857,27 +862,28 @@ const AdminChatSection = () => {
     setError(null);
 
     try {
-      const response = await adminChatService.getAllTickets();
-      if (Array.isArray(response)) {
-        const normalizedTickets = response.map((t) => ({
-          ...t,
-          id: t._id || t.id,
-        }));
-
+      const { tickets: firstPage, nextCursor } =
+        await adminChatService.getAdminTicketSummaries();
+      setTickets((prevTickets) => {
+        // Polling refreshes the first page; pages added with "Load more" are kept below it
+        let merged = firstPage;
+        if (loadedMoreRef.current && nextCursor && firstPage.length > 0) {
+          const ids = new Set(firstPage.map((t) => t.id));
+          const oldest = firstPage[firstPage.length - 1].updated_at;
+          merged = [
+            ...firstPage,
+            ...prevTickets.filter((t) => !ids.has(t.id) && t.updated_at < oldest),
+          ];
+        }
         // Deep comparison to check if tickets have actually changed
-        setTickets((prevTickets) => {
-          const prevString = JSON.stringify(prevTickets);
-          const newString = JSON.stringify(normalizedTickets);
-          if (prevString !== newString) {
-            console.log("Tickets updated, applying new data.");
-            return normalizedTickets;
-          }
-          console.log("No changes detected in tickets.");
-          return prevTickets; // Return previous state to avoid re-render
-        });
-      } else {
-        setError("Invalid data format for tickets.");
-        setTickets([]);
+        if (JSON.stringify(prevTickets) !== JSON.stringify(merged)) {
+          console.log("Tickets updated, applying new data.");
+          return merged;
+        }
+        return prevTickets; // Return previous state to avoid re-render
+      });
+      if (!loadedMoreRef.current) {
+        setNextTicketsCursor(nextCursor);
       }
     } catch (err) {
       console.error("Error fetching tickets:", err);
@@ -890,6 +896,26 @@ const AdminChatSection = () => {
     }
   }, [tickets.length]); // Depend on tickets.length to handle initial load correctly
 
+  const loadMoreTickets = async () => {
+    if (!nextTicketsCursor || isLoadingMoreTickets) return;
+    setIsLoadingMoreTickets(true);
+    try {
+      const { tickets: page, nextCursor } =
+        await adminChatService.getAdminTicketSummaries(null, nextTicketsCursor);
+      loadedMoreRef.current = true;
+      setTickets((prevTickets) => {
+        const ids = new Set(prevTickets.map((t) => t.id));
+        return [...prevTickets, ...page.filter((t) => !ids.has(t.id))];
+      });
+      setNextTicketsCursor(nextCursor);
+    } catch (err) {
+      console.error("Error loading more tickets:", err);
+      toast.error("Failed to load more tickets.");
+    } finally {
+      setIsLoadingMoreTickets(false);
+    }
+  };
+
   useEffect(() => {
     fetchTickets(); // Initial load
     const intervalId = setInterval(() => {
@@ -904,10 +930,38 @@ const AdminChatSection = () => {
     };
   }, [fetchTickets]);
 
-  const selectedTicket = tickets.find(
+  const selectedSummary = tickets.find(
     (ticket) => ticket.id === selectedTicketId
   );
 
+  // (Re)load the selected ticket's thread when it is opened or its summary shows new activity
+  useEffect(() => {
+    if (!selectedTicketId) {
+      setTicketDetail(null);
+      return;
+    }
+    let cancelled = false;
+    adminChatService
+      .getTicket(selectedTicketId)
+      .then((ticket) => {
+        if (!cancelled) setTicketDetail(ticket);
+      })
+      .catch((err) => console.error("Error fetching ticket:", err));
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedTicketId, selectedSummary?.updated_at]);
+
+  const selectedTicket =
+    ticketDetail && ticketDetail.id === selectedTicketId
+      ? { ...ticketDetail, status: selectedSummary?.status || ticketDetail.status }
+      : selectedSummary;
+
+  const updateSelectedTicket = (update) =>
+    setTicketDetail((ticket) =>
+      ticket && ticket.id === selectedTicketId ? update(ticket) : ticket
+    );
+
   useEffect(() => {
     if (messagesEndRef.current) {
       messagesEndRef.current.scrollIntoView({ behavior: "smooth" });
@@ -947,17 +1001,10 @@ const AdminChatSection = () => {
       optimistic: true,
     };
 
-    setTickets((prevTickets) =>
-      prevTickets.map((ticket) => {
-        if (ticket.id === selectedTicketId) {
-          return {
-            ...ticket,
-            messages: [...(ticket.messages || []), optimisticMessage],
-          };
-        }
-        return ticket;
-      })
-    );
+    updateSelectedTicket((ticket) => ({
+      ...ticket,
+      messages: [...(ticket.messages || []), optimisticMessage],
+    }));
     setNewMessage("");
 
     try {
@@ -965,39 +1012,23 @@ const AdminChatSection = () => {
         selectedTicketId,
         contentToSend
       );
-      setTickets((prevTickets) =>
-        prevTickets.map((ticket) => {
-          if (ticket.id === selectedTicketId) {
-            return {
-              ...ticket,
-              messages: (ticket.messages || []).map((msg) =>
-                msg.id === optimisticId
-                  ? { ...savedMessage, optimistic: false }
-                  : msg
-              ),
-              updated_at: savedMessage.created_at,
-            };
-          }
-          return ticket;
-        })
-      );
+      updateSelectedTicket((ticket) => ({
+        ...ticket,
+        messages: (ticket.messages || []).map((msg) =>
+          msg.id === optimisticId ? { ...savedMessage, optimistic: false } : msg
+        ),
+        updated_at: savedMessage.created_at,
+      }));
     } catch (error) {
       console.error("Error sending admin message:", error);
-      setTickets((prevTickets) =>
-        prevTickets.map((ticket) => {
-          if (ticket.id === selectedTicketId) {
-            return {
-              ...ticket,
-              messages: (ticket.messages || []).map((msg) =>
-                msg.id === optimisticId
-                  ? { ...msg, error: true, optimistic: false }
-                  : msg
-              ),
-            };
-          }
-          return ticket;
-        })
-      );
+      updateSelectedTicket((ticket) => ({
+        ...ticket,
+        messages: (ticket.messages || []).map((msg) =>
+          msg.id === optimisticId
+            ? { ...msg, error: true, optimistic: false }
+            : msg
+        ),
+      }));
     } finally {
       setIsSending(false);
     }
@@ -1085,12 +1116,23 @@ const AdminChatSection = () => {
               >
                 <div className="ticket-item-content">
                   <div className="ticket-title">
+                    {ticket.unread && (
+                      <span className="ticket-unread-dot" title="Awaiting reply" />
+                    )}
                     {ticket.title || "No Title"}
                   </div>
+                  {ticket.last_message && (
+                    <div className="ticket-last-message">
+                      {ticket.last_message.content}
+                    </div>
+                  )}
                   <div className="ticket-meta">
                     <span className={`ticket-status ${ticket.status}`}>
                       {ticket.status}
                     </span>
+                    <span className="ticket-message-count">
+                      {ticket.message_count} msg
+                    </span>
                     <span className="ticket-date">
                       {formatDate(ticket.created_at)}
                     </span>
@@ -1098,6 +1140,15 @@ const AdminChatSection = () => {
                 </div>
               </div>
             ))}
+            {nextTicketsCursor && (
+              <button
+                className="tickets-load-more"
+                onClick={loadMoreTickets}
+                disabled={isLoadingMoreTickets}
+              >
+                {isLoadingMoreTickets ? "Loading..." : "Load more"}
+              </button>
+            )}
           </div>
         )}
       </div>
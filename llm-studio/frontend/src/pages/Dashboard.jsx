@@ -1,5 +1,5 @@
 // src/pages/Dashboard.jsx
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { toast } from "react-toastify";
 import { FiPlus, FiMenu, FiX } from "react-icons/fi";
@@ -30,7 +30,10 @@ const Dashboard = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [isLoadingLLMs, setIsLoadingLLMs] = useState(true);
   const [isLoadingConversations, setIsLoadingConversations] = useState(true);
+  const [nextConversationsCursor, setNextConversationsCursor] = useState(null);
   const [error, setError] = useState(null);
+  // Conversations whose messages are loading or loaded; a failed load is removed so reopening retries
+  const messagesRequestedRef = useRef(new Set());
 
   const { user } = useAuth();
   const navigate = useNavigate();
@@ -72,27 +75,88 @@ const Dashboard = () => {
     }
   };
 
+  const fetchConversationsPage = async (cursor = null) => {
+    const query = cursor ? `?before=${encodeURIComponent(cursor)}` : "";
+    const response = await fetch(`/api/conversations${query}`, {
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem("token")}`,
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to load conversations: ${response.statusText}`);
+    }
+
+    setNextConversationsCursor(response.headers.get("X-Next-Cursor"));
+    return response.json();
+  };
+
+  const loadMoreConversations = async () => {
+    if (!nextConversationsCursor) return;
+    try {
+      const data = await fetchConversationsPage(nextConversationsCursor);
+      setConversations((prev) => [...prev, ...data]);
+    } catch (error) {
+      console.error("Error loading more conversations:", error);
+      toast.error("Failed to load more conversations");
+    }
+  };
+
+  // The listing only carries a preview of each conversation; load the messages once, when one is opened.
+  // Messages sent before the history arrives are kept after the fetched page.
+  useEffect(() => {
+    const conversationId = selectedConversationId;
+    if (!conversationId || messagesRequestedRef.current.has(conversationId)) return;
+    messagesRequestedRef.current.add(conversationId);
+
+    const loadMessages = async () => {
+      try {
+        const response = await fetch(`/api/conversations/${conversationId}`, {
+          headers: {
+            Authorization: `Bearer ${localStorage.getItem("token")}`,
+          },
+        });
+        if (!response.ok) {
+          throw new Error(`Failed to load conversation: ${response.statusText}`);
+        }
+        const data = await response.json();
+        const fetched = data.messages || [];
+        const fetchedIds = new Set(fetched.map((msg) => msg.id));
+        setConversations((prev) =>
+          prev.map((conv) =>
+            conv.id === conversationId
+              ? {
+                  ...conv,
+                  messages: [
+                    ...fetched,
+                    ...(conv.messages || []).filter((msg) => !fetchedIds.has(msg.id)),
+                  ],
+                  messages_before: data.messages_before,
+                }
+              : conv
+          )
+        );
+      } catch (error) {
+        messagesRequestedRef.current.delete(conversationId);
+        console.error("Error loading conversation messages:", error);
+        toast.error("Failed to load conversation");
+      }
+    };
+
+    loadMessages();
+  }, [selectedConversationId]);
+
   const loadConversations = async () => {
     setIsLoadingConversations(true);
     try {
-      const response = await fetch("/api/conversations", {
-        headers: {
-          Authorization: `Bearer ${localStorage.getItem("token")}`,
-        },
-      });
-  
-      if (!response.ok) {
-        throw new Error(`Failed to load conversations: ${response.statusText}`);
-      }
-  
-      const data = await response.json();
-      console.log("Loaded conversations with messages:", data);
+      const data = await fetchConversationsPage();
+      console.log("Loaded conversations:", data);
       setConversations(data);
   
       // Update user stats based on conversations and their messages
       const totalConversations = data.length;
       const totalMessages = data.reduce(
-        (acc, conv) => acc + (conv.messages ? conv.messages.length : 0),
+        (acc, conv) => acc + (conv.message_count || 0),
         0
       );
       setUserStats((prevStats) => ({
@@ -125,6 +189,8 @@ const Dashboard = () => {
         wsCreateConversation(selectedLLM.id, newConversation.id);
       }
 
+      // Nothing to load for a conversation that was just created
+      messagesRequestedRef.current.add(newConversation.id);
       setConversations([newConversation, ...conversations]);
       setSelectedConversationId(newConversation.id);
 
@@ -160,7 +226,7 @@ const Dashboard = () => {
     // Optimistically update UI using a functional update to ensure we have the latest state.
     setConversations((prevConversations) =>
       prevConversations.map((conv) => {
-        if (conv.id === activeConversation.id + 1) {
+        if (conv.id === activeConversation.id) {
           return {
             ...conv,
             messages: [...(conv.messages || []), userMessage],
@@ -189,13 +255,14 @@ const Dashboard = () => {
             if (conv.id === activeConversation.id) {
               // If no messages existed before, use part of the user message as title.
               const newTitle =
-                (conv.messages && conv.messages.length === 0)
+                (conv.message_count === 0 || (conv.messages && conv.messages.length === 0))
                   ? message.substring(0, 30) + (message.length > 30 ? "..." : "")
                   : conv.title;
               return {
                 ...conv,
                 title: newTitle,
                 messages: [...(conv.messages || []), assistantMessage],
+                message_count: (conv.message_count || 0) + 2,
                 updated_at: new Date().toISOString(),
               };
             }
@@ -288,6 +355,8 @@ const Dashboard = () => {
                   conversations={conversations}
                   selectedConversationId={selectedConversationId}
                   onConversationSelect={setSelectedConversationId}
+                  hasMore={Boolean(nextConversationsCursor)}
+                  onLoadMore={loadMoreConversations}
                 />
               )}
             </div>
@@ -25,6 +25,16 @@ function normalizeTicket(ticket) {
   return normalized;
 }
 
+// A ticket's thread as just fetched, followed by the local messages it can't
+// contain yet (still sending, or failed to send)
+export function mergeTicketMessages(existing = [], fetched = []) {
+  const fetchedIds = new Set(fetched.map((m) => m.id || m._id));
+  const pending = existing.filter(
+    (m) => (m.optimistic || m.error) && !fetchedIds.has(m.id)
+  );
+  return [...fetched, ...pending];
+}
+
 class AdminChatService {
   constructor() {
     // Points to /api/admin-chat
@@ -43,14 +53,20 @@ class AdminChatService {
 
   // --- User Routes ---
 
-  async getUserTickets() {
+  // Ticket list without message threads: { tickets, nextCursor }
+  async getUserTicketSummaries(status = null, before = null) {
     this.setAuthHeader();
     try {
-      const response = await axios.get(`${this.apiUrl}/tickets`);
-      const tickets = response.data.map((t) => normalizeTicket(t));
-      return tickets;
+      const params = {};
+      if (status) params.status = status;
+      if (before) params.before = before;
+      const response = await axios.get(`${this.apiUrl}/ticket-summaries`, { params });
+      return {
+        tickets: response.data.map((t) => normalizeTicket(t)),
+        nextCursor: response.headers['x-next-cursor'] || null,
+      };
     } catch (error) {
-      console.error('Error fetching user tickets:', error);
+      console.error('Error fetching ticket summaries:', error);
       throw error;
     }
   }
@@ -99,17 +115,20 @@ class AdminChatService {
   }
 
   // --- Admin Routes ---
-  async getAllTickets(status = null) {
+  // Ticket list without message threads: { tickets, nextCursor }
+  async getAdminTicketSummaries(status = null, before = null) {
     this.setAuthHeader();
     try {
-      let url = `${this.apiUrl}/admin/tickets`;
-      if (status) {
-        url += `?status=${status}`;
-      }
-      const response = await axios.get(url);
-      return response.data.map((t) => normalizeTicket(t));
+      const params = {};
+      if (status) params.status = status;
+      if (before) params.before = before;
+      const response = await axios.get(`${this.apiUrl}/admin/ticket-summaries`, { params });
+      return {
+        tickets: response.data.map((t) => normalizeTicket(t)),
+        nextCursor: response.headers['x-next-cursor'] || null,
+      };
     } catch (error) {
-      console.error('Error fetching all tickets (admin):', error);
+      console.error('Error fetching ticket summaries (admin):', error);
       throw error;
     }
   }
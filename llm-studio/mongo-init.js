@@ -7,16 +7,10 @@ db.createCollection('messages');
 db.createCollection('tickets');
 db.createCollection('admin_messages');
 
+// The unique user indexes guard the seed data below; every other index is
+// created by the backend at startup (app/core/indexes.py, app/core/migrations.py)
 db.users.createIndex({ "username": 1 }, { unique: true });
 db.users.createIndex({ "email": 1 }, { unique: true });
-db.conversations.createIndex({ "user_id": 1 });
-db.messages.createIndex({ "conversation_id": 1 });
-
-db.tickets.createIndex({ "user_id": 1 });
-db.tickets.createIndex({ "status": 1 });
-db.tickets.createIndex({ "updated_at": -1 });
-db.admin_messages.createIndex({ "ticket_id": 1 });
-db.admin_messages.createIndex({ "created_at": 1 });
 
 db.users.insertOne({
     username: "admin",